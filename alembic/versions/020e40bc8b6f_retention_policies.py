@@ -0,0 +1,42 @@
+"""retention policies
+
+Revision ID: 020e40bc8b6f
+Revises: f8489cab3554
+Create Date: 2026-10-17 09:25:00.000000
+
+Skipped when a database created by create_all already has the table.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '020e40bc8b6f'
+down_revision = 'f8489cab3554'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table("retention_policies"):
+        return
+    op.create_table(
+        "retention_policies",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("employee_id", sa.Integer(), nullable=True),
+        sa.Column("project_id", sa.Integer(), nullable=True),
+        sa.Column("retain_days", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.CheckConstraint("(employee_id IS NULL) <> (project_id IS NULL)", name="ck_retention_policy_scope"),
+        sa.ForeignKeyConstraint(["employee_id"], ["employees.id"]),
+        sa.ForeignKeyConstraint(["project_id"], ["projects.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("employee_id"),
+        sa.UniqueConstraint("project_id"),
+    )
+    op.create_index("ix_retention_policies_id", "retention_policies", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_table("retention_policies")
@@ -0,0 +1,34 @@
+"""presence columns
+
+Revision ID: 27b4dd718162
+Revises: d2cf0e76fa7e
+Create Date: 2026-10-17 09:45:00.000000
+
+Columns a database created by create_all already has are skipped.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '27b4dd718162'
+down_revision = 'd2cf0e76fa7e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    employee_columns = {column["name"] for column in inspector.get_columns("employees")}
+    if "last_seen_at" not in employee_columns:
+        op.add_column("employees", sa.Column("last_seen_at", sa.DateTime(timezone=True), nullable=True))
+    if "is_idle" not in employee_columns:
+        op.add_column("employees", sa.Column("is_idle", sa.Boolean(), nullable=True))
+    if "last_heartbeat_at" not in {column["name"] for column in inspector.get_columns("time_entries")}:
+        op.add_column("time_entries", sa.Column("last_heartbeat_at", sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("time_entries", "last_heartbeat_at")
+    op.drop_column("employees", "is_idle")
+    op.drop_column("employees", "last_seen_at")
@@ -0,0 +1,50 @@
+"""screenshot blob store
+
+Revision ID: 394a8aa54853
+Revises: c5376ee66ecf
+Create Date: 2026-10-17 09:10:00.000000
+
+Screenshots stored before the blob store keep a null content_hash and their
+own file. A table or column a database created by create_all already has is
+skipped.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '394a8aa54853'
+down_revision = 'c5376ee66ecf'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("screenshot_blobs"):
+        op.create_table(
+            "screenshot_blobs",
+            sa.Column("content_hash", sa.String(length=64), nullable=False),
+            sa.Column("file_path", sa.String(length=500), nullable=False),
+            sa.Column("file_size", sa.BigInteger(), nullable=False),
+            sa.Column("ref_count", sa.Integer(), nullable=False),
+            sa.Column("width", sa.Integer(), nullable=True),
+            sa.Column("height", sa.Integer(), nullable=True),
+            sa.Column("format", sa.String(length=10), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=True),
+            sa.PrimaryKeyConstraint("content_hash"),
+        )
+    if "content_hash" not in {column["name"] for column in inspector.get_columns("screenshots")}:
+        op.add_column("screenshots", sa.Column("content_hash", sa.String(length=64), nullable=True))
+        op.create_foreign_key(
+            "screenshots_content_hash_fkey", "screenshots", "screenshot_blobs", ["content_hash"], ["content_hash"]
+        )
+    if "ix_screenshots_content_hash" not in {index["name"] for index in inspector.get_indexes("screenshots")}:
+        op.create_index("ix_screenshots_content_hash", "screenshots", ["content_hash"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_screenshots_content_hash", table_name="screenshots")
+    op.drop_constraint("screenshots_content_hash_fkey", "screenshots", type_="foreignkey")
+    op.drop_column("screenshots", "content_hash")
+    op.drop_table("screenshot_blobs")
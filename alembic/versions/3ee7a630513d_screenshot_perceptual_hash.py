@@ -0,0 +1,49 @@
+"""screenshot perceptual hash
+
+Revision ID: 3ee7a630513d
+Revises: 394a8aa54853
+Create Date: 2026-10-17 09:15:00.000000
+
+Deleting a screenshot clears near_duplicate_of_id on the captures pointing
+at it. Existing screenshots get no hash, so new captures are never matched
+against them. Columns a database created by create_all already has are
+skipped; an existing near_duplicate_of_id foreign key is replaced by the
+ON DELETE SET NULL one.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3ee7a630513d'
+down_revision = '394a8aa54853'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    columns = {column["name"] for column in inspector.get_columns("screenshots")}
+    if "perceptual_hash" not in columns:
+        op.add_column("screenshots", sa.Column("perceptual_hash", sa.BigInteger(), nullable=True))
+    if "ix_screenshots_perceptual_hash" not in {index["name"] for index in inspector.get_indexes("screenshots")}:
+        op.create_index("ix_screenshots_perceptual_hash", "screenshots", ["perceptual_hash"])
+    if "near_duplicate_of_id" not in columns:
+        op.add_column("screenshots", sa.Column("near_duplicate_of_id", sa.Integer(), nullable=True))
+    for foreign_key in inspector.get_foreign_keys("screenshots"):
+        if foreign_key["constrained_columns"] == ["near_duplicate_of_id"]:
+            op.drop_constraint(foreign_key["name"], "screenshots", type_="foreignkey")
+    op.create_foreign_key(
+        "screenshots_near_duplicate_of_id_fkey", "screenshots", "screenshots",
+        ["near_duplicate_of_id"], ["id"], ondelete="SET NULL"
+    )
+    if "perceptual_hash" not in {column["name"] for column in inspector.get_columns("screenshot_blobs")}:
+        op.add_column("screenshot_blobs", sa.Column("perceptual_hash", sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("screenshot_blobs", "perceptual_hash")
+    op.drop_constraint("screenshots_near_duplicate_of_id_fkey", "screenshots", type_="foreignkey")
+    op.drop_column("screenshots", "near_duplicate_of_id")
+    op.drop_index("ix_screenshots_perceptual_hash", table_name="screenshots")
+    op.drop_column("screenshots", "perceptual_hash")
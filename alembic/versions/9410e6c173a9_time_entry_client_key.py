@@ -0,0 +1,34 @@
+"""time entry client key
+
+Revision ID: 9410e6c173a9
+Revises: 27b4dd718162
+Create Date: 2026-10-17 09:50:00.000000
+
+Entries recorded before offline sync have no key; the unique index ignores
+them (NULLs never conflict). Skips what a database created by create_all
+already has.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9410e6c173a9'
+down_revision = '27b4dd718162'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if "client_key" not in {column["name"] for column in inspector.get_columns("time_entries")}:
+        op.add_column("time_entries", sa.Column("client_key", sa.String(length=64), nullable=True))
+    if "uq_time_entries_employee_id_client_key" not in {index["name"] for index in inspector.get_indexes("time_entries")}:
+        op.create_index(
+            "uq_time_entries_employee_id_client_key", "time_entries", ["employee_id", "client_key"], unique=True
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_time_entries_employee_id_client_key", table_name="time_entries")
+    op.drop_column("time_entries", "client_key")
@@ -0,0 +1,43 @@
+"""daily time rollups
+
+Revision ID: 945e6fcd6dd3
+Revises: 97d7f621966a
+Create Date: 2026-10-17 09:35:00.000000
+
+The table starts out empty: backfill it from the existing time entries with
+`python scripts/time_rollups.py rebuild` once the upgrade is done. Skipped
+when a database created by create_all already has the table.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '945e6fcd6dd3'
+down_revision = '97d7f621966a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table("time_rollups_daily"):
+        return
+    op.create_table(
+        "time_rollups_daily",
+        sa.Column("employee_id", sa.Integer(), nullable=False),
+        sa.Column("project_id", sa.Integer(), nullable=False),
+        sa.Column("task_id", sa.Integer(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("seconds", sa.BigInteger(), nullable=False),
+        sa.Column("entries", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=True),
+        sa.ForeignKeyConstraint(["employee_id"], ["employees.id"]),
+        sa.ForeignKeyConstraint(["project_id"], ["projects.id"]),
+        sa.ForeignKeyConstraint(["task_id"], ["tasks.id"]),
+        sa.PrimaryKeyConstraint("employee_id", "project_id", "task_id", "day"),
+    )
+    op.create_index("ix_time_rollups_daily_day_project_id", "time_rollups_daily", ["day", "project_id"])
+
+
+def downgrade() -> None:
+    op.drop_table("time_rollups_daily")
@@ -0,0 +1,50 @@
+"""keyset pagination indexes
+
+Revision ID: 97d7f621966a
+Revises: 020e40bc8b6f
+Create Date: 2026-10-17 09:30:00.000000
+
+(timestamp, id) and (start_time, id) indexes, overall and per employee,
+replace the single-column timestamp and start_time ones. They are built
+concurrently so the tables stay writable; indexes a database already has
+(from the startup index loop) are skipped.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '97d7f621966a'
+down_revision = '020e40bc8b6f'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_screenshots_timestamp_id", "screenshots", ["timestamp", "id"]),
+    ("ix_screenshots_employee_id_timestamp_id", "screenshots", ["employee_id", "timestamp", "id"]),
+    ("ix_time_entries_start_time_id", "time_entries", ["start_time", "id"]),
+    ("ix_time_entries_employee_id_start_time_id", "time_entries", ["employee_id", "start_time", "id"]),
+]
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    existing = {
+        index["name"]
+        for table in ("screenshots", "time_entries")
+        for index in inspector.get_indexes(table)
+    }
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            if name not in existing:
+                op.create_index(name, table, columns, postgresql_concurrently=True)
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_screenshots_timestamp")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_time_entries_start_time")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index("ix_time_entries_start_time", "time_entries", ["start_time"], postgresql_concurrently=True)
+        op.create_index("ix_screenshots_timestamp", "screenshots", ["timestamp"], postgresql_concurrently=True)
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
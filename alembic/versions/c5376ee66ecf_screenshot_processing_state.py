@@ -0,0 +1,38 @@
+"""screenshot processing state
+
+Revision ID: c5376ee66ecf
+Revises: 8fd81b57aff0
+Create Date: 2026-10-17 09:05:00.000000
+
+Existing screenshots were processed at upload, so they start out "ready".
+Columns a database created by create_all already has are skipped.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5376ee66ecf'
+down_revision = '8fd81b57aff0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    columns = {column["name"] for column in inspector.get_columns("screenshots")}
+    if "processing_state" not in columns:
+        op.add_column("screenshots", sa.Column("processing_state", sa.String(length=20), server_default="ready", nullable=False))
+    if "processing_started_at" not in columns:
+        op.add_column("screenshots", sa.Column("processing_started_at", sa.DateTime(timezone=True), nullable=True))
+    if "processing_attempts" not in columns:
+        op.add_column("screenshots", sa.Column("processing_attempts", sa.Integer(), server_default="0", nullable=False))
+    if "ix_screenshots_processing_state" not in {index["name"] for index in inspector.get_indexes("screenshots")}:
+        op.create_index("ix_screenshots_processing_state", "screenshots", ["processing_state"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_screenshots_processing_state", table_name="screenshots")
+    op.drop_column("screenshots", "processing_attempts")
+    op.drop_column("screenshots", "processing_started_at")
+    op.drop_column("screenshots", "processing_state")
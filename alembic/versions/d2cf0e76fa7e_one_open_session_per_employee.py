@@ -0,0 +1,49 @@
+"""one open session per employee
+
+Revision ID: d2cf0e76fa7e
+Revises: 945e6fcd6dd3
+Create Date: 2026-10-17 09:40:00.000000
+
+Racing starts could leave an employee with several open sessions, which the
+unique index would reject. Each one but the latest is closed first, ending
+where the employee's next session started, in the same transaction as the
+index build. Those sessions are not in the rollups yet: run
+`python scripts/time_rollups.py check --fix` after the upgrade.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2cf0e76fa7e'
+down_revision = '945e6fcd6dd3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if "uq_time_entries_employee_id_open" in {
+        index["name"] for index in sa.inspect(op.get_bind()).get_indexes("time_entries")
+    }:
+        return
+    op.execute("""
+        UPDATE time_entries AS entry
+        SET end_time = later.next_start,
+            duration_seconds = GREATEST(FLOOR(EXTRACT(EPOCH FROM later.next_start - entry.start_time)), 0)::integer,
+            is_active = false,
+            updated_at = now()
+        FROM (
+            SELECT id, lead(start_time) OVER (PARTITION BY employee_id ORDER BY start_time, id) AS next_start
+            FROM time_entries
+            WHERE end_time IS NULL AND is_active
+        ) AS later
+        WHERE entry.id = later.id AND later.next_start IS NOT NULL
+    """)
+    op.create_index(
+        "uq_time_entries_employee_id_open", "time_entries", ["employee_id"],
+        unique=True, postgresql_where=sa.text("end_time IS NULL AND is_active")
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_time_entries_employee_id_open", table_name="time_entries")
@@ -0,0 +1,58 @@
+"""screenshot packs
+
+Revision ID: f8489cab3554
+Revises: 3ee7a630513d
+Create Date: 2026-10-17 09:20:00.000000
+
+A table or column a database created by create_all already has is skipped.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f8489cab3554'
+down_revision = '3ee7a630513d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("screenshot_packs"):
+        op.create_table(
+            "screenshot_packs",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("employee_id", sa.Integer(), nullable=False),
+            sa.Column("day", sa.Date(), nullable=False),
+            sa.Column("file_path", sa.String(length=500), nullable=False),
+            sa.Column("file_size", sa.BigInteger(), nullable=False),
+            sa.Column("entry_count", sa.Integer(), nullable=False),
+            sa.Column("live_count", sa.Integer(), nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=True),
+            sa.ForeignKeyConstraint(["employee_id"], ["employees.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_screenshot_packs_id", "screenshot_packs", ["id"])
+        op.create_index("ix_screenshot_packs_employee_id", "screenshot_packs", ["employee_id"])
+        op.create_index("ix_screenshot_packs_day", "screenshot_packs", ["day"])
+
+    columns = {column["name"] for column in inspector.get_columns("screenshots")}
+    if "pack_id" not in columns:
+        op.add_column("screenshots", sa.Column("pack_id", sa.Integer(), nullable=True))
+        op.create_foreign_key("screenshots_pack_id_fkey", "screenshots", "screenshot_packs", ["pack_id"], ["id"])
+    if "pack_offset" not in columns:
+        op.add_column("screenshots", sa.Column("pack_offset", sa.BigInteger(), nullable=True))
+    if "pack_length" not in columns:
+        op.add_column("screenshots", sa.Column("pack_length", sa.BigInteger(), nullable=True))
+    if "ix_screenshots_pack_id" not in {index["name"] for index in inspector.get_indexes("screenshots")}:
+        op.create_index("ix_screenshots_pack_id", "screenshots", ["pack_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_screenshots_pack_id", table_name="screenshots")
+    op.drop_constraint("screenshots_pack_id_fkey", "screenshots", type_="foreignkey")
+    op.drop_column("screenshots", "pack_length")
+    op.drop_column("screenshots", "pack_offset")
+    op.drop_column("screenshots", "pack_id")
+    op.drop_table("screenshot_packs")
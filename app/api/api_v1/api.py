@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.api_v1.endpoints import employees, projects, tasks, time_tracking, screenshots, auth
+from app.api.api_v1.endpoints import employees, projects, tasks, time_tracking, screenshots, auth, retention, reports, events, presence
 
 api_router = APIRouter()
 
@@ -9,4 +9,8 @@ api_router.include_router(projects.router, prefix="/projects", tags=["projects"]
 api_router.include_router(tasks.router, prefix="/tasks", tags=["tasks"])
 api_router.include_router(time_tracking.router, prefix="/time-entries", tags=["time-tracking"])
 api_router.include_router(screenshots.router, prefix="/screenshots", tags=["screenshots"])
-api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
\ No newline at end of file
+api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
+api_router.include_router(retention.router, prefix="/retention", tags=["retention"])
+api_router.include_router(reports.router, prefix="/reports", tags=["reports"])
+api_router.include_router(events.router, prefix="/events", tags=["events"])
+api_router.include_router(presence.router, prefix="/presence", tags=["presence"])
\ No newline at end of file
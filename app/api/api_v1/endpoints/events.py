@@ -0,0 +1,98 @@
+from fastapi import APIRouter, HTTPException, status, WebSocket
+from fastapi.responses import StreamingResponse
+from typing import Optional
+import json
+import asyncio
+import logging
+
+from app.core.config import settings
+from app.core.live_events import live_events, Subscriber
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+def _check_running():
+    if not live_events.running:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Live events are not enabled on this server"
+        )
+
+
+async def _wait_closed(websocket: WebSocket):
+    # Nothing is expected from the client; this only notices it going away
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
+
+
+async def _sse(subscriber: Subscriber):
+    try:
+        yield ": connected\n\n"
+        while True:
+            try:
+                payload = await subscriber.get(settings.live_events_keepalive_seconds)
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing an idle stream
+                yield ": keepalive\n\n"
+                continue
+            if payload is None:
+                yield 'event: evicted\ndata: {"detail": "Client too slow, reconnect"}\n\n'
+                return
+            yield f"event: {json.loads(payload)['type']}\ndata: {payload}\n\n"
+    finally:
+        live_events.unsubscribe(subscriber)
+
+
+@router.get("/stream")
+async def stream_events(project_id: Optional[int] = None, employee_id: Optional[int] = None):
+    """Server-Sent Events feed of session_started, session_stopped and
+    screenshot_created events, optionally only those of one project or
+    employee. Instead of polling /time-entries/active, load it once and
+    apply the session events on top.
+
+    A client that falls more than LIVE_EVENTS_QUEUE_SIZE events behind gets
+    an ``evicted`` event and the stream ends; it should reconnect and reload."""
+
+    _check_running()
+    subscriber = live_events.subscribe(project_id, employee_id)
+    return StreamingResponse(
+        _sse(subscriber),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.websocket("/ws")
+async def events_websocket(websocket: WebSocket, project_id: Optional[int] = None, employee_id: Optional[int] = None):
+    """The /stream feed over a WebSocket: one JSON text message per event.
+    An evicted client is closed with code 1013."""
+
+    if not live_events.running:
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        return
+    await websocket.accept()
+    subscriber = live_events.subscribe(project_id, employee_id)
+    closed = asyncio.ensure_future(_wait_closed(websocket))
+    try:
+        while True:
+            event = asyncio.ensure_future(subscriber.get())
+            await asyncio.wait([event, closed], return_when=asyncio.FIRST_COMPLETED)
+            if not event.done():
+                event.cancel()
+                return
+            payload = event.result()
+            if payload is None:
+                await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason="Client too slow, reconnect")
+                return
+            await websocket.send_text(payload)
+    except Exception as e:
+        logger.info(f"Live events WebSocket closed: {str(e)}")
+    finally:
+        closed.cancel()
+        live_events.unsubscribe(subscriber)
+
+
+@router.get("/stats")
+async def get_live_event_stats():
+    """Listener state, connected subscribers and evictions of this worker"""
+    return live_events.stats()
@@ -0,0 +1,35 @@
+from fastapi import APIRouter, Request, Response, status
+from typing import List
+import logging
+
+from app.core.presence import presence_tracker
+from app.schemas.presence import Heartbeat, PresenceEntry
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.post("/heartbeat", status_code=status.HTTP_204_NO_CONTENT)
+async def heartbeat(beat: Heartbeat, request: Request):
+    """Report that the desktop app of an employee is running, and whether the
+    user is idle. Expected every 30 seconds or so.
+
+    Only buffered in memory: it reaches the database (and GET /presence) with
+    the next bulk flush, a few seconds later. Heartbeats of unknown employees
+    are dropped then."""
+
+    ip_address = beat.ip_address or (request.client.host if request.client else None)
+    presence_tracker.record(beat.employee_id, ip_address, beat.idle)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@router.get("/", response_model=List[PresenceEntry])
+async def get_presence():
+    """Who is online, idle or offline: employees seen within
+    PRESENCE_TIMEOUT_SECONDS, plus everyone with an open session. Refreshed
+    from the database at most once per flush interval."""
+
+    return Response(content=await presence_tracker.presence(), media_type="application/json")
+
+@router.get("/stats")
+async def get_presence_stats():
+    """Heartbeat buffer and flush counters of this worker"""
+    return presence_tracker.stats()
@@ -0,0 +1,99 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import date
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import asyncio
+import logging
+
+from app.core.database import get_db
+from app.core.config import settings
+from app.core.rollups import summary, REPORT_GROUPS, REPORT_PERIODS
+from app.core.timesheets import build_timesheet
+from app.schemas.report import ReportSummaryRow, TimesheetEmployee
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.get("/summary", response_model=List[ReportSummaryRow], response_model_exclude_none=True)
+async def get_report_summary(
+    start_date: date,
+    end_date: date,
+    group_by: str = "project",
+    period: str = "week",
+    employee_id: Optional[int] = None,
+    project_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """Tracked time per day, week or month, grouped by any of employee,
+    project and task (comma separated). Reads the daily rollups, so only
+    closed sessions are counted; days are UTC."""
+    
+    groups = [group.strip() for group in group_by.split(",") if group.strip()]
+    if not groups or any(group not in REPORT_GROUPS for group in groups):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown group. Allowed groups: {list(REPORT_GROUPS)}"
+        )
+    
+    if period not in REPORT_PERIODS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown period. Allowed periods: {list(REPORT_PERIODS)}"
+        )
+    
+    if end_date < start_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="end_date must not be before start_date"
+        )
+    
+    return summary(db, start_date, end_date, list(dict.fromkeys(groups)), period, employee_id, project_id)
+
+@router.get("/timesheet", response_model=List[TimesheetEmployee])
+async def get_timesheet(
+    start_date: date,
+    end_date: date,
+    timezone: Optional[str] = None,
+    employee_id: Optional[int] = None,
+    daily_overtime_hours: Optional[float] = None,
+    weekly_overtime_hours: Optional[float] = None,
+    db: Session = Depends(get_db)
+):
+    """Per-employee daily and weekly totals for payroll, with days split at
+    midnight in ``timezone`` and overtime above the daily and weekly
+    thresholds (0 disables one). Only closed sessions are counted."""
+    
+    if end_date < start_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="end_date must not be before start_date"
+        )
+    
+    if (daily_overtime_hours or 0) < 0 or (weekly_overtime_hours or 0) < 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Overtime thresholds must not be negative"
+        )
+    
+    tz_name = timezone or settings.timesheet_timezone
+    try:
+        ZoneInfo(tz_name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown timezone: {tz_name}"
+        )
+    
+    # Loading and computing a large period takes seconds; keep it off the event loop
+    timesheet = await asyncio.to_thread(
+        build_timesheet,
+        db,
+        start_date,
+        end_date,
+        tz_name,
+        [employee_id] if employee_id is not None else None,
+        settings.overtime_daily_hours if daily_overtime_hours is None else daily_overtime_hours,
+        settings.overtime_weekly_hours if weekly_overtime_hours is None else weekly_overtime_hours,
+    )
+    return timesheet.to_dicts()
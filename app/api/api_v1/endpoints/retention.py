@@ -0,0 +1,98 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from typing import List
+import logging
+
+from app.core.database import get_db
+from app.core.config import settings
+from app.core.retention import retention_job, retention_report
+from app.models.retention_policy import RetentionPolicy
+from app.models.employee import Employee
+from app.models.project import Project
+from app.schemas.retention import (
+    RetentionPolicy as RetentionPolicySchema,
+    RetentionPolicySet,
+    RetentionReportItem
+)
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.get("/policies", response_model=List[RetentionPolicySchema])
+async def get_retention_policies(db: Session = Depends(get_db)):
+    """Per-project and per-employee overrides of SCREENSHOT_RETENTION_DAYS"""
+    return db.query(RetentionPolicy).order_by(RetentionPolicy.id).all()
+
+@router.put("/policies", response_model=RetentionPolicySchema)
+async def set_retention_policy(policy: RetentionPolicySet, db: Session = Depends(get_db)):
+    """Create or replace the retention policy of one employee or one project"""
+    
+    if (policy.employee_id is None) == (policy.project_id is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Set exactly one of employee_id and project_id"
+        )
+    
+    if policy.retain_days is not None and policy.retain_days < 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="retain_days must be at least 1, or null to keep screenshots forever"
+        )
+    
+    if policy.employee_id is not None:
+        # Verify employee exists
+        if not db.query(Employee).filter(Employee.id == policy.employee_id).first():
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Employee not found"
+            )
+        db_policy = db.query(RetentionPolicy).filter(RetentionPolicy.employee_id == policy.employee_id).first()
+    else:
+        # Verify project exists
+        if not db.query(Project).filter(Project.id == policy.project_id).first():
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Project not found"
+            )
+        db_policy = db.query(RetentionPolicy).filter(RetentionPolicy.project_id == policy.project_id).first()
+    
+    if db_policy is None:
+        db_policy = RetentionPolicy(employee_id=policy.employee_id, project_id=policy.project_id)
+        db.add(db_policy)
+    db_policy.retain_days = policy.retain_days
+    db.commit()
+    db.refresh(db_policy)
+    
+    logger.info(f"Set retention policy {db_policy.id}: {db_policy.retain_days} days")
+    
+    return db_policy
+
+@router.delete("/policies/{policy_id}")
+async def delete_retention_policy(policy_id: int, db: Session = Depends(get_db)):
+    """Remove an override; the project or global retention applies again"""
+    
+    policy = db.query(RetentionPolicy).filter(RetentionPolicy.id == policy_id).first()
+    if not policy:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Retention policy not found"
+        )
+    
+    db.delete(policy)
+    db.commit()
+    
+    return {"message": "Retention policy deleted successfully"}
+
+@router.get("/report", response_model=List[RetentionReportItem])
+async def get_retention_report(db: Session = Depends(get_db)):
+    """Dry run: what the purge job would delete right now, per policy"""
+    return retention_report(db)
+
+@router.get("/stats")
+async def get_retention_stats():
+    """Progress of the purge job in this process"""
+    return {
+        "global_retain_days": settings.screenshot_retention_days or None,
+        "in_process": settings.screenshot_retention_in_process,
+        **retention_job.stats(),
+    }
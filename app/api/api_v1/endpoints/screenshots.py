@@ -1,23 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Request, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter, ValidationError
 from datetime import datetime, date
 import os
-import uuid
+import asyncio
 import logging
-from PIL import Image
 import base64
 import io
 
 from app.core.database import get_db
 from app.core.config import settings
+from app.core.storage import storage
+from app.core.downloads import serve_file, screenshot_validators
+from app.core.pagination import keyset_page
+from app.core.screenshot_export import ScreenshotExport, EXPORT_FORMATS
+from app.core.uploads import receive_upload, UploadTooLargeError, UnsupportedImageError
+from app.core.image_pipeline import image_pipeline, server_timing_header, PipelineBusyError
+from app.core.screenshot_ingest import (
+    ingest_screenshot, ingest_screenshot_batch, BatchItem,
+    BATCH_ACCEPTED, BATCH_CREATED, BATCH_FAILED, BATCH_SKIPPED
+)
+from app.core.screenshot_worker import screenshot_worker, STATE_ACCEPTED
+from app.core.thumbnails import ensure_thumbnail, thumbnail_media_type
+from app.core.timelapse import ensure_timelapse, timelapse_frames, TIMELAPSE_MODES, TIMELAPSE_MEDIA_TYPE
+from app.core.blob_store import dedupe_stats
+from app.core.perceptual_hash import perceptual_hash_index
 from app.models.screenshot import Screenshot
 from app.models.employee import Employee
 from app.models.time_entry import TimeEntry
 from app.schemas.screenshot import (
     Screenshot as ScreenshotSchema,
-    ScreenshotUpload
+    ScreenshotUpload,
+    ScreenshotBatchMetadata,
+    ScreenshotBatchItem,
+    ScreenshotBatchResult
 )
 
 router = APIRouter()
@@ -28,6 +46,7 @@ os.makedirs(settings.upload_dir, exist_ok=True)
 
 @router.post("/", response_model=ScreenshotSchema, status_code=status.HTTP_201_CREATED)
 async def upload_screenshot(
+    response: Response,
     file: UploadFile = File(...),
     employee_id: int = Form(...),
     time_entry_id: Optional[int] = Form(None),
@@ -57,98 +76,195 @@ async def upload_screenshot(
                 detail="Time entry not found or doesn't belong to employee"
             )
     
-    # Validate file
-    if not file.content_type or not file.content_type.startswith('image/'):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="File must be an image"
-        )
-    
-    # Check file size
-    file_content = await file.read()
-    if len(file_content) > settings.max_screenshot_size:
+    # Stream the upload to a temp file, enforcing the size limit as bytes arrive
+    try:
+        upload = await receive_upload(file)
+    except UploadTooLargeError:
         raise HTTPException(
             status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
             detail=f"File size exceeds maximum allowed size of {settings.max_screenshot_size} bytes"
         )
-    
-    # Generate unique filename
-    file_extension = file.filename.split('.')[-1].lower()
-    if file_extension not in settings.allowed_screenshot_formats:
+    except UnsupportedImageError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"File format not allowed. Allowed formats: {settings.allowed_screenshot_formats}"
+            detail=f"File must be an image. Allowed formats: {settings.allowed_screenshot_formats}"
         )
     
-    unique_filename = f"{uuid.uuid4()}.{file_extension}"
-    file_path = os.path.join(settings.upload_dir, unique_filename)
-    
     try:
-        # Save file
-        with open(file_path, "wb") as f:
-            f.write(file_content)
-        
-        # Process image to get metadata
-        with Image.open(file_path) as img:
-            width, height = img.size
-            img_format = img.format
-            
-            # Compress image if needed
-            if img.format in ['JPEG', 'JPG']:
-                img.save(
-                    file_path, 
-                    format='JPEG', 
-                    quality=settings.screenshot_compression_quality,
-                    optimize=True
-                )
-        
-        # Get final file size after compression
-        final_file_size = os.path.getsize(file_path)
-        
-        # Create screenshot record
-        screenshot = Screenshot(
+        result = await ingest_screenshot(
+            db,
+            upload,
             employee_id=employee_id,
             time_entry_id=time_entry_id,
-            filename=unique_filename,
-            file_path=file_path,
-            file_size=final_file_size,
-            timestamp=datetime.utcnow(),
             permission_granted=permission_granted,
-            width=width,
-            height=height,
-            format=img_format,
             device_info=device_info
         )
-        
-        db.add(screenshot)
-        db.commit()
-        db.refresh(screenshot)
-        
-        logger.info(f"Screenshot uploaded for employee: {employee.email}, file: {unique_filename}")
-        
-        return screenshot
-        
+    except PipelineBusyError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Screenshot processing queue is full, retry later"
+        )
     except Exception as e:
-        # Clean up file if database operation fails
-        if os.path.exists(file_path):
-            os.remove(file_path)
         logger.error(f"Error uploading screenshot: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error processing screenshot"
         )
+    
+    screenshot = result.screenshot
+    if result.timings:
+        response.headers["Server-Timing"] = server_timing_header(result.timings)
+    
+    if result.skipped:
+        # Near-duplicate of the last capture; nothing was stored
+        logger.info(f"Skipped near-duplicate screenshot for employee: {employee.email}")
+        response.status_code = status.HTTP_200_OK
+        response.headers["X-Near-Duplicate-Of"] = str(screenshot.id)
+        return screenshot
+    
+    logger.info(f"Screenshot uploaded for employee: {employee.email}, file: {screenshot.filename}")
+    
+    if screenshot.processing_state == STATE_ACCEPTED:
+        screenshot_worker.wake()
+        response.status_code = status.HTTP_202_ACCEPTED
+    
+    return screenshot
+
+@router.post("/batch", response_model=ScreenshotBatchResult)
+async def upload_screenshot_batch(
+    files: List[UploadFile] = File(...),
+    employee_id: int = Form(...),
+    metadata: Optional[str] = Form(None),
+    db: Session = Depends(get_db)
+):
+    """Upload many screenshots of one employee in a single request.
+
+    ``metadata`` is an optional JSON array with one object per file, in the
+    same order (time_entry_id, permission_granted, device_info, captured_at).
+    Each file gets its own result; a bad file does not fail the others.
+    """
+    
+    if len(files) > settings.max_screenshot_batch_files:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.max_screenshot_batch_files} files per batch"
+        )
+    
+    try:
+        entries = TypeAdapter(List[ScreenshotBatchMetadata]).validate_json(metadata) \
+            if metadata else [ScreenshotBatchMetadata() for _ in files]
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid metadata: {e.errors()[0]['msg']}"
+        )
+    if len(entries) != len(files):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Metadata must have one entry per file"
+        )
+    
+    # Verify employee exists
+    employee = db.query(Employee).filter(Employee.id == employee_id).first()
+    if not employee:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Employee not found"
+        )
+    
+    # Verify all referenced time entries with one query
+    time_entry_ids = {entry.time_entry_id for entry in entries if entry.time_entry_id}
+    valid_time_entry_ids = {
+        row.id for row in db.query(TimeEntry.id).filter(
+            TimeEntry.id.in_(time_entry_ids),
+            TimeEntry.employee_id == employee_id
+        )
+    } if time_entry_ids else set()
+    
+    items = []
+    for file, entry in zip(files, entries):
+        item = BatchItem(
+            upload=None,
+            time_entry_id=entry.time_entry_id,
+            permission_granted=entry.permission_granted,
+            device_info=entry.device_info,
+            captured_at=entry.captured_at
+        )
+        items.append(item)
+        if entry.time_entry_id and entry.time_entry_id not in valid_time_entry_ids:
+            item.status = BATCH_FAILED
+            item.detail = "Time entry not found or doesn't belong to employee"
+            continue
+        try:
+            item.upload = await receive_upload(file)
+        except UploadTooLargeError:
+            item.status = BATCH_FAILED
+            item.detail = f"File size exceeds maximum allowed size of {settings.max_screenshot_size} bytes"
+        except UnsupportedImageError:
+            item.status = BATCH_FAILED
+            item.detail = f"File must be an image. Allowed formats: {settings.allowed_screenshot_formats}"
+    
+    try:
+        await ingest_screenshot_batch(db, employee_id, items)
+    except Exception as e:
+        logger.error(f"Error uploading screenshot batch: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error processing screenshots"
+        )
+    
+    if any(item.status == BATCH_ACCEPTED for item in items):
+        screenshot_worker.wake()
+    
+    stored = sum(1 for item in items if item.status in (BATCH_CREATED, BATCH_ACCEPTED))
+    skipped = sum(1 for item in items if item.status == BATCH_SKIPPED)
+    failed = sum(1 for item in items if item.status == BATCH_FAILED)
+    logger.info(
+        f"Screenshot batch uploaded for employee: {employee.email}, {stored} of {len(items)} stored, "
+        f"{skipped} skipped as near-duplicates"
+    )
+    
+    return ScreenshotBatchResult(
+        items=[
+            ScreenshotBatchItem(
+                index=index,
+                filename=file.filename,
+                status=item.status,
+                screenshot=item.screenshot,
+                detail=item.detail
+            )
+            for index, (file, item) in enumerate(zip(files, items))
+        ],
+        stored=stored,
+        skipped=skipped,
+        failed=failed
+    )
+
+@router.get("/pipeline/stats")
+async def get_pipeline_stats():
+    """Per-stage timings of the image processing pool"""
+    return image_pipeline.stats()
+
+@router.get("/storage/stats")
+async def get_storage_stats(db: Session = Depends(get_db)):
+    """Logical vs physical screenshot storage and the resulting dedupe ratio"""
+    return dedupe_stats(db)
 
 @router.get("/employee/{employee_id}", response_model=List[ScreenshotSchema])
 async def get_employee_screenshots(
     employee_id: int,
+    response: Response,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
     permission_granted: Optional[bool] = None,
+    cursor: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db)
 ):
-    """Get screenshots for a specific employee by time window"""
+    """Get screenshots for a specific employee by time window.
+    
+    Pass the X-Next-Cursor header of a page as ``cursor`` to get the next one."""
     
     query = db.query(Screenshot).filter(Screenshot.employee_id == employee_id)
     
@@ -162,15 +278,101 @@ async def get_employee_screenshots(
     if permission_granted is not None:
         query = query.filter(Screenshot.permission_granted == permission_granted)
     
-    # Order by timestamp descending
-    query = query.order_by(Screenshot.timestamp.desc())
+    # Newest first, by (timestamp, id)
+    return keyset_page(
+        query, Screenshot.timestamp, Screenshot.id, response, cursor, skip, limit,
+        key=lambda screenshot: (screenshot.timestamp, screenshot.id)
+    )
+
+@router.get("/employee/{employee_id}/export")
+async def export_employee_screenshots(
+    employee_id: int,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    permission_granted: Optional[bool] = None,
+    format: str = "zip",
+    db: Session = Depends(get_db)
+):
+    """Stream every screenshot of an employee in a date range (inclusive) as a
+    ZIP or TAR archive, with a manifest.csv of their metadata"""
     
-    screenshots = query.offset(skip).limit(limit).all()
-    return screenshots
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown archive format. Allowed formats: {list(EXPORT_FORMATS)}"
+        )
+    
+    # Verify employee exists
+    employee = db.query(Employee).filter(Employee.id == employee_id).first()
+    if not employee:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Employee not found"
+        )
+    
+    export = ScreenshotExport(employee_id, start_date, end_date, permission_granted, format)
+    logger.info(f"Exporting screenshots for employee: {employee.email} as {format}")
+    
+    return StreamingResponse(
+        iter(export),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{export.filename()}"'}
+    )
+
+@router.get("/time-entry/{time_entry_id}/timelapse")
+async def get_time_entry_timelapse(
+    time_entry_id: int,
+    request: Request,
+    mode: str = "animation",
+    db: Session = Depends(get_db)
+):
+    """All screenshots of a time entry as one downscaled animated WebP or
+    contact-sheet mosaic, rendered once per screenshot set and then cached"""
+    
+    if mode not in TIMELAPSE_MODES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown timelapse mode. Allowed modes: {list(TIMELAPSE_MODES)}"
+        )
+    
+    # Verify time entry exists
+    time_entry = db.query(TimeEntry).filter(TimeEntry.id == time_entry_id).first()
+    if not time_entry:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Time entry not found"
+        )
+    
+    screenshots = timelapse_frames(db, time_entry_id)
+    if not screenshots:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No screenshots for this time entry"
+        )
+    
+    try:
+        path, key = await ensure_timelapse(time_entry_id, screenshots, mode)
+    except PipelineBusyError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Screenshot processing queue is full, retry later"
+        )
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Screenshot files not found in storage"
+        )
+    
+    return await serve_file(
+        request,
+        path,
+        media_type=TIMELAPSE_MEDIA_TYPE,
+        etag=f'"{key}"'
+    )
 
 @router.get("/{screenshot_id}/download")
-async def download_screenshot(screenshot_id: int, db: Session = Depends(get_db)):
-    """Download screenshot file"""
+async def download_screenshot(screenshot_id: int, request: Request, db: Session = Depends(get_db)):
+    """Download screenshot file, honouring conditional and Range requests"""
     
     screenshot = db.query(Screenshot).filter(Screenshot.id == screenshot_id).first()
     if not screenshot:
@@ -179,14 +381,90 @@ async def download_screenshot(screenshot_id: int, db: Session = Depends(get_db))
             detail="Screenshot not found"
         )
     
-    if not os.path.exists(screenshot.file_path):
+    etag, last_modified = screenshot_validators(screenshot)
+    return await serve_file(
+        request,
+        screenshot.file_path,
+        media_type='image/' + screenshot.format.lower(),
+        filename=screenshot.filename,
+        etag=etag,
+        last_modified=last_modified,
+        offset=screenshot.pack_offset or 0,
+        length=screenshot.pack_length
+    )
+
+@router.get("/{screenshot_id}/thumbnail")
+async def get_screenshot_thumbnail(
+    screenshot_id: int,
+    request: Request,
+    size: str = "small",
+    db: Session = Depends(get_db)
+):
+    """Serve a downscaled derivative, generating it once on first request"""
+    
+    if size not in settings.thumbnail_sizes:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown thumbnail size. Allowed sizes: {list(settings.thumbnail_sizes)}"
+        )
+    
+    screenshot = db.query(Screenshot).filter(Screenshot.id == screenshot_id).first()
+    if not screenshot:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Screenshot file not found on disk"
+            detail="Screenshot not found"
         )
     
-    return FileResponse(
-        screenshot.file_path,
-        filename=screenshot.filename,
-        media_type='image/' + screenshot.format.lower()
-    )
\ No newline at end of file
+    if not await asyncio.to_thread(storage.exists, screenshot.file_path):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Screenshot file not found in storage"
+        )
+    
+    try:
+        path = await ensure_thumbnail(screenshot.file_path, size, screenshot.pack_offset, screenshot.pack_length)
+    except PipelineBusyError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Screenshot processing queue is full, retry later"
+        )
+    
+    return await serve_file(
+        request,
+        path,
+        media_type=thumbnail_media_type(),
+        cache_control=f"public, max-age={settings.thumbnail_cache_max_age}, immutable"
+    )
+
+@router.get("/{screenshot_id}/similar", response_model=List[ScreenshotSchema])
+async def get_similar_screenshots(
+    screenshot_id: int,
+    max_distance: int = 8,
+    limit: int = 50,
+    same_employee: bool = True,
+    db: Session = Depends(get_db)
+):
+    """Find screenshots whose perceptual hash is close to this one, closest first"""
+    
+    screenshot = db.query(Screenshot).filter(Screenshot.id == screenshot_id).first()
+    if not screenshot:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Screenshot not found"
+        )
+    
+    if screenshot.perceptual_hash is None:
+        return []
+    
+    perceptual_hash_index.refresh(db)
+    matches = perceptual_hash_index.search(
+        screenshot.perceptual_hash,
+        max_distance,
+        limit + 1,
+        employee_id=screenshot.employee_id if same_employee else None
+    )
+    ids = [match_id for match_id, _ in matches if match_id != screenshot_id][:limit]
+    
+    # Deleted screenshots drop out here
+    found = {row.id: row for row in db.query(Screenshot).filter(Screenshot.id.in_(ids))}
+    return [found[match_id] for match_id in ids if match_id in found]
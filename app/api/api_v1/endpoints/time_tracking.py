@@ -1,11 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import select, update
 from typing import List, Optional
 from datetime import datetime, date, timezone
 import logging
 
 from app.core.database import get_db
+from app.core.config import settings
+from app.core.pagination import keyset_page
+from app.core.rollups import add_entry
+from app.core.time_tracking import start_checks, open_session, close_session
+from app.core.time_entry_sync import sync_time_entries, SYNC_CREATED, SYNC_DUPLICATE
+from app.core.active_sessions import active_sessions, load_active_sessions
+from app.core.live_events import notify_session_started, notify_session_stopped
+from app.core.session_sweeper import session_sweeper, stale_session_report
+from app.core.time_entry_export import TimeEntryExport, EXPORT_FORMATS
 from app.models.time_entry import TimeEntry
 from app.models.employee import Employee
 from app.models.project import Project
@@ -14,6 +24,8 @@ from app.schemas.time_entry import (
     TimeEntry as TimeEntrySchema,
     TimeEntryStart,
     TimeEntryStop,
+    TimeEntrySync,
+    TimeEntrySyncResult,
     TimeEntryWithDetails
 )
 
@@ -24,52 +36,44 @@ logger = logging.getLogger(__name__)
 async def start_time_tracking(time_data: TimeEntryStart, db: Session = Depends(get_db)):
     """Start a new time tracking session"""
     
-    # Verify employee exists and is active
-    employee = db.query(Employee).filter(
-        Employee.id == time_data.employee_id,
-        Employee.status == "active"
-    ).first()
-    if not employee:
+    # Check employee status, project membership, task and open session in one query
+    checks = start_checks(db, time_data.employee_id, time_data.project_id, time_data.task_id)
+    # End the read: a refused start must not hold its pooled connection until
+    # the response has been sent, and the insert below starts its own transaction
+    db.rollback()
+    if checks.employee_email is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Employee not found or inactive"
         )
     
-    # Verify project exists
-    project = db.query(Project).filter(Project.id == time_data.project_id).first()
-    if not project:
+    if checks.project_name is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Project not found"
         )
     
-    # Verify task exists and belongs to project
-    task = db.query(Task).filter(
-        and_(Task.id == time_data.task_id, Task.project_id == time_data.project_id)
-    ).first()
-    if not task:
+    if not checks.is_member:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Task not found or doesn't belong to project"
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Employee not assigned to this project"
         )
     
-    # Check if employee has an active session
-    active_session = db.query(TimeEntry).filter(
-        and_(
-            TimeEntry.employee_id == time_data.employee_id,
-            TimeEntry.end_time.is_(None),
-            TimeEntry.is_active == True
+    if not checks.task_in_project:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Task not found or doesn't belong to project"
         )
-    ).first()
     
-    if active_session:
+    if checks.has_open_session:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Employee already has an active time tracking session"
         )
     
-    # Create new time entry
-    time_entry = TimeEntry(
+    # Create the session, unless the employee already has an open one
+    time_entry = open_session(
+        db,
         employee_id=time_data.employee_id,
         project_id=time_data.project_id,
         task_id=time_data.task_id,
@@ -78,67 +82,147 @@ async def start_time_tracking(time_data: TimeEntryStart, db: Session = Depends(g
         start_mac_address=time_data.mac_address,
         device_info=time_data.device_info
     )
+    if time_entry is None:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Employee already has an active time tracking session"
+        )
     
-    # Update employee device info
-    employee.last_ip_address = time_data.ip_address
-    employee.last_mac_address = time_data.mac_address
-    employee.device_info = time_data.device_info
+    # Update employee device info, if it changed
+    device = (time_data.ip_address, time_data.mac_address, time_data.device_info)
+    if device != (checks.last_ip_address, checks.last_mac_address, checks.device_info):
+        db.execute(update(Employee).where(Employee.id == time_data.employee_id).values(
+            last_ip_address=time_data.ip_address,
+            last_mac_address=time_data.mac_address,
+            device_info=time_data.device_info
+        ))
     
-    db.add(time_entry)
+    # Built from the RETURNING row, so nothing is reloaded after the commit
+    result = TimeEntrySchema.model_validate(time_entry)
+    session = TimeEntryWithDetails(
+        **result.model_dump(),
+        employee_name=checks.employee_name,
+        project_name=checks.project_name,
+        task_name=checks.task_name
+    )
+    # The other workers' registries hear of the session when it commits
+    notify_session_started(db, session)
     db.commit()
-    db.refresh(time_entry)
+    active_sessions.started(session)
     
-    logger.info(f"Started time tracking for employee: {employee.email}, project: {project.name}")
+    logger.info(f"Started time tracking for employee: {checks.employee_email}, project: {checks.project_name}")
     
-    return time_entry
+    return result
 
 @router.post("/stop", response_model=TimeEntrySchema)
 async def stop_time_tracking(stop_data: TimeEntryStop, db: Session = Depends(get_db)):
     """Stop the active time tracking session"""
     
-    # Find active session for employee
-    active_session = db.query(TimeEntry).filter(
-        and_(
-            TimeEntry.employee_id == stop_data.employee_id,
-            TimeEntry.end_time.is_(None),
-            TimeEntry.is_active == True
-        )
-    ).first()
+    # Close the active session, if there is one, in one statement
+    active_session = close_session(db, stop_data.employee_id, datetime.now(timezone.utc))
     
     if not active_session:
+        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No active time tracking session found for employee"
         )
     
-    # Update session with end time and calculate duration
-    end_time = datetime.now(timezone.utc)
-    active_session.end_time = end_time
-    duration = (end_time - active_session.start_time).total_seconds()
-    active_session.duration_seconds = int(duration)
-    active_session.is_active = False
+    # Count the session in the daily rollups, atomically with closing it
+    add_entry(db, active_session)
+    
+    result = TimeEntrySchema.model_validate(active_session)
+    notify_session_stopped(db, result)
+    db.commit()
+    active_sessions.stopped(result.employee_id, result.id)
+    
+    logger.info(f"Stopped time tracking for employee_id {stop_data.employee_id}, duration: {result.duration_seconds}s")
+    
+    return result
+
+@router.post("/sync", response_model=TimeEntrySyncResult)
+async def sync_offline_time_entries(sync_data: TimeEntrySync, db: Session = Depends(get_db)):
+    """Upload completed sessions recorded while the client was offline.
+    
+    Each entry carries a client-generated ``client_key``; an entry whose key
+    is already stored for the employee is reported as a duplicate with its
+    id, so a batch can be replayed safely after a lost response. Entries
+    that are invalid or overlap a stored entry (or an earlier one of the
+    batch) are rejected one by one without failing the others."""
+    
+    if len(sync_data.entries) > settings.max_time_entry_sync_entries:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.max_time_entry_sync_entries} entries per sync"
+        )
+    
+    # Lock the employee row, so concurrent syncs of one employee take turns
+    # and cannot both pass the overlap check
+    employee_email = db.scalar(
+        select(Employee.email).where(Employee.id == sync_data.employee_id, Employee.status == "active")
+        .with_for_update(key_share=True)
+    )
+    if employee_email is None:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Employee not found or inactive"
+        )
     
+    items = sync_time_entries(db, sync_data.employee_id, sync_data.entries, datetime.now(timezone.utc))
     db.commit()
-    db.refresh(active_session)
     
-    employee = db.query(Employee).filter(Employee.id == stop_data.employee_id).first()
-    if employee:
-        logger.info(f"Stopped time tracking for employee: {employee.email}, duration: {duration}s")
-    else:
-        logger.info(f"Stopped time tracking for employee_id {stop_data.employee_id}, duration: {duration}s")
+    created = sum(1 for item in items if item.status == SYNC_CREATED)
+    duplicates = sum(1 for item in items if item.status == SYNC_DUPLICATE)
+    logger.info(
+        f"Synced offline time entries for employee: {employee_email}, "
+        f"{created} created, {duplicates} duplicates, {len(items) - created - duplicates} rejected"
+    )
+    
+    return TimeEntrySyncResult(
+        items=items,
+        created=created,
+        duplicates=duplicates,
+        rejected=len(items) - created - duplicates
+    )
+
+@router.get("/active", response_model=List[TimeEntryWithDetails])
+async def get_active_sessions(db: Session = Depends(get_db)):
+    """Get all currently active time tracking sessions, oldest first.
+    
+    Served from the in-memory registry of open sessions; the database is only
+    read while the registry is not loaded."""
+    
+    if active_sessions.ready:
+        return Response(content=active_sessions.body(), media_type="application/json")
     
-    return active_session
+    return load_active_sessions(db)
+
+@router.get("/sweeper")
+async def get_sweeper_stats(db: Session = Depends(get_db)):
+    """Open sessions the stale session sweeper would close now, and what it
+    closed so far in this process"""
+    return {
+        "in_process": settings.session_sweep_in_process,
+        "stale": stale_session_report(db, datetime.now(timezone.utc)),
+        **session_sweeper.stats(),
+    }
 
 @router.get("/employee/{employee_id}", response_model=List[TimeEntryWithDetails])
 async def get_employee_time_entries(
     employee_id: int,
+    response: Response,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
+    cursor: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db)
 ):
-    """Get time entries for a specific employee (for payout calculations)"""
+    """Get time entries for a specific employee (for payout calculations).
+    
+    Pass the X-Next-Cursor header of a page as ``cursor`` to get the next one."""
     
     query = db.query(
         TimeEntry, Employee.name, Project.name, Task.name
@@ -153,10 +237,11 @@ async def get_employee_time_entries(
     if end_date:
         query = query.filter(TimeEntry.start_time <= end_date)
     
-    # Order by start time descending
-    query = query.order_by(TimeEntry.start_time.desc())
-    
-    time_entries = query.offset(skip).limit(limit).all()
+    # Newest first, by (start_time, id)
+    time_entries = keyset_page(
+        query, TimeEntry.start_time, TimeEntry.id, response, cursor, skip, limit,
+        key=lambda row: (row[0].start_time, row[0].id)
+    )
     
     result = []
     for entry, emp_name, proj_name, task_name in time_entries:
@@ -166,4 +251,46 @@ async def get_employee_time_entries(
         entry_dict['task_name'] = task_name
         result.append(TimeEntryWithDetails(**entry_dict))
     
-    return result
\ No newline at end of file
+    return result
+
+@router.get("/export")
+async def export_time_entries(
+    employee_id: Optional[int] = None,
+    project_id: Optional[int] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    format: str = "csv",
+    gzip: bool = False,
+    db: Session = Depends(get_db)
+):
+    """Stream every time entry in a date range (inclusive) with employee,
+    project and task names as CSV or NDJSON, gzipped on the fly if asked.
+    Unlike the listings this has no limit and runs in constant memory."""
+    
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown export format. Allowed formats: {list(EXPORT_FORMATS)}"
+        )
+    
+    if start_date and end_date and end_date < start_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="end_date must not be before start_date"
+        )
+    
+    # Verify employee exists
+    if employee_id is not None and not db.query(Employee.id).filter(Employee.id == employee_id).first():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Employee not found"
+        )
+    
+    export = TimeEntryExport(employee_id, project_id, start_date, end_date, format, gzip)
+    logger.info(f"Exporting time entries as {export.filename()}")
+    
+    return StreamingResponse(
+        iter(export),
+        media_type=export.media_type(),
+        headers={"Content-Disposition": f'attachment; filename="{export.filename()}"'}
+    )
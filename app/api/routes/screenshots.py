@@ -1,16 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Request, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime, date
 import os
-import uuid
+import asyncio
 import logging
-from PIL import Image
 import json
 
 from app.core.database import get_db
 from app.core.config import settings
+from app.core.storage import storage
+from app.core.downloads import serve_file, screenshot_validators
+from app.core.pagination import keyset_page
+from app.core.uploads import receive_upload, UploadTooLargeError, UnsupportedImageError
+from app.core.image_pipeline import server_timing_header, PipelineBusyError
+from app.core.screenshot_ingest import ingest_screenshot
+from app.core.screenshot_worker import screenshot_worker, STATE_ACCEPTED
+from app.core.thumbnails import remove_thumbnails
+from app.core.blob_store import release_blob, remove_released_blobs
+from app.core.screenshot_packs import release_pack_member
+from app.core.timelapse import invalidate_timelapses
 from app.models.screenshot import Screenshot
 from app.models.employee import Employee
 from app.models.time_entry import TimeEntry
@@ -27,6 +36,7 @@ os.makedirs(settings.upload_dir, exist_ok=True)
 
 @router.post("/", response_model=ScreenshotSchema, status_code=status.HTTP_201_CREATED)
 async def upload_screenshot(
+    response: Response,
     file: UploadFile = File(...),
     employee_id: int = Form(...),
     time_entry_id: Optional[int] = Form(None),
@@ -56,99 +66,76 @@ async def upload_screenshot(
                 detail="Time entry not found or doesn't belong to employee"
             )
     
-    # Validate file
-    if not file.content_type or not file.content_type.startswith('image/'):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="File must be an image"
-        )
-    
-    # Check file size
-    file_content = await file.read()
-    if len(file_content) > settings.max_screenshot_size:
+    # Stream the upload to a temp file, enforcing the size limit as bytes arrive
+    try:
+        upload = await receive_upload(file)
+    except UploadTooLargeError:
         raise HTTPException(
             status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
             detail=f"File size exceeds maximum allowed size of {settings.max_screenshot_size} bytes"
         )
-    
-    # Generate unique filename
-    file_extension = file.filename.split('.')[-1].lower()
-    if file_extension not in settings.allowed_screenshot_formats:
+    except UnsupportedImageError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"File format not allowed. Allowed formats: {settings.allowed_screenshot_formats}"
+            detail=f"File must be an image. Allowed formats: {settings.allowed_screenshot_formats}"
         )
     
-    unique_filename = f"{uuid.uuid4()}.{file_extension}"
-    file_path = os.path.join(settings.upload_dir, unique_filename)
-    
     try:
-        # Save file
-        with open(file_path, "wb") as f:
-            f.write(file_content)
-        
-        # Process image to get metadata
-        with Image.open(file_path) as img:
-            width, height = img.size
-            img_format = img.format
-            
-            # Compress image if needed
-            if img.format in ['JPEG', 'JPG']:
-                img.save(
-                    file_path, 
-                    format='JPEG', 
-                    quality=settings.screenshot_compression_quality,
-                    optimize=True
-                )
-        
-        # Get final file size after compression
-        final_file_size = os.path.getsize(file_path)
-        
-        # Create screenshot record
-        screenshot = Screenshot(
+        result = await ingest_screenshot(
+            db,
+            upload,
             employee_id=employee_id,
             time_entry_id=time_entry_id,
-            filename=unique_filename,
-            file_path=file_path,
-            file_size=final_file_size,
-            timestamp=datetime.utcnow(),
             permission_granted=permission_granted,
-            width=width,
-            height=height,
-            format=img_format,
             device_info=device_info
         )
-        
-        db.add(screenshot)
-        db.commit()
-        db.refresh(screenshot)
-        
-        logger.info(f"Screenshot uploaded for employee: {employee.email}, file: {unique_filename}")
-        
-        return screenshot
-        
+    except PipelineBusyError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Screenshot processing queue is full, retry later"
+        )
     except Exception as e:
-        # Clean up file if database operation fails
-        if os.path.exists(file_path):
-            os.remove(file_path)
         logger.error(f"Error uploading screenshot: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error processing screenshot"
         )
+    
+    screenshot = result.screenshot
+    if result.timings:
+        response.headers["Server-Timing"] = server_timing_header(result.timings)
+    
+    if result.skipped:
+        # Near-duplicate of the last capture; nothing was stored
+        logger.info(f"Skipped near-duplicate screenshot for employee: {employee.email}")
+        response.status_code = status.HTTP_200_OK
+        response.headers["X-Near-Duplicate-Of"] = str(screenshot.id)
+        return screenshot
+    
+    logger.info(f"Screenshot uploaded for employee: {employee.email}, file: {screenshot.filename}")
+    
+    if screenshot.processing_state == STATE_ACCEPTED:
+        screenshot_worker.wake()
+        response.status_code = status.HTTP_202_ACCEPTED
+    
+    return screenshot
 
 @router.get("/", response_model=List[ScreenshotSchema])
 async def get_screenshots(
+    response: Response,
     employee_id: Optional[int] = None,
     time_entry_id: Optional[int] = None,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
     permission_granted: Optional[bool] = None,
+    cursor: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db)
 ):
-    """Get screenshots with filtering options"""
+    """Get screenshots with filtering options.
+    
+    Pass the X-Next-Cursor header of a page as ``cursor`` to get the next one."""
     
     query = db.query(Screenshot)
     
@@ -168,11 +155,11 @@ async def get_screenshots(
     if permission_granted is not None:
         query = query.filter(Screenshot.permission_granted == permission_granted)
     
-    # Order by timestamp descending
-    query = query.order_by(Screenshot.timestamp.desc())
-    
-    screenshots = query.offset(skip).limit(limit).all()
-    return screenshots
+    # Newest first, by (timestamp, id)
+    return keyset_page(
+        query, Screenshot.timestamp, Screenshot.id, response, cursor, skip, limit,
+        key=lambda screenshot: (screenshot.timestamp, screenshot.id)
+    )
 
 @router.get("/{screenshot_id}", response_model=ScreenshotSchema)
 async def get_screenshot(screenshot_id: int, db: Session = Depends(get_db)):
@@ -188,8 +175,8 @@ async def get_screenshot(screenshot_id: int, db: Session = Depends(get_db)):
     return screenshot
 
 @router.get("/{screenshot_id}/download")
-async def download_screenshot(screenshot_id: int, db: Session = Depends(get_db)):
-    """Download screenshot file"""
+async def download_screenshot(screenshot_id: int, request: Request, db: Session = Depends(get_db)):
+    """Download screenshot file, honouring conditional and Range requests"""
     
     screenshot = db.query(Screenshot).filter(Screenshot.id == screenshot_id).first()
     if not screenshot:
@@ -198,40 +185,63 @@ async def download_screenshot(screenshot_id: int, db: Session = Depends(get_db))
             detail="Screenshot not found"
         )
     
-    if not os.path.exists(screenshot.file_path):
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Screenshot file not found on disk"
-        )
-    
-    return FileResponse(
+    etag, last_modified = screenshot_validators(screenshot)
+    return await serve_file(
+        request,
         screenshot.file_path,
+        media_type='image/' + screenshot.format.lower(),
         filename=screenshot.filename,
-        media_type='image/' + screenshot.format.lower()
+        etag=etag,
+        last_modified=last_modified,
+        offset=screenshot.pack_offset or 0,
+        length=screenshot.pack_length
     )
 
 @router.delete("/{screenshot_id}", status_code=status.HTTP_200_OK)
 async def delete_screenshot(screenshot_id: int, db: Session = Depends(get_db)):
     """Delete screenshot and its file"""
     
-    screenshot = db.query(Screenshot).filter(Screenshot.id == screenshot_id).first()
+    # Lock the row, so an archive run or near-duplicate collapse cannot repoint it meanwhile
+    screenshot = db.query(Screenshot).filter(Screenshot.id == screenshot_id).with_for_update().first()
     if not screenshot:
+        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Screenshot not found"
         )
+    file_path, pack_id, pack_offset, content_hash = (
+        screenshot.file_path, screenshot.pack_id, screenshot.pack_offset, screenshot.content_hash
+    )
+    time_entry_id, filename = screenshot.time_entry_id, screenshot.filename
+    
+    # Delete from database and drop the blob (or pack) reference; the file goes away with the last one
+    db.delete(screenshot)
+    db.flush()
+    released_hash = None
+    freed_path = None
+    if pack_id:
+        freed_path = release_pack_member(db, pack_id)
+    elif content_hash:
+        released_hash = content_hash if release_blob(db, content_hash, defer=True) else None
+    else:
+        freed_path = file_path
+    db.commit()
     
-    # Delete file from disk
-    if os.path.exists(screenshot.file_path):
+    # Files are only removed once the delete is committed
+    if pack_id:
+        await asyncio.to_thread(remove_thumbnails, file_path, pack_offset)
+    if released_hash:
+        await asyncio.to_thread(remove_released_blobs, db, [released_hash])
+    if freed_path:
         try:
-            os.remove(screenshot.file_path)
+            await asyncio.to_thread(storage.delete, freed_path)
         except Exception as e:
             logger.error(f"Error deleting screenshot file: {str(e)}")
+        await asyncio.to_thread(remove_thumbnails, freed_path)
     
-    # Delete from database
-    db.delete(screenshot)
-    db.commit()
+    if time_entry_id:
+        await asyncio.to_thread(invalidate_timelapses, time_entry_id)
     
-    logger.info(f"Deleted screenshot: {screenshot.filename}")
+    logger.info(f"Deleted screenshot: {filename}")
     
     return {"message": "Screenshot deleted successfully"}
\ No newline at end of file
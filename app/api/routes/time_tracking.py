@@ -1,11 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from sqlalchemy import or_, update
 from typing import List, Optional
 from datetime import datetime, date
 import logging
 
 from app.core.database import get_db
+from app.core.pagination import keyset_page
+from app.core.rollups import add_entry
+from app.core.time_tracking import start_checks, open_session, close_session
+from app.core.active_sessions import active_sessions, load_active_sessions
+from app.core.live_events import notify_session_started, notify_session_stopped
 from app.models.time_entry import TimeEntry
 from app.models.employee import Employee
 from app.models.project import Project
@@ -24,58 +29,45 @@ logger = logging.getLogger(__name__)
 async def start_time_tracking(time_data: TimeEntryStart, db: Session = Depends(get_db)):
     """Start a new time tracking session"""
     
-    # Verify employee exists and is active
-    employee = db.query(Employee).filter(
-        and_(Employee.id == time_data.employee_id, Employee.is_active == True)
-    ).first()
-    if not employee:
+    # Check employee status, project membership, task and open session in one query
+    checks = start_checks(db, time_data.employee_id, time_data.project_id, time_data.task_id)
+    # End the read: a refused start must not hold its pooled connection until
+    # the response has been sent, and the insert below starts its own transaction
+    db.rollback()
+    if checks.employee_email is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Employee not found or inactive"
         )
     
-    # Verify project exists and employee is assigned
-    project = db.query(Project).filter(Project.id == time_data.project_id).first()
-    if not project:
+    if checks.project_name is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Project not found"
         )
     
     # Check if employee is assigned to project
-    if employee not in project.employees:
+    if not checks.is_member:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Employee not assigned to this project"
         )
     
-    # Verify task exists and belongs to project
-    task = db.query(Task).filter(
-        and_(Task.id == time_data.task_id, Task.project_id == time_data.project_id)
-    ).first()
-    if not task:
+    if not checks.task_in_project:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Task not found or doesn't belong to project"
         )
     
-    # Check if employee has an active session
-    active_session = db.query(TimeEntry).filter(
-        and_(
-            TimeEntry.employee_id == time_data.employee_id,
-            TimeEntry.end_time.is_(None),
-            TimeEntry.is_active == True
-        )
-    ).first()
-    
-    if active_session:
+    if checks.has_open_session:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Employee already has an active time tracking session"
         )
     
-    # Create new time entry
-    time_entry = TimeEntry(
+    # Create the session, unless the employee already has an open one
+    time_entry = open_session(
+        db,
         employee_id=time_data.employee_id,
         project_id=time_data.project_id,
         task_id=time_data.task_id,
@@ -84,84 +76,92 @@ async def start_time_tracking(time_data: TimeEntryStart, db: Session = Depends(g
         start_mac_address=time_data.mac_address,
         device_info=time_data.device_info
     )
+    if time_entry is None:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Employee already has an active time tracking session"
+        )
     
-    # Update employee device info
-    employee.last_ip_address = time_data.ip_address
-    employee.last_mac_address = time_data.mac_address
-    employee.device_info = time_data.device_info
-    
-    db.add(time_entry)
+    # Update employee device info, if it changed
+    device = (time_data.ip_address, time_data.mac_address, time_data.device_info)
+    if device != (checks.last_ip_address, checks.last_mac_address, checks.device_info):
+        db.execute(update(Employee).where(Employee.id == time_data.employee_id).values(
+            last_ip_address=time_data.ip_address,
+            last_mac_address=time_data.mac_address,
+            device_info=time_data.device_info
+        ))
+    
+    result = TimeEntrySchema.model_validate(time_entry)
+    session = TimeEntryWithDetails(
+        **result.model_dump(),
+        employee_name=checks.employee_name,
+        project_name=checks.project_name,
+        task_name=checks.task_name
+    )
+    # The other workers' registries hear of the session when it commits
+    notify_session_started(db, session)
     db.commit()
-    db.refresh(time_entry)
+    active_sessions.started(session)
     
-    logger.info(f"Started time tracking for employee: {employee.email}, project: {project.name}")
+    logger.info(f"Started time tracking for employee: {checks.employee_email}, project: {checks.project_name}")
     
-    return time_entry
+    return result
 
 @router.post("/stop", response_model=TimeEntrySchema)
 async def stop_time_tracking(stop_data: TimeEntryStop, db: Session = Depends(get_db)):
     """Stop the active time tracking session"""
     
-    # Find active session for employee
-    active_session = db.query(TimeEntry).filter(
-        and_(
-            TimeEntry.employee_id == stop_data.employee_id,
-            TimeEntry.end_time.is_(None),
-            TimeEntry.is_active == True
-        )
-    ).first()
+    # Close the active session, if there is one, in one statement
+    active_session = close_session(db, stop_data.employee_id, datetime.utcnow())
     
     if not active_session:
+        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No active time tracking session found for employee"
         )
     
-    # Update session with end time and calculate duration
-    end_time = datetime.utcnow()
-    active_session.end_time = end_time
-    duration = (end_time - active_session.start_time).total_seconds()
-    active_session.duration_seconds = int(duration)
+    # Count the session in the daily rollups, atomically with closing it
+    add_entry(db, active_session)
+    notify_session_stopped(db, TimeEntrySchema.model_validate(active_session))
     
     db.commit()
+    active_sessions.stopped(active_session.employee_id, active_session.id)
     db.refresh(active_session)
     
     employee = db.query(Employee).filter(Employee.id == stop_data.employee_id).first()
-    logger.info(f"Stopped time tracking for employee: {employee.email}, duration: {duration}s")
+    logger.info(f"Stopped time tracking for employee: {employee.email}, duration: {active_session.duration_seconds}s")
     
     return active_session
 
 @router.get("/active", response_model=List[TimeEntryWithDetails])
 async def get_active_sessions(db: Session = Depends(get_db)):
-    """Get all currently active time tracking sessions"""
+    """Get all currently active time tracking sessions, oldest first.
     
-    active_sessions = db.query(
-        TimeEntry, Employee.name, Project.name, Task.name
-    ).join(Employee).join(Project).join(Task).filter(
-        and_(TimeEntry.end_time.is_(None), TimeEntry.is_active == True)
-    ).all()
+    Served from the in-memory registry of open sessions; the database is only
+    read while the registry is not loaded."""
     
-    result = []
-    for session, emp_name, proj_name, task_name in active_sessions:
-        session_dict = session.__dict__.copy()
-        session_dict['employee_name'] = emp_name
-        session_dict['project_name'] = proj_name
-        session_dict['task_name'] = task_name
-        result.append(TimeEntryWithDetails(**session_dict))
+    if active_sessions.ready:
+        return Response(content=active_sessions.body(), media_type="application/json")
     
-    return result
+    return load_active_sessions(db)
 
 @router.get("/", response_model=List[TimeEntryWithDetails])
 async def get_time_entries(
+    response: Response,
     employee_id: Optional[int] = None,
     project_id: Optional[int] = None,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
+    cursor: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db)
 ):
-    """Get time entries with filtering options"""
+    """Get time entries with filtering options.
+    
+    Pass the X-Next-Cursor header of a page as ``cursor`` to get the next one."""
     
     query = db.query(
         TimeEntry, Employee.name, Project.name, Task.name
@@ -180,10 +180,11 @@ async def get_time_entries(
     if end_date:
         query = query.filter(TimeEntry.start_time <= end_date)
     
-    # Order by start time descending
-    query = query.order_by(TimeEntry.start_time.desc())
-    
-    time_entries = query.offset(skip).limit(limit).all()
+    # Newest first, by (start_time, id)
+    time_entries = keyset_page(
+        query, TimeEntry.start_time, TimeEntry.id, response, cursor, skip, limit,
+        key=lambda row: (row[0].start_time, row[0].id)
+    )
     
     result = []
     for entry, emp_name, proj_name, task_name in time_entries:
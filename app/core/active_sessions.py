@@ -0,0 +1,116 @@
+import time
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal
+from app.core.live_events import live_events, SESSION_STARTED, SESSION_STOPPED
+from app.core.time_tracking import open_session_filter
+from app.models.time_entry import TimeEntry
+from app.models.employee import Employee
+from app.models.project import Project
+from app.models.task import Task
+from app.schemas.time_entry import TimeEntryWithDetails
+
+logger = logging.getLogger(__name__)
+
+_session_list = TypeAdapter(List[TimeEntryWithDetails])
+
+
+def load_active_sessions(db: Session) -> List[TimeEntryWithDetails]:
+    """Every open session with employee, project and task names"""
+    rows = db.execute(
+        select(TimeEntry, Employee.name, Project.name, Task.name)
+        .join(Employee, Employee.id == TimeEntry.employee_id)
+        .join(Project, Project.id == TimeEntry.project_id)
+        .join(Task, Task.id == TimeEntry.task_id)
+        .where(open_session_filter())
+        .order_by(TimeEntry.start_time, TimeEntry.id)
+    ).all()
+    result = []
+    for entry, employee_name, project_name, task_name in rows:
+        entry_dict = entry.__dict__.copy()
+        entry_dict['employee_name'] = employee_name
+        entry_dict['project_name'] = project_name
+        entry_dict['task_name'] = task_name
+        result.append(TimeEntryWithDetails(**entry_dict))
+    return result
+
+
+class ActiveSessionRegistry:
+    """Process-local copy of the open time tracking sessions.
+
+    Loaded once the worker's live events listener is connected and then
+    kept current without reading the table again: the start and stop
+    handlers apply their own change as soon as it is committed, and the
+    ``session_started`` / ``session_stopped`` events they publish bring the
+    changes of the other workers. Applying an event twice is harmless.
+
+    While the listener is disconnected the registry is not ready and
+    callers read the database instead.
+
+    The JSON body of ``GET /time-entries/active`` is rendered once per change
+    and then served as is to every poll.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self._sessions: Dict[int, TimeEntryWithDetails] = {}  # by employee_id
+        self._body: Optional[bytes] = None
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def started(self, session: TimeEntryWithDetails) -> None:
+        self._sessions[session.employee_id] = session
+        self._body = None
+
+    def stopped(self, employee_id: int, time_entry_id: int) -> None:
+        current = self._sessions.get(employee_id)
+        if current is not None and current.id == time_entry_id:
+            del self._sessions[employee_id]
+            self._body = None
+
+    def sessions(self) -> List[TimeEntryWithDetails]:
+        return sorted(self._sessions.values(), key=lambda session: (session.start_time, session.id))
+
+    def body(self) -> bytes:
+        """The open sessions as a JSON array, oldest first"""
+        if self._body is None:
+            self._body = _session_list.dump_json(self.sessions())
+        return self._body
+
+    def handle(self, event: dict) -> None:
+        if event["type"] == SESSION_STARTED:
+            self.started(TimeEntryWithDetails.model_validate(event["session"]))
+        elif event["type"] == SESSION_STOPPED:
+            self.stopped(event["session"]["employee_id"], event["session"]["id"])
+
+    def _load(self) -> List[TimeEntryWithDetails]:
+        db = SessionLocal()
+        try:
+            return load_active_sessions(db)
+        finally:
+            db.close()
+
+    async def reload(self) -> None:
+        started = time.perf_counter()
+        sessions = await asyncio.to_thread(self._load)
+        self._sessions = {session.employee_id: session for session in sessions}
+        self._body = None
+        self.ready = True
+        logger.info(
+            f"Active sessions: loaded {len(self._sessions)} open sessions "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+
+    def disconnected(self) -> None:
+        self.ready = False
+
+
+active_sessions = ActiveSessionRegistry()
+live_events.add_consumer(active_sessions)
@@ -0,0 +1,167 @@
+import logging
+from typing import Iterable, List, Optional
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.storage import storage
+from app.core.thumbnails import remove_thumbnails
+from app.core.upload_layout import storage_path
+from app.models.screenshot import Screenshot
+from app.models.screenshot_blob import ScreenshotBlob
+from app.models.screenshot_pack import ScreenshotPack
+
+logger = logging.getLogger(__name__)
+
+_BLOB_COLUMNS = (
+    ScreenshotBlob.content_hash,
+    ScreenshotBlob.file_path,
+    ScreenshotBlob.file_size,
+    ScreenshotBlob.ref_count,
+    ScreenshotBlob.width,
+    ScreenshotBlob.height,
+    ScreenshotBlob.format,
+    ScreenshotBlob.perceptual_hash,
+)
+
+
+def blob_path(content_hash: str, extension: str) -> str:
+    """Where the file for a content hash is stored"""
+    return storage_path(f"{content_hash}.{extension}")
+
+
+def acquire_blob(db: Session, content_hash: str):
+    """Take a reference on an existing blob; returns its row or None.
+
+    The UPDATE locks the blob row until the caller's transaction ends, which
+    serialises it against ``release_blob`` removing the same blob.
+    """
+    return db.execute(
+        update(ScreenshotBlob)
+        .where(ScreenshotBlob.content_hash == content_hash)
+        .values(ref_count=ScreenshotBlob.ref_count + 1)
+        .returning(*_BLOB_COLUMNS)
+    ).first()
+
+
+def register_blob(
+    db: Session,
+    content_hash: str,
+    file_path: str,
+    file_size: int,
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+    image_format: Optional[str] = None,
+    perceptual_hash: Optional[int] = None,
+):
+    """Record a newly stored blob with one reference.
+
+    If a concurrent upload of the same content registered it first, this
+    just takes another reference on that row.
+    """
+    statement = insert(ScreenshotBlob).values(
+        content_hash=content_hash,
+        file_path=file_path,
+        file_size=file_size,
+        ref_count=1,
+        width=width,
+        height=height,
+        format=image_format,
+        perceptual_hash=perceptual_hash,
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[ScreenshotBlob.content_hash],
+        set_={"ref_count": ScreenshotBlob.ref_count + 1},
+    )
+    return db.execute(statement.returning(*_BLOB_COLUMNS)).first()
+
+
+def release_blob(db: Session, content_hash: str, count: int = 1, defer: bool = False) -> Optional[str]:
+    """Drop ``count`` references; returns the blob's file path if they were the last.
+
+    The row is deleted in the caller's transaction and the caller must unlink
+    the returned path before committing, while the row lock still keeps new
+    uploads of the same content waiting.
+
+    With ``defer`` the row is kept without references instead, and the caller
+    commits first and then removes the file with ``remove_released_blobs``:
+    if the commit fails, the rows still pointing at the file keep it.
+    """
+    row = db.execute(
+        update(ScreenshotBlob)
+        .where(ScreenshotBlob.content_hash == content_hash)
+        .values(ref_count=ScreenshotBlob.ref_count - count)
+        .returning(ScreenshotBlob.ref_count, ScreenshotBlob.file_path)
+    ).first()
+    if row is None or row.ref_count > 0:
+        return None
+    if not defer:
+        db.execute(delete(ScreenshotBlob).where(ScreenshotBlob.content_hash == content_hash))
+    return row.file_path
+
+
+def released_blobs(db: Session, limit: int = 1000) -> List[str]:
+    """Hashes of blobs released with ``defer`` whose file was never removed
+    (the process stopped between the commit and the removal)"""
+    return db.scalars(
+        select(ScreenshotBlob.content_hash).where(ScreenshotBlob.ref_count <= 0).limit(limit)
+    ).all()
+
+
+def remove_released_blobs(db: Session, content_hashes: Iterable[str]) -> int:
+    """Remove blobs released with ``defer`` after that release was committed,
+    one short transaction each; returns the number of files removed.
+
+    A blob referenced again in the meantime (an upload of the same content)
+    is kept. Otherwise its row is deleted and the file and thumbnails
+    unlinked before the commit, under the row lock, like ``release_blob``;
+    if the file cannot be removed the row stays for a later attempt.
+    """
+    removed = 0
+    for content_hash in content_hashes:
+        file_path = db.scalar(
+            delete(ScreenshotBlob)
+            .where(ScreenshotBlob.content_hash == content_hash, ScreenshotBlob.ref_count <= 0)
+            .returning(ScreenshotBlob.file_path)
+        )
+        if file_path is None:
+            db.rollback()
+            continue
+        try:
+            storage.delete(file_path)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error deleting released blob {file_path}: {str(e)}")
+            continue
+        remove_thumbnails(file_path)
+        db.commit()
+        removed += 1
+    return removed
+
+
+def dedupe_stats(db: Session) -> dict:
+    """Logical vs physical storage used by screenshots"""
+    screenshots, logical_bytes = db.query(
+        func.count(Screenshot.id), func.coalesce(func.sum(Screenshot.file_size), 0)
+    ).one()
+    blobs, blob_bytes = db.query(
+        func.count(ScreenshotBlob.content_hash), func.coalesce(func.sum(ScreenshotBlob.file_size), 0)
+    ).one()
+    # Screenshots stored before deduplication each own their file
+    legacy_bytes = db.query(func.coalesce(func.sum(Screenshot.file_size), 0)).filter(
+        Screenshot.content_hash.is_(None),
+        Screenshot.pack_id.is_(None)
+    ).scalar()
+    packs, pack_bytes = db.query(
+        func.count(ScreenshotPack.id), func.coalesce(func.sum(ScreenshotPack.file_size), 0)
+    ).one()
+    physical_bytes = blob_bytes + legacy_bytes + pack_bytes
+    return {
+        "screenshots": screenshots,
+        "blobs": blobs,
+        "packs": packs,
+        "logical_bytes": int(logical_bytes),
+        "physical_bytes": int(physical_bytes),
+        "dedupe_ratio": round(logical_bytes / physical_bytes, 3) if physical_bytes else 1.0,
+    }
@@ -17,11 +17,116 @@ class Settings(BaseSettings):
     # File uploads
     upload_dir: str = os.getenv("UPLOAD_DIR", "uploads")
     max_screenshot_size: int = int(os.getenv("MAX_SCREENSHOT_SIZE", "5242880"))  # 5MB
+    max_screenshot_batch_files: int = int(os.getenv("MAX_SCREENSHOT_BATCH_FILES", "50"))
+    upload_chunk_size: int = int(os.getenv("UPLOAD_CHUNK_SIZE", "65536"))  # 64KB
+    # "sharded" fans files out as <upload_dir>/ab/cd/<name>, "flat" keeps one directory
+    upload_layout: str = os.getenv("UPLOAD_LAYOUT", "sharded")
+    upload_shard_depth: int = int(os.getenv("UPLOAD_SHARD_DEPTH", "2"))
+    
+    # Screenshot storage: "local" keeps files under upload_dir, "s3" stores them in an
+    # S3-compatible bucket (upload_dir is then only used to stage uploads for processing)
+    storage_backend: str = os.getenv("STORAGE_BACKEND", "local")
+    s3_bucket: str = os.getenv("S3_BUCKET", "screenshots")
+    s3_prefix: str = os.getenv("S3_PREFIX", "")
+    s3_endpoint_url: Optional[str] = os.getenv("S3_ENDPOINT_URL")  # e.g. http://localhost:9000 for MinIO
+    s3_region: Optional[str] = os.getenv("S3_REGION")
+    s3_access_key_id: Optional[str] = os.getenv("S3_ACCESS_KEY_ID")
+    s3_secret_access_key: Optional[str] = os.getenv("S3_SECRET_ACCESS_KEY")
+    s3_max_pool_connections: int = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "50"))
+    s3_multipart_threshold: int = int(os.getenv("S3_MULTIPART_THRESHOLD", "8388608"))  # 8MB
+    s3_multipart_chunksize: int = int(os.getenv("S3_MULTIPART_CHUNKSIZE", "8388608"))  # 8MB
+    s3_multipart_concurrency: int = int(os.getenv("S3_MULTIPART_CONCURRENCY", "4"))
+    
+    # Hand screenshot downloads to the front proxy instead of streaming them from Python:
+    # "x-accel-redirect" (nginx; DOWNLOAD_OFFLOAD_PREFIX is an internal location mapped to
+    # upload_dir or the bucket), "x-sendfile" (Apache/lighttpd, local storage only) or "none"
+    download_offload: str = os.getenv("DOWNLOAD_OFFLOAD", "none")
+    download_offload_prefix: str = os.getenv("DOWNLOAD_OFFLOAD_PREFIX", "/protected-uploads")
     
     # Screenshot settings
     screenshot_compression_quality: int = 85
     allowed_screenshot_formats: list = ["jpg", "jpeg", "png"]
     
+    # Image processing pool (0 workers processes images inline)
+    image_pipeline_workers: int = int(os.getenv("IMAGE_PIPELINE_WORKERS", "2"))
+    image_pipeline_queue_depth: int = int(os.getenv("IMAGE_PIPELINE_QUEUE_DEPTH", "32"))
+    
+    # Screenshot derivatives: size name -> max width/height in pixels
+    thumbnail_sizes: dict = {"small": 320, "medium": 960}
+    thumbnail_format: str = os.getenv("THUMBNAIL_FORMAT", "webp")  # webp or jpeg
+    thumbnail_quality: int = 75
+    thumbnail_cache_max_age: int = 60 * 60 * 24 * 365  # 1 year
+    
+    # Near-duplicate screenshots (within this many differing perceptual hash bits of
+    # the employee's last capture): "store" keeps them, "pointer" stores a row that
+    # reuses the previous file, "skip" stores nothing and returns the previous capture
+    near_duplicate_policy: str = os.getenv("NEAR_DUPLICATE_POLICY", "store")
+    near_duplicate_max_distance: int = int(os.getenv("NEAR_DUPLICATE_MAX_DISTANCE", "4"))
+    
+    # Asynchronous screenshot post-processing (upload returns 202 once bytes are on disk)
+    screenshot_async_processing: bool = os.getenv("SCREENSHOT_ASYNC_PROCESSING", "false").lower() == "true"
+    screenshot_worker_in_process: bool = os.getenv("SCREENSHOT_WORKER_IN_PROCESS", "true").lower() == "true"
+    screenshot_worker_batch_size: int = int(os.getenv("SCREENSHOT_WORKER_BATCH_SIZE", "16"))
+    screenshot_worker_poll_interval: float = float(os.getenv("SCREENSHOT_WORKER_POLL_INTERVAL", "2"))
+    screenshot_processing_lease_seconds: int = int(os.getenv("SCREENSHOT_PROCESSING_LEASE_SECONDS", "300"))
+    screenshot_processing_max_attempts: int = int(os.getenv("SCREENSHOT_PROCESSING_MAX_ATTEMPTS", "3"))
+    
+    # Screenshots older than this are compacted into one pack file per employee-day
+    screenshot_archive_after_days: int = int(os.getenv("SCREENSHOT_ARCHIVE_AFTER_DAYS", "90"))
+    
+    # Screenshot retention: days kept unless a per-project or per-employee policy
+    # says otherwise (0 keeps them forever). The purge job deletes in batches and
+    # sleeps PAUSE_RATIO times as long as each batch took, to leave the database
+    # to foreground requests.
+    screenshot_retention_days: int = int(os.getenv("SCREENSHOT_RETENTION_DAYS", "0"))
+    screenshot_retention_in_process: bool = os.getenv("SCREENSHOT_RETENTION_IN_PROCESS", "false").lower() == "true"
+    screenshot_retention_interval: int = int(os.getenv("SCREENSHOT_RETENTION_INTERVAL", "3600"))
+    screenshot_retention_batch_size: int = int(os.getenv("SCREENSHOT_RETENTION_BATCH_SIZE", "500"))
+    screenshot_retention_pause_ratio: float = float(os.getenv("SCREENSHOT_RETENTION_PAUSE_RATIO", "1.0"))
+    screenshot_retention_unlink_workers: int = int(os.getenv("SCREENSHOT_RETENTION_UNLINK_WORKERS", "8"))
+    
+    # Offline sync: completed time entries accepted per POST /time-entries/sync
+    max_time_entry_sync_entries: int = int(os.getenv("MAX_TIME_ENTRY_SYNC_ENTRIES", "1000"))
+    
+    # Timesheets: local day boundaries and overtime thresholds (0 disables one)
+    timesheet_timezone: str = os.getenv("TIMESHEET_TIMEZONE", "UTC")
+    overtime_daily_hours: float = float(os.getenv("OVERTIME_DAILY_HOURS", "8"))
+    overtime_weekly_hours: float = float(os.getenv("OVERTIME_WEEKLY_HOURS", "40"))
+    
+    # Session and screenshot events, relayed between workers with LISTEN/NOTIFY. They
+    # keep the in-memory open sessions of GET /time-entries/active current (otherwise
+    # every poll queries the database) and feed the live event stream, where a client
+    # more than QUEUE_SIZE events behind is disconnected
+    live_events_in_process: bool = os.getenv("LIVE_EVENTS_IN_PROCESS", "true").lower() == "true"
+    live_events_queue_size: int = int(os.getenv("LIVE_EVENTS_QUEUE_SIZE", "256"))
+    live_events_keepalive_seconds: float = float(os.getenv("LIVE_EVENTS_KEEPALIVE_SECONDS", "15"))
+    
+    # Presence: heartbeats are buffered and written in bulk every FLUSH_INTERVAL seconds;
+    # an employee is offline once no heartbeat arrived for TIMEOUT seconds. A stored
+    # last-seen time is only rewritten once it is WRITE_INTERVAL seconds old (or the
+    # idle state or address changed); keep WRITE_INTERVAL + heartbeat period +
+    # FLUSH_INTERVAL below TIMEOUT
+    presence_flush_interval: float = float(os.getenv("PRESENCE_FLUSH_INTERVAL", "5"))
+    presence_timeout_seconds: int = int(os.getenv("PRESENCE_TIMEOUT_SECONDS", "90"))
+    presence_write_interval: int = int(os.getenv("PRESENCE_WRITE_INTERVAL", "45"))
+    
+    # Stale sessions: an open session with no heartbeat or screenshot for STALE_AFTER
+    # seconds (a dead laptop) is closed at its last activity. The sweep runs every
+    # INTERVAL seconds, BATCH_SIZE sessions per UPDATE; workers take turns through
+    # an advisory lock, so it is safe to run in every process
+    session_sweep_in_process: bool = os.getenv("SESSION_SWEEP_IN_PROCESS", "true").lower() == "true"
+    session_stale_after_seconds: int = int(os.getenv("SESSION_STALE_AFTER_SECONDS", "1800"))
+    session_sweep_interval: int = int(os.getenv("SESSION_SWEEP_INTERVAL", "60"))
+    session_sweep_batch_size: int = int(os.getenv("SESSION_SWEEP_BATCH_SIZE", "500"))
+    
+    # Time entry timelapses (animated WebP or contact-sheet mosaic of its screenshots)
+    timelapse_frame_width: int = int(os.getenv("TIMELAPSE_FRAME_WIDTH", "640"))
+    timelapse_frame_duration_ms: int = int(os.getenv("TIMELAPSE_FRAME_DURATION_MS", "500"))
+    timelapse_mosaic_tile_width: int = int(os.getenv("TIMELAPSE_MOSAIC_TILE_WIDTH", "320"))
+    timelapse_mosaic_columns: int = int(os.getenv("TIMELAPSE_MOSAIC_COLUMNS", "6"))
+    timelapse_max_frames: int = int(os.getenv("TIMELAPSE_MAX_FRAMES", "240"))
+    timelapse_quality: int = 60
+    
     # API settings
     api_v1_prefix: str = "/api/v1"
 
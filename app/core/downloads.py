@@ -0,0 +1,218 @@
+import os
+import asyncio
+import logging
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
+
+from app.core.config import settings
+from app.core.storage import storage, LocalStorage, StoredObject
+from app.core.screenshot_worker import STATE_READY
+from app.models.screenshot import Screenshot
+
+logger = logging.getLogger(__name__)
+
+# Screenshots are private, so caches may keep them but must revalidate with us
+DOWNLOAD_CACHE_CONTROL = "private, no-cache"
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def screenshot_validators(screenshot: Screenshot) -> Tuple[Optional[str], Optional[datetime]]:
+    """ETag and Last-Modified of a screenshot known without touching its file.
+
+    Once processed, the file of a content-addressed screenshot never changes,
+    so its content hash is a strong validator, and the same goes for a member
+    of an append-only pack file. Files still waiting for the worker (which may
+    recompress them) and legacy files fall back to size and modification time.
+    """
+    if screenshot.pack_id and screenshot.created_at:
+        return f'"p{screenshot.pack_id}-{screenshot.pack_offset:x}"', screenshot.created_at
+    if screenshot.content_hash and screenshot.processing_state == STATE_READY and screenshot.created_at:
+        return f'"{screenshot.content_hash}"', screenshot.created_at
+    return None, None
+
+
+def _stat_etag(stored: StoredObject) -> str:
+    return f'"{stored.size:x}-{int(stored.modified * 1000000):x}"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """Weak comparison, as If-None-Match requires"""
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+
+def _parse_http_date(value: str) -> Optional[datetime]:
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match takes precedence over If-Modified-Since
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        since = _parse_http_date(if_modified_since)
+        # HTTP dates have one second resolution
+        return since is not None and int(last_modified.timestamp()) <= int(since.timestamp())
+    return False
+
+
+def _range_applies(request: Request, etag: str, last_modified: datetime) -> bool:
+    """If-Range only lets a Range through when the client's copy is current"""
+    if_range = request.headers.get("if-range")
+    if if_range is None:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        # Strong comparison
+        return not if_range.startswith("W/") and not etag.startswith("W/") and if_range == etag
+    since = _parse_http_date(if_range)
+    return since is not None and int(since.timestamp()) == int(last_modified.timestamp())
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """The (start, end) byte range requested, inclusive; None to send everything.
+
+    Only single ranges are served; a multi-range request gets the whole file,
+    which the spec allows.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, dash, last = spec.strip().partition("-")
+    if not dash:
+        return None
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0:
+                raise RangeNotSatisfiable()
+            start, end = max(size - length, 0), size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    if start > end:
+        return None
+    return start, min(end, size - 1)
+
+
+def _offload_response(path: str, headers: dict) -> Optional[Response]:
+    """Let the front proxy send the file, if configured"""
+    if settings.download_offload == "x-accel-redirect":
+        relative = os.path.relpath(path, settings.upload_dir).replace(os.sep, "/")
+        headers["X-Accel-Redirect"] = f"{settings.download_offload_prefix.rstrip('/')}/{relative}"
+    elif settings.download_offload == "x-sendfile" and isinstance(storage, LocalStorage):
+        headers["X-Sendfile"] = os.path.abspath(path)
+    else:
+        return None
+    return Response(status_code=status.HTTP_200_OK, headers=headers)
+
+
+async def serve_file(
+    request: Request,
+    path: str,
+    media_type: str,
+    filename: Optional[str] = None,
+    etag: Optional[str] = None,
+    last_modified: Optional[datetime] = None,
+    cache_control: str = DOWNLOAD_CACHE_CONTROL,
+    offset: int = 0,
+    length: Optional[int] = None,
+) -> Response:
+    """Send a stored file with validators, conditional GET and Range support.
+
+    When ``etag`` and ``last_modified`` are supplied, a matching conditional
+    request is answered with 304 without looking at the file at all.
+    ``offset`` and ``length`` send just that slice of the file (a member of a
+    pack file), read with positional reads; a slice the file does not fully
+    hold is answered with 404.
+    """
+    stored = None
+    if etag is None or last_modified is None:
+        stored = await asyncio.to_thread(storage.stat, path)
+        if stored is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Screenshot file not found in storage"
+            )
+        etag = etag or _stat_etag(stored)
+        last_modified = last_modified or datetime.fromtimestamp(stored.modified, timezone.utc)
+
+    headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(last_modified.astimezone(timezone.utc), usegmt=True),
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes",
+    }
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    if filename:
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    if length is None:
+        # A front proxy can only send whole files
+        headers["Content-Type"] = media_type
+        offloaded = _offload_response(path, headers)
+        if offloaded is not None:
+            return offloaded
+        del headers["Content-Type"]
+
+    if stored is None:
+        stored = await asyncio.to_thread(storage.stat, path)
+    # A truncated pack would end the body short after the headers are sent
+    if stored is None or (length is not None and offset + length > stored.size):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Screenshot file not found in storage"
+        )
+    if length is not None:
+        stored = StoredObject(size=length, modified=stored.modified)
+
+    range_header = request.headers.get("range")
+    if range_header and _range_applies(request, etag, last_modified):
+        try:
+            byte_range = parse_range(range_header, stored.size)
+        except RangeNotSatisfiable:
+            return Response(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers={"Content-Range": f"bytes */{stored.size}"}
+            )
+        if byte_range is not None:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{stored.size}"
+            headers["Content-Length"] = str(end - start + 1)
+            return StreamingResponse(
+                storage.iter_bytes(path, offset + start, offset + end),
+                status_code=status.HTTP_206_PARTIAL_CONTENT,
+                media_type=media_type,
+                headers=headers
+            )
+
+    headers["Content-Length"] = str(stored.size)
+    if length is not None:
+        return StreamingResponse(
+            storage.iter_bytes(path, offset, offset + length - 1),
+            media_type=media_type,
+            headers=headers
+        )
+    headers.pop("Content-Disposition", None)
+    return storage.response(path, media_type=media_type, filename=filename, headers=headers)
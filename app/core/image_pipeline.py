@@ -0,0 +1,286 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, Optional, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+from app.core.config import settings
+from app.core.perceptual_hash import dhash
+
+logger = logging.getLogger(__name__)
+
+# Number of recent samples kept per stage for the stats endpoint
+STATS_WINDOW = 1000
+
+# Derivative formats: name -> (Pillow format, file extension, media type)
+THUMBNAIL_FORMATS = {"webp": ("WEBP", "webp", "image/webp"), "jpeg": ("JPEG", "jpg", "image/jpeg")}
+
+
+class PipelineBusyError(Exception):
+    """Raised when the pipeline queue is full and the job was not accepted"""
+
+
+def render_thumbnails(
+    img: Image.Image,
+    targets: Dict[str, Tuple[int, str]],
+    image_format: str,
+    quality: int,
+) -> Dict[str, float]:
+    """Write downscaled copies of a decoded image.
+
+    ``targets`` maps a size name to (max dimension, output path). Existing
+    derivatives are left alone. Returns per-size timings in milliseconds.
+    """
+    pil_format = THUMBNAIL_FORMATS[image_format][0]
+    timings = {}
+    for size, (max_dimension, target) in targets.items():
+        started = time.perf_counter()
+        if not os.path.exists(target):
+            derivative = img.copy()
+            derivative.thumbnail((max_dimension, max_dimension))
+            if derivative.mode not in ("RGB", "RGBA"):
+                derivative = derivative.convert("RGB")
+            temp_path = f"{target}.tmp"
+            derivative.save(temp_path, format=pil_format, quality=quality)
+            os.replace(temp_path, target)
+        timings[f"thumbnail_{size}"] = (time.perf_counter() - started) * 1000
+    return timings
+
+
+def generate_thumbnails(path: str, targets: Dict[str, Tuple[int, str]], image_format: str, quality: int) -> dict:
+    """Decode an original once and write the requested derivatives"""
+    started = time.perf_counter()
+    with Image.open(path) as img:
+        img.load()
+        timings = {"decode": (time.perf_counter() - started) * 1000}
+        timings.update(render_thumbnails(img, targets, image_format, quality))
+    return {"timings": timings}
+
+
+def process_screenshot(
+    path: str,
+    quality: int,
+    thumbnail_targets: Optional[Dict[str, Tuple[int, str]]] = None,
+    thumbnail_format: str = "webp",
+    thumbnail_quality: int = 75,
+) -> dict:
+    """Decode a screenshot, extract its metadata and perceptual hash, and
+    recompress JPEGs in place.
+
+    When ``thumbnail_targets`` is given the derivatives are rendered from the
+    same decoded image. Runs inside a pool worker process, so it only takes
+    and returns plain, picklable values. Stage timings are in milliseconds.
+    """
+    timings = {}
+
+    started = time.perf_counter()
+    with Image.open(path) as img:
+        img.load()
+        timings["decode"] = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        width, height = img.size
+        img_format = img.format
+        timings["metadata"] = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        perceptual_hash = dhash(img)
+        timings["phash"] = (time.perf_counter() - started) * 1000
+
+        # Compress image if needed, replacing the original atomically
+        if img_format in ['JPEG', 'JPG']:
+            started = time.perf_counter()
+            temp_path = f"{path}.tmp"
+            img.save(temp_path, format='JPEG', quality=quality, optimize=True)
+            os.replace(temp_path, path)
+            timings["compress"] = (time.perf_counter() - started) * 1000
+
+        if thumbnail_targets:
+            timings.update(render_thumbnails(img, thumbnail_targets, thumbnail_format, thumbnail_quality))
+
+    return {
+        "width": width,
+        "height": height,
+        "format": img_format,
+        "perceptual_hash": perceptual_hash,
+        "file_size": os.path.getsize(path),
+        "timings": timings,
+    }
+
+
+def _timelapse_frame(path: str, size: Tuple[int, int], label: Optional[str]) -> Image.Image:
+    """Decode one screenshot straight to ``size``, letterboxed on black, with a caption"""
+    with Image.open(path) as img:
+        # Lets the JPEG decoder scale down by 1/2, 1/4 or 1/8 while decoding
+        img.draft("RGB", size)
+        img.thumbnail(size)
+        img = img.convert("RGB")
+    frame = Image.new("RGB", size)
+    frame.paste(img, ((size[0] - img.width) // 2, (size[1] - img.height) // 2))
+    if label:
+        draw = ImageDraw.Draw(frame)
+        font = ImageFont.load_default()
+        left, top, right, bottom = draw.textbbox((4, 4), label, font=font)
+        draw.rectangle((0, 0, right + 4, bottom + 4), fill=(0, 0, 0))
+        draw.text((4, 4), label, fill=(255, 255, 255), font=font)
+    return frame
+
+
+def render_timelapse(
+    paths: List[str],
+    labels: List[str],
+    target: str,
+    mode: str,
+    frame_width: int,
+    frame_duration_ms: int,
+    columns: int,
+    quality: int,
+) -> dict:
+    """Render screenshots into one animated WebP ("animation") or one
+    contact-sheet WebP with a grid of ``columns`` tiles ("mosaic").
+
+    Every frame gets the aspect ratio of the first screenshot, so captures
+    from different monitors line up. Screenshots are decoded straight to
+    frame size, so memory use is one small frame per screenshot.
+    """
+    timings = {}
+    started = time.perf_counter()
+    frames = []
+    size = None
+    for path, label in zip(paths, labels):
+        try:
+            if size is None:
+                with Image.open(path) as first:
+                    size = (frame_width, max(int(frame_width * first.height / first.width), 1))
+            frames.append(_timelapse_frame(path, size, label))
+        except OSError as e:
+            logger.warning(f"Timelapse: skipping unreadable screenshot {path}: {str(e)}")
+    if not frames:
+        raise FileNotFoundError("None of the screenshots could be read")
+    timings["decode"] = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    temp_path = f"{target}.tmp"
+    if mode == "mosaic":
+        columns = min(columns, len(frames))
+        rows = (len(frames) + columns - 1) // columns
+        sheet = Image.new("RGB", (columns * size[0], rows * size[1]))
+        for index, frame in enumerate(frames):
+            sheet.paste(frame, ((index % columns) * size[0], (index // columns) * size[1]))
+        sheet.save(temp_path, format="WEBP", quality=quality)
+    else:
+        frames[0].save(
+            temp_path,
+            format="WEBP",
+            save_all=True,
+            append_images=frames[1:],
+            duration=frame_duration_ms,
+            loop=0,
+            quality=quality,
+        )
+    os.replace(temp_path, target)
+    timings["encode"] = (time.perf_counter() - started) * 1000
+
+    return {"frames": len(frames), "file_size": os.path.getsize(target), "timings": timings}
+
+
+class ImagePipeline:
+    """Bounded process pool for CPU-bound image work.
+
+    ``workers`` processes run jobs and at most ``queue_depth`` further jobs may
+    wait for a free worker; anything beyond that is rejected with
+    ``PipelineBusyError`` instead of piling up. With ``workers=0`` jobs run
+    inline in the calling thread, which is the old behaviour.
+    """
+
+    def __init__(self, workers: int, queue_depth: int):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._timings: Dict[str, deque] = {}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def run(self, func: Callable[..., dict], *args) -> dict:
+        """Run ``func(*args)`` in the pool and return its result dict.
+
+        The result's ``timings`` are extended with the time spent waiting in
+        the queue and the total wall time seen by the caller.
+        """
+        with self._lock:
+            if self._in_flight >= self.workers + self.queue_depth:
+                raise PipelineBusyError()
+            self._in_flight += 1
+
+        started = time.perf_counter()
+        try:
+            if self.workers == 0:
+                result = func(*args)
+            else:
+                loop = asyncio.get_running_loop()
+                try:
+                    result = await loop.run_in_executor(self._get_executor(), func, *args)
+                except BrokenProcessPool:
+                    # A worker died; start a fresh pool for the next job
+                    logger.error("Image pipeline pool broke, restarting it")
+                    self._executor = None
+                    raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+        timings = result.setdefault("timings", {})
+        total = (time.perf_counter() - started) * 1000
+        timings["queue"] = max(total - sum(timings.values()), 0.0)
+        timings["total"] = total
+        self._record(timings)
+        return result
+
+    def _record(self, timings: Dict[str, float]) -> None:
+        for stage, value in timings.items():
+            self._timings.setdefault(stage, deque(maxlen=STATS_WINDOW)).append(value)
+
+    def stats(self) -> dict:
+        """Per-stage latency summary over the most recent jobs, in milliseconds"""
+        stages = {}
+        for stage, samples in self._timings.items():
+            ordered = sorted(samples)
+            stages[stage] = {
+                "count": len(ordered),
+                "avg": sum(ordered) / len(ordered),
+                "p50": ordered[int(len(ordered) * 0.50)],
+                "p99": ordered[min(int(len(ordered) * 0.99), len(ordered) - 1)],
+            }
+        return {
+            "workers": self.workers,
+            "queue_depth": self.queue_depth,
+            "in_flight": self._in_flight,
+            "stages": stages,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+def server_timing_header(timings: Dict[str, float]) -> str:
+    """Format stage timings as a ``Server-Timing`` header value"""
+    return ", ".join(f"{stage};dur={value:.1f}" for stage, value in timings.items())
+
+
+image_pipeline = ImagePipeline(
+    workers=settings.image_pipeline_workers,
+    queue_depth=settings.image_pipeline_queue_depth,
+)
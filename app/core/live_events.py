@@ -0,0 +1,259 @@
+import json
+import asyncio
+import logging
+from typing import List, Optional
+
+import psycopg2
+from sqlalchemy import Text, cast, column, func, literal, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.screenshot import Screenshot
+from app.models.time_entry import TimeEntry
+
+logger = logging.getLogger(__name__)
+
+# Postgres channel every API worker listens on
+EVENTS_CHANNEL = "live_events"
+
+# Event types
+SESSION_STARTED = "session_started"
+SESSION_STOPPED = "session_stopped"
+SCREENSHOT_CREATED = "screenshot_created"
+
+
+def _notify(db: Session, payload: str) -> None:
+    db.execute(select(func.pg_notify(EVENTS_CHANNEL, payload)))
+
+
+def notify_session_started(db: Session, session) -> None:
+    """Announce a new session (TimeEntryWithDetails). Sent with the
+    transaction, so nobody hears of a start that is rolled back."""
+    _notify(db, json.dumps({"type": SESSION_STARTED, "session": session.model_dump(mode="json")}))
+
+
+def notify_session_stopped(db: Session, session) -> None:
+    """Announce a closed session (TimeEntry schema), with the transaction"""
+    _notify(db, json.dumps({"type": SESSION_STOPPED, "session": session.model_dump(mode="json")}))
+
+
+def notify_sessions_stopped(db: Session, sessions: list) -> None:
+    """Announce several closed sessions in one statement, with the transaction"""
+    if not sessions:
+        return
+    payloads = func.unnest(literal(
+        [json.dumps({"type": SESSION_STOPPED, "session": session.model_dump(mode="json")}) for session in sessions],
+        ARRAY(Text)
+    )).table_valued(column("payload", Text)).render_derived(name="payloads")
+    db.execute(select(func.pg_notify(EVENTS_CHANNEL, payloads.c.payload)).select_from(payloads))
+
+
+def notify_screenshots_created(db: Session, screenshot_ids: List[int]) -> None:
+    """Announce new screenshot rows, with the transaction. The payloads are
+    built by Postgres in one statement, project included."""
+    if not screenshot_ids:
+        return
+    screenshot = func.json_build_object(
+        "id", Screenshot.id,
+        "employee_id", Screenshot.employee_id,
+        "time_entry_id", Screenshot.time_entry_id,
+        "project_id", TimeEntry.project_id,
+        "timestamp", Screenshot.timestamp,
+        "processing_state", Screenshot.processing_state,
+        "near_duplicate_of_id", Screenshot.near_duplicate_of_id,
+    )
+    payload = func.json_build_object("type", SCREENSHOT_CREATED, "screenshot", screenshot)
+    db.execute(
+        select(func.pg_notify(EVENTS_CHANNEL, cast(payload, Text)))
+        .select_from(Screenshot)
+        .outerjoin(TimeEntry, TimeEntry.id == Screenshot.time_entry_id)
+        .where(Screenshot.id.in_(screenshot_ids))
+        .order_by(Screenshot.id)
+    )
+
+
+def _subject(event: dict) -> dict:
+    return event.get("session") or event.get("screenshot") or {}
+
+
+class Subscriber:
+    """One live feed client: its filters and a bounded queue of payloads.
+
+    The queue holds the notification payloads exactly as Postgres delivered
+    them, so an event is serialized once however many clients get it.
+    """
+
+    def __init__(self, project_id: Optional[int], employee_id: Optional[int], queue_size: int):
+        self.project_id = project_id
+        self.employee_id = employee_id
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self.evicted = False
+
+    def wants(self, event: dict) -> bool:
+        subject = _subject(event)
+        if self.project_id is not None and subject.get("project_id") != self.project_id:
+            return False
+        if self.employee_id is not None and subject.get("employee_id") != self.employee_id:
+            return False
+        return True
+
+    def evict(self) -> None:
+        # Drop what it has not read and wake it with the end marker
+        self.evicted = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[str]:
+        """Next payload; None once evicted. Raises TimeoutError after
+        ``timeout`` seconds without an event."""
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class LiveEvents:
+    """Relays session and screenshot events between API workers.
+
+    Every worker keeps one ``LISTEN`` connection on ``EVENTS_CHANNEL``,
+    watched by the event loop (no thread polls it). Each notification goes to
+    the registered consumers (the active session registry) and to every
+    live feed subscriber whose filters match it. Postgres delivers
+    notifications in commit order, to all workers alike, including the one
+    that sent them.
+
+    A subscriber whose queue is full is evicted rather than allowed to hold
+    up the others or buffer without bound; it gets an end marker and is
+    expected to reconnect.
+
+    On (re)connect the consumers reload their state once listening, and
+    notifications that arrived meanwhile are applied on top.
+    """
+
+    def __init__(self, queue_size: Optional[int] = None, reconnect_delay: float = 5):
+        self.queue_size = queue_size or settings.live_events_queue_size
+        self.reconnect_delay = reconnect_delay
+        self.connected = False
+        self.evictions = 0
+        self._consumers = []
+        self._subscribers = set()
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def add_consumer(self, consumer) -> None:
+        """Register an object with ``async reload()``, ``handle(event)`` and
+        ``disconnected()`` to be kept in sync with the channel"""
+        self._consumers.append(consumer)
+
+    def subscribe(self, project_id: Optional[int] = None, employee_id: Optional[int] = None) -> Subscriber:
+        subscriber = Subscriber(project_id, employee_id, self.queue_size)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self._subscribers.discard(subscriber)
+
+    def stats(self) -> dict:
+        return {
+            "connected": self.connected,
+            "subscribers": len(self._subscribers),
+            "evictions": self.evictions,
+        }
+
+    def _dispatch(self, payload: str) -> None:
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            logger.error(f"Live events: bad notification {payload!r}")
+            return
+        for consumer in self._consumers:
+            try:
+                consumer.handle(event)
+            except Exception as e:
+                logger.error(f"Live events: {type(consumer).__name__} failed on {payload!r}: {str(e)}")
+        for subscriber in list(self._subscribers):
+            if not subscriber.wants(event):
+                continue
+            try:
+                subscriber.queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                self._subscribers.discard(subscriber)
+                subscriber.evict()
+                self.evictions += 1
+                logger.info(f"Live events: evicted a subscriber {self.queue_size} events behind")
+
+    def _connect(self):
+        connection = psycopg2.connect(settings.database_url)
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {EVENTS_CHANNEL}")
+        return connection
+
+    async def _listen(self, connection) -> None:
+        loop = asyncio.get_running_loop()
+        readable = asyncio.Event()
+        loop.add_reader(connection.fileno(), readable.set)
+        try:
+            # Already listening: changes committed while the consumers reload
+            # wait on the connection and are applied on top below
+            for consumer in self._consumers:
+                await consumer.reload()
+            self.connected = True
+
+            while not self._stopping:
+                connection.poll()
+                while connection.notifies:
+                    self._dispatch(connection.notifies.pop(0).payload)
+                readable.clear()
+                self._wakeup.clear()
+                waiters = [asyncio.ensure_future(readable.wait()), asyncio.ensure_future(self._wakeup.wait())]
+                try:
+                    await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    for waiter in waiters:
+                        waiter.cancel()
+        finally:
+            self.connected = False
+            for consumer in self._consumers:
+                consumer.disconnected()
+            loop.remove_reader(connection.fileno())
+
+    async def run_forever(self) -> None:
+        while not self._stopping:
+            connection = None
+            try:
+                connection = await asyncio.to_thread(self._connect)
+                await self._listen(connection)
+            except Exception as e:
+                logger.error(f"Live events listener error: {str(e)}")
+            finally:
+                if connection is not None:
+                    connection.close()
+            if not self._stopping:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.reconnect_delay)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    def start(self) -> None:
+        self._stopping = False
+        self._task = asyncio.create_task(self.run_forever())
+
+    async def stop(self) -> None:
+        self._stopping = True
+        self._wakeup.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        # End the open feeds
+        for subscriber in list(self._subscribers):
+            self._subscribers.discard(subscriber)
+            subscriber.evict()
+
+
+live_events = LiveEvents()
@@ -0,0 +1,62 @@
+import json
+import base64
+import binascii
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Tuple
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import tuple_
+
+# Response header carrying the cursor of the next page, absent on the last page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(sort_value: datetime, row_id: int) -> str:
+    """Opaque cursor for the position just after (sort_value, row_id)"""
+    raw = json.dumps([sort_value.isoformat(), row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+        return datetime.fromisoformat(sort_value), int(row_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def keyset_page(
+    query,
+    sort_column,
+    id_column,
+    response: Response,
+    cursor: Optional[str],
+    skip: int,
+    limit: int,
+    key: Callable[[Any], Tuple[datetime, int]],
+) -> List:
+    """One page of ``query``, newest first by (sort_column, id_column).
+
+    With a cursor the page starts right after it using a row-value
+    comparison, which the matching composite index answers without walking
+    the skipped rows, so every page costs the same. Without one the old
+    offset paging applies. Either way the cursor of the following page is
+    set in the ``X-Next-Cursor`` header; ``key`` extracts (sort value, id)
+    from a result row.
+    """
+    query = query.order_by(sort_column.desc(), id_column.desc())
+    if cursor:
+        query = query.filter(tuple_(sort_column, id_column) < tuple_(*decode_cursor(cursor)))
+    elif skip:
+        query = query.offset(skip)
+    # One extra row tells whether there is a next page
+    rows = query.limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        if rows:
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*key(rows[-1]))
+    return rows
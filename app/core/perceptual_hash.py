@@ -0,0 +1,210 @@
+import time
+import threading
+import logging
+from collections import deque
+from typing import List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.screenshot import Screenshot
+
+logger = logging.getLogger(__name__)
+
+HASH_SIZE = 8
+
+# Number of set bits in every byte value
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+# Screenshot.processing_state values whose hash is not known yet
+_PENDING_STATES = ("accepted", "processing")
+
+# Ids are taken from the sequence before their row commits (a batch reserves
+# them before it even decodes its uploads), so a row can become visible after
+# the index has loaded higher ids. Ids handed out in the last
+# _LATE_ROW_SECONDS are looked at again every _RESCAN_SECONDS.
+_LATE_ROW_SECONDS = 600
+_RESCAN_SECONDS = 30
+
+
+def dhash(img: Image.Image) -> int:
+    """64-bit difference hash of an image, as a signed int for a BIGINT column.
+
+    The image is shrunk to 9x8 greyscale and each bit records whether a pixel
+    is brighter than its right-hand neighbour, so small changes such as a
+    clock or cursor move flip only a few bits.
+    """
+    small = img.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int(np.packbits(bits).view(">i8")[0])
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin((a ^ b) & 0xFFFFFFFFFFFFFFFF).count("1")
+
+
+def hamming_distances(query: int, hashes: np.ndarray) -> np.ndarray:
+    """Distances from one hash to an int64 array of hashes, vectorised"""
+    xor = hashes.view(np.uint64) ^ np.int64(query).view(np.uint64)
+    return _POPCOUNT[xor.view(np.uint8)].reshape(-1, 8).sum(axis=1, dtype=np.uint8)
+
+
+def batch_hamming_search(
+    queries: np.ndarray,
+    hashes: np.ndarray,
+    max_distance: int,
+    chunk_size: int = 1 << 20,
+) -> List[Tuple[int, int, int]]:
+    """All (query index, hash index, distance) pairs within ``max_distance``.
+
+    Hashes are scanned in chunks so memory stays bounded for millions of rows.
+    """
+    matches = []
+    for start in range(0, len(hashes), chunk_size):
+        chunk = hashes[start:start + chunk_size]
+        for query_index, query in enumerate(queries):
+            distances = hamming_distances(int(query), chunk)
+            for hash_index in np.nonzero(distances <= max_distance)[0]:
+                matches.append((query_index, start + int(hash_index), int(distances[hash_index])))
+    return matches
+
+
+def is_near_duplicate(a: int, b: int) -> bool:
+    return hamming_distance(a, b) <= settings.near_duplicate_max_distance
+
+
+def last_capture(db: Session, employee_id: int, before_id: Optional[int] = None) -> Optional[Screenshot]:
+    """The employee's most recent stored capture that has a perceptual hash"""
+    query = db.query(Screenshot).filter(
+        Screenshot.employee_id == employee_id,
+        Screenshot.perceptual_hash.isnot(None),
+        Screenshot.content_hash.isnot(None)
+    )
+    if before_id is not None:
+        query = query.filter(Screenshot.id < before_id)
+    return query.order_by(Screenshot.id.desc()).first()
+
+
+def find_near_duplicate(
+    db: Session,
+    employee_id: int,
+    perceptual_hash: int,
+    before_id: Optional[int] = None,
+) -> Optional[Screenshot]:
+    """The employee's last capture, if it is within the configured distance"""
+    previous = last_capture(db, employee_id, before_id)
+    if previous is None or not is_near_duplicate(previous.perceptual_hash, perceptual_hash):
+        return None
+    return previous
+
+
+class PerceptualHashIndex:
+    """In-memory copy of every screenshot's perceptual hash for similarity search.
+
+    Loaded incrementally by id. Rows still waiting for post-processing hold
+    the watermark back, so their hashes are picked up once they are known.
+    Rows committed after the watermark passed their id are found by a
+    periodic rescan of the ids that may still have been in flight.
+    Deleted screenshots are filtered out when the caller loads the matches.
+    """
+
+    def __init__(self):
+        self._ids = np.empty(0, dtype=np.int64)
+        self._employee_ids = np.empty(0, dtype=np.int64)
+        self._hashes = np.empty(0, dtype=np.int64)
+        self._last_id = 0
+        # Ids at or below this are in the index or never will be
+        self._settled_id = 0
+        # (time, watermark) after each load that moved the watermark
+        self._history = deque()
+        self._next_rescan = 0.0
+        self._lock = threading.Lock()
+
+    def refresh(self, db: Session) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if now >= self._next_rescan and self._settled_id < self._last_id:
+                self._rescan(db, now)
+            pending = db.query(func.min(Screenshot.id)).filter(
+                Screenshot.id > self._last_id,
+                Screenshot.processing_state.in_(_PENDING_STATES)
+            ).scalar()
+            query = db.query(Screenshot.id, Screenshot.employee_id, Screenshot.perceptual_hash).filter(
+                Screenshot.id > self._last_id,
+                Screenshot.perceptual_hash.isnot(None)
+            )
+            if pending is not None:
+                query = query.filter(Screenshot.id < pending)
+            rows = query.order_by(Screenshot.id).all()
+            if not rows:
+                return
+            self._add(rows)
+            self._last_id = int(self._ids[-1])
+            self._history.append((now, self._last_id))
+
+    def _rescan(self, db: Session, now: float) -> None:
+        """Load the rows between the settled id and the watermark that the
+        index does not have yet, and settle what can no longer change"""
+        # The watermark as it was _LATE_ROW_SECONDS ago: every id above it was
+        # handed out since, so only those can still turn up
+        while len(self._history) > 1 and self._history[1][0] <= now - _LATE_ROW_SECONDS:
+            self._history.popleft()
+        settled = self._settled_id
+        if self._history and self._history[0][0] <= now - _LATE_ROW_SECONDS:
+            settled = self._history[0][1]
+        pending = db.query(func.min(Screenshot.id)).filter(
+            Screenshot.id > self._settled_id,
+            Screenshot.id <= self._last_id,
+            Screenshot.processing_state.in_(_PENDING_STATES)
+        ).scalar()
+        if pending is not None:
+            settled = min(settled, pending - 1)
+
+        rows = db.query(Screenshot.id, Screenshot.employee_id, Screenshot.perceptual_hash).filter(
+            Screenshot.id > self._settled_id,
+            Screenshot.id <= self._last_id,
+            Screenshot.perceptual_hash.isnot(None)
+        ).order_by(Screenshot.id).all()
+        if rows:
+            ids = np.array([row[0] for row in rows], dtype=np.int64)
+            positions = np.minimum(np.searchsorted(self._ids, ids), len(self._ids) - 1)
+            missing = [row for row, known in zip(rows, self._ids[positions] == ids) if not known]
+            if missing:
+                self._add(missing)
+        self._settled_id = max(self._settled_id, settled)
+        self._next_rescan = now + _RESCAN_SECONDS
+
+    def _add(self, rows) -> None:
+        """Add (id, employee id, hash) rows, keeping the arrays sorted by id"""
+        ids, employee_ids, hashes = (np.array(column, dtype=np.int64) for column in zip(*rows))
+        late = len(self._ids) and ids[0] < self._ids[-1]
+        self._ids = np.concatenate([self._ids, ids])
+        self._employee_ids = np.concatenate([self._employee_ids, employee_ids])
+        self._hashes = np.concatenate([self._hashes, hashes])
+        if late:
+            order = np.argsort(self._ids, kind="stable")
+            self._ids, self._employee_ids, self._hashes = self._ids[order], self._employee_ids[order], self._hashes[order]
+
+    def search(
+        self,
+        perceptual_hash: int,
+        max_distance: int,
+        limit: int,
+        employee_id: Optional[int] = None,
+    ) -> List[Tuple[int, int]]:
+        """(screenshot id, distance) pairs, closest first"""
+        ids, hashes = self._ids, self._hashes
+        if employee_id is not None:
+            mask = self._employee_ids == employee_id
+            ids, hashes = ids[mask], hashes[mask]
+        distances = hamming_distances(perceptual_hash, hashes)
+        within = np.nonzero(distances <= max_distance)[0]
+        closest = within[np.argsort(distances[within], kind="stable")[:limit]]
+        return [(int(ids[i]), int(distances[i])) for i in closest]
+
+
+perceptual_hash_index = PerceptualHashIndex()
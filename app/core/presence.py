@@ -0,0 +1,267 @@
+import time
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from pydantic import TypeAdapter
+from sqlalchemy import Boolean, Float, Integer, String, and_, column, func, literal, or_, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.exc import DataError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.time_tracking import open_session_filter
+from app.models.employee import Employee
+from app.models.time_entry import TimeEntry
+from app.schemas.presence import PresenceEntry
+
+logger = logging.getLogger(__name__)
+
+# PresenceEntry.status values
+STATUS_ONLINE = "online"
+STATUS_IDLE = "idle"
+STATUS_OFFLINE = "offline"
+
+_presence_list = TypeAdapter(List[PresenceEntry])
+
+
+class Beat(NamedTuple):
+    seen_at: datetime
+    ip_address: Optional[str]
+    idle: bool
+
+
+def write_heartbeats(db: Session, beats: Dict[int, Beat]) -> Tuple[int, int]:
+    """Apply the latest heartbeat of each employee to ``employees`` and to
+    their open ``time_entries`` in a single statement, in the caller's
+    transaction. Returns the number of employees and sessions updated.
+
+    The heartbeats are passed as four arrays (times as epoch seconds) and
+    unnested, so the statement does not grow with the number of employees.
+    Rows only get rewritten when something changed (idle state, address) or
+    the stored time is more than ``presence_write_interval`` seconds older
+    than the beat, so a steady heartbeat writes a row every other interval
+    or so rather than every time. Older beats never overwrite newer ones
+    (workers flush independently), and ``updated_at`` is left alone: it
+    tracks edits, not presence.
+    """
+    arrays = func.unnest(
+        literal(list(beats), ARRAY(Integer)),
+        literal([beat.seen_at.timestamp() for beat in beats.values()], ARRAY(Float)),
+        literal([beat.ip_address for beat in beats.values()], ARRAY(String)),
+        literal([beat.idle for beat in beats.values()], ARRAY(Boolean)),
+    ).table_valued(
+        column("employee_id", Integer),
+        column("seen_at", Float),
+        column("ip_address", String),
+        column("idle", Boolean),
+    ).render_derived(name="arrays")
+    latest = select(
+        arrays.c.employee_id,
+        func.to_timestamp(arrays.c.seen_at).label("seen_at"),
+        arrays.c.ip_address,
+        arrays.c.idle,
+    ).cte("beats")
+    write_before = latest.c.seen_at - literal(timedelta(seconds=settings.presence_write_interval))
+
+    employees = update(Employee).where(
+        Employee.id == latest.c.employee_id,
+        or_(
+            Employee.last_seen_at.is_(None),
+            and_(
+                Employee.last_seen_at < latest.c.seen_at,
+                or_(
+                    Employee.last_seen_at <= write_before,
+                    Employee.is_idle.is_distinct_from(latest.c.idle),
+                    and_(latest.c.ip_address.isnot(None), Employee.last_ip_address.is_distinct_from(latest.c.ip_address)),
+                )
+            )
+        )
+    ).values(
+        last_seen_at=latest.c.seen_at,
+        is_idle=latest.c.idle,
+        last_ip_address=func.coalesce(latest.c.ip_address, Employee.last_ip_address),
+        updated_at=Employee.updated_at
+    ).returning(Employee.id).cte("employees_seen")
+    sessions = update(TimeEntry).where(
+        TimeEntry.employee_id == latest.c.employee_id,
+        open_session_filter(),
+        or_(TimeEntry.last_heartbeat_at.is_(None), TimeEntry.last_heartbeat_at <= write_before)
+    ).values(
+        last_heartbeat_at=latest.c.seen_at,
+        updated_at=TimeEntry.updated_at
+    ).returning(TimeEntry.id).cte("sessions_seen")
+
+    return tuple(db.execute(select(
+        select(func.count()).select_from(employees).scalar_subquery(),
+        select(func.count()).select_from(sessions).scalar_subquery(),
+    )).one())
+
+
+def load_presence(db: Session, now: datetime) -> List[PresenceEntry]:
+    """Employees seen within the presence timeout, and those with an open
+    session however long ago they were seen"""
+    cutoff = now - timedelta(seconds=settings.presence_timeout_seconds)
+    rows = db.execute(
+        select(
+            Employee.id,
+            Employee.last_seen_at,
+            Employee.is_idle,
+            Employee.last_ip_address,
+            TimeEntry.id.label("time_entry_id"),
+        ).outerjoin(
+            TimeEntry, and_(TimeEntry.employee_id == Employee.id, open_session_filter())
+        ).where(
+            or_(Employee.last_seen_at >= cutoff, TimeEntry.id.isnot(None))
+        ).order_by(Employee.id)
+    ).all()
+    result = []
+    for row in rows:
+        if row.last_seen_at is None or row.last_seen_at < cutoff:
+            status = STATUS_OFFLINE
+        else:
+            status = STATUS_IDLE if row.is_idle else STATUS_ONLINE
+        result.append(PresenceEntry(
+            employee_id=row.id,
+            status=status,
+            last_seen_at=row.last_seen_at,
+            ip_address=row.last_ip_address,
+            time_entry_id=row.time_entry_id
+        ))
+    return result
+
+
+class PresenceTracker:
+    """Write-behind buffer for heartbeats.
+
+    ``record`` only updates a dict in memory, keeping the latest beat per
+    employee, and every ``flush_interval`` seconds the buffer is swapped out
+    and written with ``write_heartbeats``: one statement however many
+    clients reported, and each employee's rows at most once per flush. A
+    flush that fails (database unreachable) puts its beats back unless newer
+    ones arrived meanwhile. Beats the database rejects as invalid are found
+    by writing the batch in halves and dropped, so they cannot hold back the
+    others. The buffer is flushed once more on shutdown.
+
+    The presence map is read back from the database (so it covers every
+    worker) at most once per flush interval; in between the rendered JSON
+    is served as is.
+    """
+
+    def __init__(self, flush_interval: Optional[float] = None):
+        self.flush_interval = flush_interval or settings.presence_flush_interval
+        self.heartbeats = 0
+        self.flushes = 0
+        self.employees_written = 0
+        self.sessions_written = 0
+        self.heartbeats_dropped = 0
+        self.last_flush: Optional[dict] = None
+        self._pending: Dict[int, Beat] = {}
+        self._presence: Optional[bytes] = None
+        self._presence_expires = 0.0
+        self._presence_lock = asyncio.Lock()
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, employee_id: int, ip_address: Optional[str], idle: bool) -> None:
+        self._pending[employee_id] = Beat(datetime.now(timezone.utc), ip_address, idle)
+        self.heartbeats += 1
+
+    def _write_isolating(self, db: Session, beats: Dict[int, Beat]) -> Tuple[int, int, int]:
+        """Employees and sessions updated, and beats dropped as invalid"""
+        try:
+            employees, sessions = write_heartbeats(db, beats)
+            db.commit()
+            return employees, sessions, 0
+        except DataError as e:
+            db.rollback()
+            if len(beats) == 1:
+                logger.warning(f"Presence: dropped the heartbeat of employee {next(iter(beats))}: {str(e.orig).strip()}")
+                return 0, 0, 1
+        items = list(beats.items())
+        halves = (dict(items[:len(items) // 2]), dict(items[len(items) // 2:]))
+        return tuple(sum(counts) for counts in zip(*(self._write_isolating(db, half) for half in halves)))
+
+    def _write(self, beats: Dict[int, Beat]) -> Tuple[int, int, int]:
+        db = SessionLocal()
+        try:
+            return self._write_isolating(db, beats)
+        finally:
+            db.close()
+
+    async def flush(self) -> None:
+        """Write the buffered heartbeats"""
+        beats, self._pending = self._pending, {}
+        if not beats:
+            return
+        started = time.perf_counter()
+        try:
+            employees, sessions, dropped = await asyncio.to_thread(self._write, beats)
+        except Exception as e:
+            logger.error(f"Presence: could not write {len(beats)} heartbeats: {str(e)}")
+            for employee_id, beat in beats.items():
+                self._pending.setdefault(employee_id, beat)
+            return
+        self.flushes += 1
+        self.employees_written += employees
+        self.sessions_written += sessions
+        self.heartbeats_dropped += dropped
+        self.last_flush = {
+            "heartbeats": len(beats),
+            "dropped": dropped,
+            "employees_updated": employees,
+            "sessions_updated": sessions,
+            "duration": round(time.perf_counter() - started, 3),
+        }
+
+    def _load(self) -> bytes:
+        db = SessionLocal()
+        try:
+            return _presence_list.dump_json(load_presence(db, datetime.now(timezone.utc)))
+        finally:
+            db.close()
+
+    async def presence(self) -> bytes:
+        """The presence map as a JSON array, at most one flush interval old"""
+        async with self._presence_lock:
+            if self._presence is None or time.monotonic() >= self._presence_expires:
+                self._presence = await asyncio.to_thread(self._load)
+                self._presence_expires = time.monotonic() + self.flush_interval
+            return self._presence
+
+    def stats(self) -> dict:
+        return {
+            "buffered": len(self._pending),
+            "heartbeats": self.heartbeats,
+            "flushes": self.flushes,
+            "employees_written": self.employees_written,
+            "sessions_written": self.sessions_written,
+            "heartbeats_dropped": self.heartbeats_dropped,
+            "last_flush": self.last_flush,
+        }
+
+    async def run_forever(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self) -> None:
+        self._stopping = False
+        self._task = asyncio.create_task(self.run_forever())
+
+    async def stop(self) -> None:
+        self._stopping = True
+        self._wakeup.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+
+presence_tracker = PresenceTracker()
@@ -0,0 +1,296 @@
+import time
+import asyncio
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, case, delete, func, literal, or_, select, update, Integer
+from sqlalchemy.orm import Session, aliased
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.storage import storage
+from app.core.blob_store import release_blob, remove_released_blobs
+from app.core.screenshot_packs import release_pack_member
+from app.core.screenshot_worker import STATE_PROCESSING
+from app.core.thumbnails import remove_thumbnails
+from app.core.timelapse import invalidate_timelapses
+from app.models.retention_policy import RetentionPolicy
+from app.models.screenshot import Screenshot
+from app.models.time_entry import TimeEntry
+
+logger = logging.getLogger(__name__)
+
+_employee_policy = aliased(RetentionPolicy)
+_project_policy = aliased(RetentionPolicy)
+
+
+def _retain_days():
+    """Days a screenshot is kept: its employee's policy, else its project's,
+    else the global setting. NULL means forever."""
+    return case(
+        (_employee_policy.id.isnot(None), _employee_policy.retain_days),
+        (_project_policy.id.isnot(None), _project_policy.retain_days),
+        else_=literal(settings.screenshot_retention_days or None, Integer)
+    )
+
+
+def _with_policies(query):
+    return query.select_from(Screenshot).outerjoin(
+        TimeEntry, TimeEntry.id == Screenshot.time_entry_id
+    ).outerjoin(
+        _employee_policy, _employee_policy.employee_id == Screenshot.employee_id
+    ).outerjoin(
+        _project_policy, _project_policy.project_id == TimeEntry.project_id
+    )
+
+
+def latest_cutoff(db: Session, now: datetime) -> Optional[datetime]:
+    """Nothing captured after this can be expired; None if every policy keeps
+    screenshots forever"""
+    days = [days for days in db.scalars(
+        select(RetentionPolicy.retain_days).where(RetentionPolicy.retain_days.isnot(None))
+    )]
+    if settings.screenshot_retention_days:
+        days.append(settings.screenshot_retention_days)
+    if not days:
+        return None
+    return now - timedelta(days=min(days))
+
+
+def _expired(now: datetime, cutoff: datetime):
+    # The plain timestamp bound lets the timestamp index narrow the scan
+    return and_(
+        Screenshot.timestamp < cutoff,
+        Screenshot.timestamp + func.make_interval(0, 0, 0, _retain_days()) < now,
+        Screenshot.processing_state != STATE_PROCESSING
+    )
+
+
+def retention_report(db: Session) -> List[dict]:
+    """What a purge would delete right now, per policy (dry run)"""
+    now = datetime.now(timezone.utc)
+    cutoff = latest_cutoff(db, now)
+    if cutoff is None:
+        return []
+    scope = case(
+        (_employee_policy.id.isnot(None), "employee"),
+        (_project_policy.id.isnot(None), "project"),
+        else_="global"
+    )
+    policy_id = func.coalesce(_employee_policy.id, _project_policy.id)
+    rows = db.execute(_with_policies(
+        select(
+            scope,
+            policy_id,
+            _retain_days(),
+            func.count(Screenshot.id),
+            func.coalesce(func.sum(Screenshot.file_size), 0),
+            func.min(Screenshot.timestamp),
+        )
+    ).where(_expired(now, cutoff)).group_by(scope, policy_id, _retain_days()).order_by(scope, policy_id))
+    return [
+        {
+            "scope": row[0],
+            "policy_id": row[1],
+            "retain_days": row[2],
+            "screenshots": row[3],
+            "bytes": int(row[4]),
+            "oldest": row[5],
+        }
+        for row in rows
+    ]
+
+
+class RetentionJob:
+    """Deletes screenshots that are past their retention period.
+
+    Expired rows are walked in (timestamp, id) order with a keyset cursor.
+    Each batch is locked with SKIP LOCKED, removed with one
+    ``DELETE ... RETURNING`` and its blob and pack references released in
+    bulk. Files nothing references any more are only removed once the batch
+    is committed, like a single delete: released blobs one by one with
+    ``remove_released_blobs``, packs and older files by a thread pool. If the
+    commit fails, every file is still there for the rows that were kept.
+    After every batch the job sleeps
+    ``pause_ratio`` times as long as the batch took, so it never holds the
+    database more than a fraction of the time.
+    """
+
+    def __init__(
+        self,
+        batch_size: Optional[int] = None,
+        pause_ratio: Optional[float] = None,
+        unlink_workers: Optional[int] = None,
+        max_batches: Optional[int] = None,
+    ):
+        self.batch_size = batch_size or settings.screenshot_retention_batch_size
+        self.pause_ratio = settings.screenshot_retention_pause_ratio if pause_ratio is None else pause_ratio
+        self.unlink_workers = unlink_workers or settings.screenshot_retention_unlink_workers
+        self.max_batches = max_batches
+        self.totals = {"runs": 0, "batches": 0, "screenshots": 0, "bytes": 0, "files_removed": 0, "unlink_errors": 0}
+        self.last_run: Optional[dict] = None
+        self.current: Optional[dict] = None
+        self._stop = threading.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def stats(self) -> dict:
+        """Progress of the running purge and totals since startup"""
+        return {
+            "running": self.current is not None,
+            "current": self.current,
+            "last_run": self.last_run,
+            "totals": self.totals,
+        }
+
+    def _next_batch(self, db: Session, now: datetime, cutoff: datetime, after: Optional[Tuple[datetime, int]]) -> List:
+        query = _with_policies(select(Screenshot.id, Screenshot.timestamp)).where(_expired(now, cutoff))
+        if after is not None:
+            query = query.where(or_(
+                Screenshot.timestamp > after[0],
+                and_(Screenshot.timestamp == after[0], Screenshot.id > after[1])
+            ))
+        query = query.order_by(Screenshot.timestamp, Screenshot.id).limit(self.batch_size)
+        return db.execute(query.with_for_update(of=Screenshot, skip_locked=True)).all()
+
+    def _unlink(self, executor: ThreadPoolExecutor, freed: List[str], pack_members: List[Tuple[str, int]]) -> int:
+        def remove_file(path: str) -> None:
+            storage.delete(path)
+            remove_thumbnails(path)
+
+        futures = [executor.submit(remove_file, path) for path in freed]
+        futures += [executor.submit(remove_thumbnails, path, offset) for path, offset in pack_members]
+        errors = 0
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                errors += 1
+                logger.error(f"Retention: error deleting screenshot file: {str(e)}")
+        return errors
+
+    def _purge_batch(self, db: Session, executor: ThreadPoolExecutor, ids: List[int]) -> dict:
+        # Later captures may point at these as their near-duplicate original
+        db.execute(
+            update(Screenshot).where(Screenshot.near_duplicate_of_id.in_(ids)).values(near_duplicate_of_id=None),
+            execution_options={"synchronize_session": False}
+        )
+        deleted = db.execute(
+            delete(Screenshot).where(Screenshot.id.in_(ids)).returning(
+                Screenshot.file_path,
+                Screenshot.file_size,
+                Screenshot.content_hash,
+                Screenshot.pack_id,
+                Screenshot.pack_offset,
+                Screenshot.time_entry_id,
+            ),
+            execution_options={"synchronize_session": False}
+        ).all()
+
+        # Release references in a fixed order so concurrent purges cannot deadlock
+        released = []
+        for content_hash, count in sorted(Counter(row.content_hash for row in deleted if row.content_hash).items()):
+            if release_blob(db, content_hash, count, defer=True):
+                released.append(content_hash)
+        freed = set()
+        for pack_id, count in sorted(Counter(row.pack_id for row in deleted if row.pack_id).items()):
+            freed_path = release_pack_member(db, pack_id, count)
+            if freed_path:
+                freed.add(freed_path)
+        # Screenshots stored before content addressing own their file
+        freed.update(row.file_path for row in deleted if not row.content_hash and not row.pack_id)
+        pack_members = [(row.file_path, row.pack_offset) for row in deleted if row.pack_id]
+
+        db.commit()
+
+        # Files are only removed once the rows pointing at them are gone for good
+        removed = remove_released_blobs(db, released)
+        errors = self._unlink(executor, sorted(freed), pack_members)
+        for time_entry_id in {row.time_entry_id for row in deleted if row.time_entry_id}:
+            invalidate_timelapses(time_entry_id)
+        return {
+            "screenshots": len(deleted),
+            "bytes": sum(row.file_size or 0 for row in deleted),
+            "files_removed": removed + len(freed),
+            "unlink_errors": errors,
+        }
+
+    def run(self) -> dict:
+        """Purge everything that is expired now; returns this run's counters"""
+        started = time.perf_counter()
+        now = datetime.now(timezone.utc)
+        run = {
+            "started_at": now.isoformat(),
+            "batches": 0, "screenshots": 0, "bytes": 0, "files_removed": 0, "unlink_errors": 0,
+            "cursor": None,
+        }
+        self.current = run
+        db = SessionLocal()
+        executor = ThreadPoolExecutor(max_workers=self.unlink_workers)
+        try:
+            cutoff = latest_cutoff(db, now)
+            after = None
+            while cutoff is not None and not self._stop.is_set():
+                if self.max_batches and run["batches"] >= self.max_batches:
+                    break
+                batch_started = time.perf_counter()
+                rows = self._next_batch(db, now, cutoff, after)
+                if not rows:
+                    db.rollback()
+                    break
+                after = (rows[-1].timestamp, rows[-1].id)
+                try:
+                    counts = self._purge_batch(db, executor, [row.id for row in rows])
+                except Exception as e:
+                    db.rollback()
+                    logger.error(f"Retention: error purging batch ending at screenshot {after[1]}: {str(e)}")
+                    counts = {}
+
+                run["batches"] += 1
+                run["cursor"] = {"timestamp": after[0].isoformat(), "id": after[1]}
+                for key, value in counts.items():
+                    run[key] += value
+                    self.totals[key] += value
+                self.totals["batches"] += 1
+                elapsed = time.perf_counter() - batch_started
+                run["rate"] = round(run["screenshots"] / (time.perf_counter() - started), 1)
+                # Throttle: give the database back to foreground requests
+                self._stop.wait(elapsed * self.pause_ratio)
+        finally:
+            executor.shutdown()
+            db.close()
+            run["duration"] = round(time.perf_counter() - started, 3)
+            self.totals["runs"] += 1
+            self.last_run = run
+            self.current = None
+
+        if run["screenshots"]:
+            logger.info(
+                f"Retention: deleted {run['screenshots']} screenshots ({run['bytes']} bytes) "
+                f"in {run['batches']} batches, {run['files_removed']} files removed"
+            )
+        return run
+
+    async def run_forever(self) -> None:
+        while not self._stop.is_set():
+            try:
+                await asyncio.to_thread(self.run)
+            except Exception as e:
+                logger.error(f"Retention job error: {str(e)}")
+            await asyncio.to_thread(self._stop.wait, settings.screenshot_retention_interval)
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._task = asyncio.create_task(self.run_forever())
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+
+retention_job = RetentionJob()
@@ -0,0 +1,230 @@
+import logging
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import Date, cast, delete, func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models.time_entry import TimeEntry
+from app.models.time_rollup import TimeRollup
+
+logger = logging.getLogger(__name__)
+
+# Rows written per INSERT when rebuilding
+REBUILD_BATCH_SIZE = 1000
+
+REPORT_PERIODS = ("day", "week", "month")
+REPORT_GROUPS = {
+    "employee": TimeRollup.employee_id,
+    "project": TimeRollup.project_id,
+    "task": TimeRollup.task_id,
+}
+
+RollupKey = Tuple[int, int, int, date]
+
+
+def _as_utc(value: datetime) -> datetime:
+    # Naive datetimes were written as UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def split_by_day(start: datetime, end: datetime, duration_seconds: Optional[int] = None) -> List[Tuple[date, int]]:
+    """(UTC day, seconds) pieces of a session, split at midnight.
+
+    The pieces add up to ``duration_seconds`` exactly (the last day takes the
+    rounding), so rollups always agree with the entries' own durations.
+    """
+    start, end = _as_utc(start), _as_utc(end)
+    total = int((end - start).total_seconds()) if duration_seconds is None else duration_seconds
+    pieces = []
+    day = start.date()
+    while True:
+        next_midnight = datetime.combine(day + timedelta(days=1), time.min, tzinfo=timezone.utc)
+        if end <= next_midnight:
+            pieces.append((day, total - sum(seconds for _, seconds in pieces)))
+            return pieces
+        pieces.append((day, int((next_midnight - max(start, datetime.combine(day, time.min, tzinfo=timezone.utc))).total_seconds())))
+        day += timedelta(days=1)
+
+
+def add_entry(db: Session, entry: TimeEntry) -> None:
+    """Add a closed session to the daily rollups, in the caller's transaction"""
+    add_entries(db, [entry])
+
+
+def add_entries(db: Session, entries: List[TimeEntry]) -> None:
+    """Add closed sessions to the daily rollups in one statement, in the
+    caller's transaction"""
+    totals: Dict[RollupKey, List[int]] = {}
+    for entry in entries:
+        for day, seconds in split_by_day(entry.start_time, entry.end_time, entry.duration_seconds):
+            value = totals.setdefault((entry.employee_id, entry.project_id, entry.task_id, day), [0, 0])
+            value[0] += seconds
+            value[1] += 1
+    if not totals:
+        return
+    rows = [
+        {
+            "employee_id": employee_id,
+            "project_id": project_id,
+            "task_id": task_id,
+            "day": day,
+            "seconds": seconds,
+            "entries": count,
+        }
+        for (employee_id, project_id, task_id, day), (seconds, count) in totals.items()
+    ]
+    statement = insert(TimeRollup)
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[TimeRollup.employee_id, TimeRollup.project_id, TimeRollup.task_id, TimeRollup.day],
+        set_={
+            "seconds": TimeRollup.seconds + statement.excluded.seconds,
+            "entries": TimeRollup.entries + statement.excluded.entries,
+            "updated_at": func.now(),
+        },
+    ), rows)
+
+
+def expected_rollups(
+    db: Session, start_day: Optional[date] = None, end_day: Optional[date] = None
+) -> Iterator[Tuple[RollupKey, Tuple[int, int]]]:
+    """Rollups recomputed from the closed time entries, one employee at a time.
+
+    Streams the entries from a server-side cursor, so memory stays bounded by
+    a single employee's days.
+    """
+    query = select(
+        TimeEntry.employee_id,
+        TimeEntry.project_id,
+        TimeEntry.task_id,
+        TimeEntry.start_time,
+        TimeEntry.end_time,
+        TimeEntry.duration_seconds,
+    ).where(TimeEntry.end_time.isnot(None))
+    if start_day:
+        # Sessions ending on or after the first day (they may start earlier)
+        query = query.where(TimeEntry.end_time >= datetime.combine(start_day, time.min, tzinfo=timezone.utc))
+    if end_day:
+        query = query.where(TimeEntry.start_time < datetime.combine(end_day + timedelta(days=1), time.min, tzinfo=timezone.utc))
+    query = query.order_by(TimeEntry.employee_id).execution_options(stream_results=True, yield_per=REBUILD_BATCH_SIZE)
+
+    current = None
+    totals: Dict[RollupKey, List[int]] = {}
+    for row in db.execute(query):
+        if row.employee_id != current:
+            yield from ((key, tuple(value)) for key, value in totals.items())
+            totals = {}
+            current = row.employee_id
+        for day, seconds in split_by_day(row.start_time, row.end_time, row.duration_seconds):
+            if (start_day and day < start_day) or (end_day and day > end_day):
+                continue
+            value = totals.setdefault((row.employee_id, row.project_id, row.task_id, day), [0, 0])
+            value[0] += seconds
+            value[1] += 1
+    yield from ((key, tuple(value)) for key, value in totals.items())
+
+
+def _day_range(query, start_day: Optional[date], end_day: Optional[date]):
+    if start_day:
+        query = query.where(TimeRollup.day >= start_day)
+    if end_day:
+        query = query.where(TimeRollup.day <= end_day)
+    return query
+
+
+def rebuild_rollups(db: Session, start_day: Optional[date] = None, end_day: Optional[date] = None) -> int:
+    """Recompute the rollups of a day range (default: everything) from the
+    time entries in one transaction; returns the number of rows written.
+
+    The table is locked against concurrent writers for the duration, so a
+    session stopped meanwhile is added after the rebuild commits instead of
+    being counted twice or lost.
+    """
+    db.execute(text(f"LOCK TABLE {TimeRollup.__tablename__} IN SHARE ROW EXCLUSIVE MODE"))
+    db.execute(_day_range(delete(TimeRollup), start_day, end_day))
+    written = 0
+    batch = []
+    for (employee_id, project_id, task_id, day), (seconds, entries) in expected_rollups(db, start_day, end_day):
+        batch.append({
+            "employee_id": employee_id,
+            "project_id": project_id,
+            "task_id": task_id,
+            "day": day,
+            "seconds": seconds,
+            "entries": entries,
+        })
+        if len(batch) >= REBUILD_BATCH_SIZE:
+            db.execute(insert(TimeRollup), batch)
+            written += len(batch)
+            batch = []
+    if batch:
+        db.execute(insert(TimeRollup), batch)
+        written += len(batch)
+    db.commit()
+    logger.info(f"Rebuilt {written} daily rollups from {start_day or 'the beginning'} to {end_day or 'now'}")
+    return written
+
+
+def check_rollups(db: Session, start_day: Optional[date] = None, end_day: Optional[date] = None) -> List[dict]:
+    """Rollups that disagree with the time entries, as (expected, stored) pairs"""
+    stored = {
+        (row.employee_id, row.project_id, row.task_id, row.day): (row.seconds, row.entries)
+        for row in db.execute(_day_range(select(
+            TimeRollup.employee_id, TimeRollup.project_id, TimeRollup.task_id, TimeRollup.day,
+            TimeRollup.seconds, TimeRollup.entries
+        ), start_day, end_day))
+    }
+    mismatches = []
+
+    def mismatch(key: RollupKey, expected: Tuple[int, int], found: Tuple[int, int]) -> dict:
+        return {
+            "employee_id": key[0],
+            "project_id": key[1],
+            "task_id": key[2],
+            "day": key[3],
+            "expected_seconds": expected[0],
+            "stored_seconds": found[0],
+            "expected_entries": expected[1],
+            "stored_entries": found[1],
+        }
+
+    for key, expected in expected_rollups(db, start_day, end_day):
+        found = stored.pop(key, (0, 0))
+        if found != expected:
+            mismatches.append(mismatch(key, expected, found))
+    # Rollups without any time entries behind them
+    for key, found in stored.items():
+        if found != (0, 0):
+            mismatches.append(mismatch(key, (0, 0), found))
+    db.rollback()
+    return mismatches
+
+
+def summary(
+    db: Session,
+    start_day: date,
+    end_day: date,
+    group_by: List[str],
+    period: str,
+    employee_id: Optional[int] = None,
+    project_id: Optional[int] = None,
+) -> List[dict]:
+    """Tracked time per period and group, read from the rollups only"""
+    period_start = cast(func.date_trunc(period, TimeRollup.day), Date).label("period_start")
+    columns = [REPORT_GROUPS[group].label(f"{group}_id") for group in group_by]
+    query = select(
+        period_start,
+        *columns,
+        func.sum(TimeRollup.seconds).label("seconds"),
+        func.sum(TimeRollup.entries).label("entries"),
+    ).where(TimeRollup.day >= start_day, TimeRollup.day <= end_day)
+    if employee_id is not None:
+        query = query.where(TimeRollup.employee_id == employee_id)
+    if project_id is not None:
+        query = query.where(TimeRollup.project_id == project_id)
+    query = query.group_by(period_start, *columns).order_by(period_start, *columns)
+    return [
+        {**row._asdict(), "seconds": int(row.seconds), "entries": int(row.entries), "hours": round(row.seconds / 3600, 2)}
+        for row in db.execute(query)
+    ]
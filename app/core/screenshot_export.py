@@ -0,0 +1,246 @@
+import io
+import csv
+import time
+import tarfile
+import zipfile
+import logging
+from datetime import date, datetime, timedelta
+from typing import Iterator, Optional
+
+from sqlalchemy import select
+
+from app.core.database import SessionLocal
+from app.core.storage import storage, StoredObject
+from app.models.screenshot import Screenshot
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {"zip": "application/zip", "tar": "application/x-tar"}
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_BATCH_SIZE = 500
+
+MANIFEST_NAME = "manifest.csv"
+MANIFEST_COLUMNS = [
+    "id", "archive_path", "status", "timestamp", "time_entry_id", "filename", "file_size",
+    "width", "height", "format", "permission_granted", "content_hash", "device_info",
+]
+
+_EXPORT_COLUMNS = (
+    Screenshot.id,
+    Screenshot.timestamp,
+    Screenshot.time_entry_id,
+    Screenshot.filename,
+    Screenshot.file_path,
+    Screenshot.file_size,
+    Screenshot.width,
+    Screenshot.height,
+    Screenshot.format,
+    Screenshot.permission_granted,
+    Screenshot.content_hash,
+    Screenshot.device_info,
+    Screenshot.pack_offset,
+    Screenshot.pack_length,
+)
+
+
+class _StreamBuffer(io.RawIOBase):
+    """Write-only sink that hands archive bytes back to the generator"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _archive_path(row) -> str:
+    extension = row.filename.rsplit(".", 1)[-1].lower()
+    return f"screenshots/{row.timestamp:%Y-%m-%d}/{row.timestamp:%H%M%S}-{row.id}.{extension}"
+
+
+def _manifest_line(row, status: str) -> bytes:
+    out = io.StringIO()
+    csv.writer(out).writerow([
+        row.id, _archive_path(row), status, row.timestamp.isoformat(), row.time_entry_id, row.filename,
+        row.file_size, row.width, row.height, row.format, row.permission_granted, row.content_hash,
+        row.device_info,
+    ])
+    return out.getvalue().encode()
+
+
+def _member_bytes(row) -> Iterator[bytes]:
+    if row.pack_length is not None:
+        return storage.iter_bytes(row.file_path, row.pack_offset, row.pack_offset + row.pack_length - 1)
+    return storage.iter_bytes(row.file_path)
+
+
+def _manifest_header() -> bytes:
+    out = io.StringIO()
+    csv.writer(out).writerow(MANIFEST_COLUMNS)
+    return out.getvalue().encode()
+
+
+class ScreenshotExport:
+    """Streams an employee's screenshots as a ZIP or TAR archive.
+
+    The archive is produced while it is being sent: rows come from a
+    server-side cursor in batches and each file is copied chunk by chunk, so
+    memory use does not depend on the size of the export and nothing is
+    spooled to disk. Files are stored uncompressed since images already are.
+
+    The manifest is the last member. Its rows are produced by a second pass
+    over the same REPEATABLE READ snapshot; the first pass only measures the
+    manifest (TAR headers need the size up front) and remembers which files
+    were missing from storage.
+    """
+
+    def __init__(
+        self,
+        employee_id: int,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        permission_granted: Optional[bool] = None,
+        archive_format: str = "zip",
+    ):
+        self.employee_id = employee_id
+        self.start_date = start_date
+        self.end_date = end_date
+        self.permission_granted = permission_granted
+        self.archive_format = archive_format
+        self.files = 0
+        self.bytes = 0
+        # Filled in by the first pass, used by the manifest
+        self._missing = set()
+        self._manifest_size = 0
+
+    def filename(self) -> str:
+        start = self.start_date.isoformat() if self.start_date else "all"
+        end = self.end_date.isoformat() if self.end_date else "now"
+        return f"screenshots-employee-{self.employee_id}-{start}-{end}.{self.archive_format}"
+
+    def _query(self):
+        query = select(*_EXPORT_COLUMNS).where(Screenshot.employee_id == self.employee_id)
+        if self.start_date:
+            query = query.where(Screenshot.timestamp >= self.start_date)
+        if self.end_date:
+            # The end date is inclusive
+            query = query.where(Screenshot.timestamp < self.end_date + timedelta(days=1))
+        if self.permission_granted is not None:
+            query = query.where(Screenshot.permission_granted == self.permission_granted)
+        return query.order_by(Screenshot.timestamp, Screenshot.id)
+
+    def _rows(self, db):
+        result = db.execute(
+            self._query().execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE)
+        )
+        for partition in result.partitions():
+            yield from partition
+
+    def __iter__(self) -> Iterator[bytes]:
+        started = time.perf_counter()
+        db = SessionLocal()
+        try:
+            db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+            if self.archive_format == "tar":
+                yield from self._tar(db)
+            else:
+                yield from self._zip(db)
+        finally:
+            db.close()
+        logger.info(
+            f"Exported {self.files} screenshots ({self.bytes} bytes) for employee {self.employee_id} "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+
+    def _files(self, db):
+        """(row, stored object) for every file, measuring the manifest on the way"""
+        self._manifest_size = len(_manifest_header())
+        for row in self._rows(db):
+            stored = storage.stat(row.file_path)
+            if stored is not None and row.pack_length is not None:
+                # A member of a pack file
+                stored = StoredObject(size=row.pack_length, modified=stored.modified)
+            if stored is None:
+                self._missing.add(row.id)
+                logger.warning(f"Export: screenshot {row.id} is missing from storage")
+            self._manifest_size += len(_manifest_line(row, "missing" if stored is None else "included"))
+            if stored is not None:
+                yield row, stored
+
+    def _manifest(self, db) -> Iterator[bytes]:
+        yield _manifest_header()
+        for row in self._rows(db):
+            yield _manifest_line(row, "missing" if row.id in self._missing else "included")
+
+    def _zip(self, db) -> Iterator[bytes]:
+        buffer = _StreamBuffer()
+        with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+            for row, stored in self._files(db):
+                info = zipfile.ZipInfo(_archive_path(row), date_time=row.timestamp.timetuple()[:6])
+                info.file_size = stored.size
+                with archive.open(info, "w") as member:
+                    for chunk in _member_bytes(row):
+                        member.write(chunk)
+                        yield buffer.drain()
+                self.files += 1
+                self.bytes += stored.size
+
+            info = zipfile.ZipInfo(MANIFEST_NAME, date_time=datetime.utcnow().timetuple()[:6])
+            with archive.open(info, "w", force_zip64=True) as member:
+                for line in self._manifest(db):
+                    member.write(line)
+                    yield buffer.drain()
+        # Central directory
+        yield buffer.drain()
+
+    def _tar_header(self, name: str, size: int, mtime: float) -> bytes:
+        info = tarfile.TarInfo(name)
+        info.size = size
+        info.mtime = int(mtime)
+        info.mode = 0o644
+        return info.tobuf(format=tarfile.PAX_FORMAT)
+
+    def _tar_padding(self, size: int) -> bytes:
+        return b"\0" * (-size % tarfile.BLOCKSIZE)
+
+    def _tar(self, db) -> Iterator[bytes]:
+        written = 0
+        for row, stored in self._files(db):
+            header = self._tar_header(_archive_path(row), stored.size, row.timestamp.timestamp())
+            yield header
+            sent = 0
+            for chunk in _member_bytes(row):
+                sent += len(chunk)
+                yield chunk
+            if sent != stored.size:
+                raise IOError(f"Screenshot {row.id} changed size while being exported")
+            yield self._tar_padding(stored.size)
+            written += len(header) + stored.size + len(self._tar_padding(stored.size))
+            self.files += 1
+            self.bytes += stored.size
+
+        header = self._tar_header(MANIFEST_NAME, self._manifest_size, time.time())
+        yield header
+        sent = 0
+        for line in self._manifest(db):
+            sent += len(line)
+            yield line
+        if sent != self._manifest_size:
+            raise IOError("Manifest changed while being exported")
+        yield self._tar_padding(sent)
+        written += len(header) + sent + len(self._tar_padding(sent))
+
+        # End-of-archive marker, padded to a whole record like tarfile does
+        end = b"\0" * (2 * tarfile.BLOCKSIZE)
+        written += len(end)
+        yield end + b"\0" * (-written % tarfile.RECORDSIZE)
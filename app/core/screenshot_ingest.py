@@ -0,0 +1,336 @@
+import os
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.uploads import ReceivedUpload
+from app.core.blob_store import blob_path, acquire_blob, register_blob
+from app.core.image_pipeline import image_pipeline, process_screenshot, PipelineBusyError
+from app.core.live_events import notify_screenshots_created
+from app.core.perceptual_hash import find_near_duplicate, is_near_duplicate, last_capture
+from app.core.screenshot_worker import STATE_ACCEPTED, STATE_READY
+from app.core.timelapse import invalidate_timelapses
+from app.models.screenshot import Screenshot
+from app.models.screenshot_blob import ScreenshotBlob
+
+logger = logging.getLogger(__name__)
+
+# BatchItem.status values
+BATCH_PENDING = "pending"
+BATCH_CREATED = "created"
+BATCH_ACCEPTED = "accepted"
+BATCH_SKIPPED = "skipped"
+BATCH_FAILED = "failed"
+
+
+@dataclass
+class IngestResult:
+    screenshot: Screenshot
+    timings: dict = field(default_factory=dict)
+    # True when the near-duplicate policy stored nothing and ``screenshot``
+    # is the employee's previous capture
+    skipped: bool = False
+
+
+async def _store_blob(db: Session, upload: ReceivedUpload, result: Optional[dict]):
+    """Move an upload into storage under its content hash and register the blob"""
+    file_path = blob_path(upload.sha256, upload.extension)
+    if result is None:
+        # Accept once the raw bytes are durably stored; the worker processes them later
+        await asyncio.to_thread(upload.commit, file_path, True)
+        return register_blob(
+            db, upload.sha256, file_path, upload.size, image_format=upload.image_format.upper()
+        )
+    # Atomically move the processed file into place
+    await asyncio.to_thread(upload.commit, file_path)
+    return register_blob(
+        db, upload.sha256, file_path, result["file_size"],
+        result["width"], result["height"], result["format"], result["perceptual_hash"]
+    )
+
+
+def _screenshot_values(
+    blob,
+    employee_id: int,
+    time_entry_id: Optional[int],
+    permission_granted: bool,
+    device_info: Optional[str],
+    perceptual_hash: Optional[int],
+    near_duplicate_of_id: Optional[int],
+    timestamp: Optional[datetime] = None,
+) -> dict:
+    """Column values of a Screenshot row referencing ``blob``"""
+    return {
+        "employee_id": employee_id,
+        "time_entry_id": time_entry_id,
+        "filename": os.path.basename(blob.file_path),
+        "file_path": blob.file_path,
+        "file_size": blob.file_size,
+        "content_hash": blob.content_hash,
+        "timestamp": timestamp or datetime.utcnow(),
+        "permission_granted": permission_granted,
+        "width": blob.width,
+        "height": blob.height,
+        "format": blob.format,
+        "perceptual_hash": perceptual_hash,
+        "near_duplicate_of_id": near_duplicate_of_id,
+        "device_info": device_info,
+        "processing_state": STATE_READY if blob.width is not None else STATE_ACCEPTED,
+    }
+
+
+async def ingest_screenshot(
+    db: Session,
+    upload: ReceivedUpload,
+    employee_id: int,
+    time_entry_id: Optional[int] = None,
+    permission_granted: bool = True,
+    device_info: Optional[str] = None,
+) -> IngestResult:
+    """Store a received upload and create its Screenshot row.
+
+    Content is deduplicated by SHA-256: if the same bytes were stored before,
+    the new row references the existing blob and the upload is dropped
+    without being decoded. Otherwise the image is processed in the pool (or
+    accepted for the background worker in async mode) and stored under its
+    hash. Near-duplicates of the employee's last capture are then handled
+    according to ``settings.near_duplicate_policy``.
+    """
+    timings = {}
+    result = None
+
+    try:
+        blob = acquire_blob(db, upload.sha256)
+        if blob is None and not settings.screenshot_async_processing:
+            # Decode, extract metadata and recompress in the image process pool
+            result = await image_pipeline.run(
+                process_screenshot, upload.temp_path, settings.screenshot_compression_quality
+            )
+            timings = result["timings"]
+
+        if blob is not None:
+            perceptual_hash = blob.perceptual_hash
+        elif result is not None:
+            perceptual_hash = result["perceptual_hash"]
+        else:
+            perceptual_hash = None
+
+        previous = None
+        if settings.near_duplicate_policy != "store" and perceptual_hash is not None:
+            previous = find_near_duplicate(db, employee_id, perceptual_hash)
+
+        if previous is not None and settings.near_duplicate_policy == "skip":
+            # Store nothing; release any reference taken above
+            db.rollback()
+            upload.discard()
+            return IngestResult(screenshot=previous, timings=timings, skipped=True)
+
+        if previous is not None and blob is None:
+            # Point the new row at the previous capture's file
+            blob = acquire_blob(db, previous.content_hash)
+            if blob is None:
+                previous = None
+
+        if blob is not None:
+            # The content (or a near-duplicate of it) is already stored
+            upload.discard()
+        else:
+            blob = await _store_blob(db, upload, result)
+
+        screenshot = Screenshot(**_screenshot_values(
+            blob,
+            employee_id=employee_id,
+            time_entry_id=time_entry_id,
+            permission_granted=permission_granted,
+            device_info=device_info,
+            perceptual_hash=perceptual_hash,
+            near_duplicate_of_id=previous.id if previous is not None else None,
+        ))
+        db.add(screenshot)
+        db.flush()
+        notify_screenshots_created(db, [screenshot.id])
+        db.commit()
+        db.refresh(screenshot)
+    except BaseException:
+        # A blob file left behind is harmless: the next upload of the same
+        # content replaces it, and another in-flight upload may still need it
+        db.rollback()
+        upload.discard()
+        raise
+
+    if time_entry_id is not None:
+        await asyncio.to_thread(invalidate_timelapses, time_entry_id)
+    return IngestResult(screenshot=screenshot, timings=timings)
+
+
+@dataclass
+class BatchItem:
+    """One file of a batch upload and, after ingest, its outcome"""
+    upload: Optional[ReceivedUpload]
+    time_entry_id: Optional[int] = None
+    permission_granted: bool = True
+    device_info: Optional[str] = None
+    captured_at: Optional[datetime] = None
+    status: str = BATCH_PENDING
+    screenshot: Optional[Screenshot] = None
+    detail: Optional[str] = None
+    # Id of the capture a skipped near-duplicate resolved to
+    duplicate_of_id: Optional[int] = None
+
+
+def _allocate_screenshot_ids(db: Session, count: int) -> List[int]:
+    """Reserve ids up front so rows in one batch can reference each other"""
+    sequence = func.pg_get_serial_sequence(Screenshot.__tablename__, "id")
+    return list(db.scalars(select(func.nextval(sequence)).select_from(func.generate_series(1, count))))
+
+
+async def ingest_screenshot_batch(db: Session, employee_id: int, items: List[BatchItem]) -> None:
+    """Store many received uploads for one employee with a single row insert.
+
+    Each distinct upload is decoded once in the image pool, at most one per
+    pool worker at a time, so a batch never holds more than that many places
+    in the pool's queue and single uploads keep getting in. Blob references
+    are then taken in order, each inside its own savepoint, so a failing item
+    is reported without affecting the others.
+    Near-duplicates are detected against the employee's last capture and
+    against earlier files of the same batch. Finally every Screenshot row is
+    written by one INSERT ... RETURNING and the whole batch is committed once.
+    Items that were already marked failed by the caller are left alone.
+    """
+    pending = [item for item in items if item.status == BATCH_PENDING]
+    if not pending:
+        return
+
+    try:
+        # Content that is already stored needs no decode
+        hashes = {item.upload.sha256 for item in pending}
+        known = set(db.scalars(
+            select(ScreenshotBlob.content_hash).where(ScreenshotBlob.content_hash.in_(hashes))
+        ))
+        decodes = {}
+        if not settings.screenshot_async_processing:
+            decode_slots = asyncio.Semaphore(max(image_pipeline.workers, 1))
+
+            async def decode(temp_path: str) -> dict:
+                async with decode_slots:
+                    return await image_pipeline.run(
+                        process_screenshot, temp_path, settings.screenshot_compression_quality
+                    )
+
+            for item in pending:
+                if item.upload.sha256 not in known and item.upload.sha256 not in decodes:
+                    decodes[item.upload.sha256] = asyncio.ensure_future(decode(item.upload.temp_path))
+            if decodes:
+                await asyncio.wait(decodes.values())
+
+        ids = _allocate_screenshot_ids(db, len(pending))
+        previous = last_capture(db, employee_id) if settings.near_duplicate_policy != "store" else None
+        # (id, content_hash, perceptual_hash) of the capture the next item is compared with
+        last = (previous.id, previous.content_hash, previous.perceptual_hash) if previous is not None else None
+        rows = []
+
+        for item, screenshot_id in zip(pending, ids):
+            upload = item.upload
+            savepoint = db.begin_nested()
+            try:
+                result = None
+                blob = acquire_blob(db, upload.sha256)
+                if blob is None and not settings.screenshot_async_processing:
+                    decode = decodes.get(upload.sha256)
+                    if decode is not None:
+                        result = decode.result()
+                    else:
+                        # The known blob was removed in the meantime
+                        result = await image_pipeline.run(
+                            process_screenshot, upload.temp_path, settings.screenshot_compression_quality
+                        )
+
+                if blob is not None:
+                    perceptual_hash = blob.perceptual_hash
+                elif result is not None:
+                    perceptual_hash = result["perceptual_hash"]
+                else:
+                    perceptual_hash = None
+
+                duplicate_of = None
+                if settings.near_duplicate_policy != "store" and perceptual_hash is not None \
+                        and last is not None and is_near_duplicate(last[2], perceptual_hash):
+                    duplicate_of = last
+
+                if duplicate_of is not None and settings.near_duplicate_policy == "skip":
+                    savepoint.rollback()
+                    upload.discard()
+                    item.status = BATCH_SKIPPED
+                    item.duplicate_of_id = duplicate_of[0]
+                    continue
+
+                if duplicate_of is not None and blob is None:
+                    # Point the new row at the previous capture's file
+                    blob = acquire_blob(db, duplicate_of[1])
+                    if blob is None:
+                        duplicate_of = None
+
+                if blob is not None:
+                    upload.discard()
+                else:
+                    blob = await _store_blob(db, upload, result)
+                savepoint.commit()
+            except Exception as e:
+                savepoint.rollback()
+                upload.discard()
+                item.status = BATCH_FAILED
+                item.detail = "Screenshot processing queue is full, retry later" \
+                    if isinstance(e, PipelineBusyError) else "Error processing screenshot"
+                logger.error(f"Error storing batch screenshot for employee {employee_id}: {str(e)}")
+                continue
+
+            values = _screenshot_values(
+                blob,
+                employee_id=employee_id,
+                time_entry_id=item.time_entry_id,
+                permission_granted=item.permission_granted,
+                device_info=item.device_info,
+                perceptual_hash=perceptual_hash,
+                near_duplicate_of_id=duplicate_of[0] if duplicate_of is not None else None,
+                timestamp=item.captured_at,
+            )
+            values["id"] = screenshot_id
+            rows.append((item, values))
+            if perceptual_hash is not None:
+                last = (screenshot_id, blob.content_hash, perceptual_hash)
+
+        stored = {}
+        if rows:
+            inserted = db.scalars(insert(Screenshot).returning(Screenshot), [values for _, values in rows])
+            stored = {screenshot.id: screenshot for screenshot in inserted}
+        for item, values in rows:
+            item.screenshot = stored[values["id"]]
+            item.status = BATCH_ACCEPTED if item.screenshot.processing_state == STATE_ACCEPTED else BATCH_CREATED
+
+        # Skipped near-duplicates report the capture they duplicate
+        skipped = [item for item in pending if item.status == BATCH_SKIPPED]
+        missing = {item.duplicate_of_id for item in skipped} - set(stored)
+        if missing:
+            stored.update((screenshot.id, screenshot) for screenshot in db.query(Screenshot).filter(
+                Screenshot.id.in_(missing)
+            ))
+        for item in skipped:
+            item.screenshot = stored.get(item.duplicate_of_id)
+
+        notify_screenshots_created(db, [values["id"] for _, values in rows])
+        db.commit()
+    except BaseException:
+        db.rollback()
+        for item in pending:
+            if item.upload is not None:
+                item.upload.discard()
+        raise
+
+    for time_entry_id in {item.time_entry_id for item, _ in rows if item.time_entry_id is not None}:
+        await asyncio.to_thread(invalidate_timelapses, time_entry_id)
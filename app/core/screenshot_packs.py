@@ -0,0 +1,275 @@
+import os
+import struct
+import hashlib
+import logging
+import tempfile
+import uuid
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import Date, cast, func, update, delete
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.storage import storage
+from app.core.blob_store import release_blob, released_blobs, remove_released_blobs
+from app.core.thumbnails import remove_thumbnails
+from app.core.screenshot_worker import STATE_READY
+from app.models.screenshot import Screenshot
+from app.models.screenshot_pack import ScreenshotPack
+
+logger = logging.getLogger(__name__)
+
+# Pack file layout:
+#   magic | member bytes ... | index entries | footer
+# Each index entry is (sha256, offset, length) of one member and the footer
+# locates the index, so a pack can be checked without the database.
+PACK_MAGIC = b"SCRPACK1"
+_INDEX_ENTRY = struct.Struct("<32sQQ")
+_FOOTER = struct.Struct("<QI8s")
+
+
+def pack_path(employee_id: int, day: date) -> str:
+    return os.path.join(
+        settings.upload_dir, "packs", str(employee_id), f"{day.isoformat()}-{uuid.uuid4().hex[:8]}.pack"
+    )
+
+
+class PackWriter:
+    """Builds a pack file in the local staging directory"""
+
+    def __init__(self):
+        os.makedirs(settings.upload_dir, exist_ok=True)
+        fd, self.temp_path = tempfile.mkstemp(dir=settings.upload_dir, prefix=".pack-", suffix=".part")
+        self._file = os.fdopen(fd, "wb")
+        self._file.write(PACK_MAGIC)
+        self._position = len(PACK_MAGIC)
+        self._entries = []
+
+    def add(self, chunks: Iterable[bytes]) -> Tuple[int, int]:
+        """Append one member; returns its (offset, length)"""
+        offset = self._position
+        digest = hashlib.sha256()
+        for chunk in chunks:
+            self._file.write(chunk)
+            digest.update(chunk)
+            self._position += len(chunk)
+        length = self._position - offset
+        self._entries.append(_INDEX_ENTRY.pack(digest.digest(), offset, length))
+        return offset, length
+
+    def finish(self) -> int:
+        """Write the index and footer and flush to disk; returns the file size"""
+        index_offset = self._position
+        for entry in self._entries:
+            self._file.write(entry)
+        self._file.write(_FOOTER.pack(index_offset, len(self._entries), PACK_MAGIC))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        return os.path.getsize(self.temp_path)
+
+    def discard(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+
+def read_pack_index(path: str) -> List[Tuple[str, int, int]]:
+    """(sha256, offset, length) of every member of a stored pack"""
+    stored = storage.stat(path)
+    if stored is None:
+        raise FileNotFoundError(path)
+    footer = b"".join(storage.iter_bytes(path, stored.size - _FOOTER.size, stored.size - 1))
+    index_offset, count, magic = _FOOTER.unpack(footer)
+    if magic != PACK_MAGIC:
+        raise ValueError(f"{path} is not a screenshot pack")
+    index = b"".join(storage.iter_bytes(path, index_offset, index_offset + count * _INDEX_ENTRY.size - 1))
+    return [
+        (digest.hex(), offset, length)
+        for digest, offset, length in _INDEX_ENTRY.iter_unpack(index)
+    ]
+
+
+def verify_pack(path: str) -> int:
+    """Check every member against its stored hash; returns the member count"""
+    entries = read_pack_index(path)
+    for content_hash, offset, length in entries:
+        digest = hashlib.sha256()
+        for chunk in storage.iter_bytes(path, offset, offset + length - 1):
+            digest.update(chunk)
+        if digest.hexdigest() != content_hash:
+            raise ValueError(f"{path}: member at offset {offset} is corrupt")
+    return len(entries)
+
+
+def release_pack_member(db: Session, pack_id: int, count: int = 1) -> Optional[str]:
+    """Drop ``count`` screenshots from a pack; returns the pack's path if they were the last.
+
+    Like ``release_blob``, the row is deleted in the caller's transaction and
+    the caller removes the returned file.
+    """
+    row = db.execute(
+        update(ScreenshotPack)
+        .where(ScreenshotPack.id == pack_id)
+        .values(live_count=ScreenshotPack.live_count - count)
+        .returning(ScreenshotPack.live_count, ScreenshotPack.file_path)
+    ).first()
+    if row is None or row.live_count > 0:
+        return None
+    db.execute(delete(ScreenshotPack).where(ScreenshotPack.id == pack_id))
+    return row.file_path
+
+
+class PackArchiver:
+    """Compacts each employee-day of old screenshots into one pack file.
+
+    Every distinct stored file of the day is appended once, the rows are
+    repointed at (pack, offset, length) and their blob references released,
+    so the individual files and their thumbnails go away. Groups are
+    processed one transaction at a time with the rows locked, which makes the
+    job safe to interrupt and to run next to the API.
+    """
+
+    def __init__(self, older_than_days: int, max_groups: Optional[int] = None, dry_run: bool = False):
+        self.cutoff = datetime.combine(
+            datetime.now(timezone.utc).date() - timedelta(days=older_than_days), time.min, tzinfo=timezone.utc
+        )
+        self.max_groups = max_groups
+        self.dry_run = dry_run
+        self.stats = {"packs": 0, "screenshots": 0, "members": 0, "bytes": 0, "files_removed": 0, "missing": 0}
+
+    def candidates(self, db: Session) -> List[Tuple[int, date]]:
+        """Employee-days that still have unpacked screenshots, oldest first"""
+        day = cast(func.timezone("UTC", Screenshot.timestamp), Date)
+        query = db.query(Screenshot.employee_id, day).filter(
+            Screenshot.pack_id.is_(None),
+            Screenshot.processing_state == STATE_READY,
+            Screenshot.timestamp < self.cutoff
+        ).group_by(Screenshot.employee_id, day).order_by(day, Screenshot.employee_id)
+        if self.max_groups:
+            query = query.limit(self.max_groups)
+        return [(employee_id, group_day) for employee_id, group_day in query]
+
+    def archive_group(self, db: Session, employee_id: int, day: date) -> None:
+        start = datetime.combine(day, time.min, tzinfo=timezone.utc)
+        rows = db.query(Screenshot).filter(
+            Screenshot.employee_id == employee_id,
+            Screenshot.timestamp >= start,
+            Screenshot.timestamp < start + timedelta(days=1),
+            Screenshot.pack_id.is_(None),
+            Screenshot.processing_state == STATE_READY
+        ).order_by(Screenshot.timestamp, Screenshot.id).with_for_update().all()
+        if not rows:
+            return
+
+        if self.dry_run:
+            sources = {row.file_path: row.file_size for row in rows}
+            self.stats["packs"] += 1
+            self.stats["screenshots"] += len(rows)
+            self.stats["members"] += len(sources)
+            self.stats["bytes"] += sum(sources.values())
+            return
+
+        # Screenshots sharing a blob share one member
+        members = {}
+        writer = PackWriter()
+        try:
+            for row in rows:
+                if row.file_path in members:
+                    continue
+                try:
+                    members[row.file_path] = writer.add(storage.iter_bytes(row.file_path))
+                except FileNotFoundError:
+                    logger.warning(f"Screenshot {row.id} is missing from storage; leaving it unpacked")
+                    self.stats["missing"] += 1
+            packed = [row for row in rows if row.file_path in members]
+            if not packed:
+                writer.discard()
+                return
+            file_size = writer.finish()
+            path = pack_path(employee_id, day)
+            storage.put_file(path, writer.temp_path, durable=True)
+        except BaseException:
+            writer.discard()
+            raise
+
+        try:
+            pack = ScreenshotPack(
+                employee_id=employee_id,
+                day=day,
+                file_path=path,
+                file_size=file_size,
+                entry_count=len(members),
+                live_count=len(packed)
+            )
+            db.add(pack)
+            db.flush()
+
+            released = [(row.content_hash, row.file_path) for row in packed]
+            db.execute(update(Screenshot), [
+                {
+                    "id": row.id,
+                    "file_path": path,
+                    "content_hash": None,
+                    "pack_id": pack.id,
+                    "pack_offset": members[row.file_path][0],
+                    "pack_length": members[row.file_path][1],
+                }
+                for row in packed
+            ])
+            db.flush()
+
+            # Drop the references the rows held. Files nothing uses any more
+            # are only removed once the repoint is committed, so a failed
+            # commit leaves every row with its file.
+            released_hashes = set()
+            owned_paths = set()
+            for content_hash, file_path in released:
+                if content_hash:
+                    if release_blob(db, content_hash, defer=True):
+                        released_hashes.add(content_hash)
+                else:
+                    # Stored before content addressing, so the row owned its file
+                    owned_paths.add(file_path)
+            db.commit()
+        except BaseException:
+            db.rollback()
+            storage.delete(path)
+            raise
+
+        files_removed = remove_released_blobs(db, released_hashes)
+        for file_path in owned_paths:
+            try:
+                storage.delete(file_path)
+            except Exception as e:
+                logger.error(f"Error deleting packed screenshot file {file_path}: {str(e)}")
+                continue
+            remove_thumbnails(file_path)
+            files_removed += 1
+
+        self.stats["packs"] += 1
+        self.stats["screenshots"] += len(packed)
+        self.stats["members"] += len(members)
+        self.stats["bytes"] += file_size
+        self.stats["files_removed"] += files_removed
+        logger.info(f"Packed {len(packed)} screenshots of employee {employee_id} on {day} into {path}")
+
+    def run(self) -> dict:
+        db = SessionLocal()
+        try:
+            if not self.dry_run:
+                # Blobs released by a run that stopped before removing their files
+                self.stats["files_removed"] += remove_released_blobs(db, released_blobs(db))
+            for employee_id, day in self.candidates(db):
+                try:
+                    self.archive_group(db, employee_id, day)
+                except Exception as e:
+                    logger.error(f"Error packing screenshots of employee {employee_id} on {day}: {str(e)}")
+                # Releases the row locks after a failure, a dry run or an empty group
+                db.rollback()
+        finally:
+            db.close()
+        return self.stats
@@ -0,0 +1,296 @@
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, exists, or_, select
+from sqlalchemy.orm import aliased
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.image_pipeline import image_pipeline, process_screenshot, PipelineBusyError
+from app.core.thumbnails import thumbnail_path, thumbnail_targets
+from app.core.storage import storage
+from app.core.blob_store import acquire_blob, release_blob, remove_released_blobs
+from app.core.perceptual_hash import find_near_duplicate
+from app.models.screenshot import Screenshot
+from app.models.screenshot_blob import ScreenshotBlob
+
+logger = logging.getLogger(__name__)
+
+# Screenshot.processing_state values
+STATE_ACCEPTED = "accepted"
+STATE_PROCESSING = "processing"
+STATE_READY = "ready"
+STATE_FAILED = "failed"
+
+
+class ScreenshotWorker:
+    """Post-processes screenshots that were accepted without being decoded.
+
+    Processing extracts metadata, recompresses JPEGs and renders the
+    thumbnail derivatives from a single decode.
+
+    All state lives in the ``screenshots`` table: rows are claimed with
+    ``FOR UPDATE SKIP LOCKED`` so several workers can share the backlog, and a
+    row left in ``processing`` by a crashed worker is picked up again once its
+    lease expires. Restarting a worker therefore never loses work.
+
+    Identical uploads share one stored file, which is processed once: only
+    one row per blob is claimed at a time (the blob row is locked while
+    claiming, so workers cannot both take it) and the others wait in
+    ``accepted`` until ``_finish`` fills them in from the result.
+    """
+
+    def __init__(self, batch_size: Optional[int] = None, poll_interval: Optional[float] = None):
+        self.batch_size = batch_size or settings.screenshot_worker_batch_size
+        self.poll_interval = poll_interval or settings.screenshot_worker_poll_interval
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+
+    def _claim_batch(self) -> Tuple[List[dict], int]:
+        now = datetime.now(timezone.utc)
+        lease_expired = now - timedelta(seconds=settings.screenshot_processing_lease_seconds)
+        other = aliased(Screenshot)
+        in_progress = exists().where(
+            other.content_hash == Screenshot.content_hash,
+            other.id != Screenshot.id,
+            other.processing_state == STATE_PROCESSING,
+            other.processing_started_at >= lease_expired
+        )
+        db = SessionLocal()
+        try:
+            rows = db.query(Screenshot).filter(
+                or_(
+                    Screenshot.processing_state == STATE_ACCEPTED,
+                    and_(
+                        Screenshot.processing_state == STATE_PROCESSING,
+                        Screenshot.processing_started_at < lease_expired
+                    )
+                ),
+                # Uploads of content another row is being processed for wait for it
+                ~in_progress
+            ).order_by(Screenshot.id).limit(self.batch_size).with_for_update(skip_locked=True).all()
+
+            # Blobs another worker is claiming right now are left to it
+            hashes = {screenshot.content_hash for screenshot in rows if screenshot.content_hash}
+            blobs = {
+                blob.content_hash: blob
+                for blob in db.query(ScreenshotBlob).filter(
+                    ScreenshotBlob.content_hash.in_(hashes)
+                ).with_for_update(skip_locked=True)
+            } if hashes else {}
+            # ... or that it claimed since the rows were read
+            busy = set(db.scalars(select(Screenshot.content_hash).where(
+                Screenshot.content_hash.in_(list(blobs)),
+                Screenshot.id.notin_([screenshot.id for screenshot in rows]),
+                Screenshot.processing_state == STATE_PROCESSING,
+                Screenshot.processing_started_at >= lease_expired
+            ))) if blobs else set()
+
+            claimed = []
+            updated = 0
+            for screenshot in rows:
+                if screenshot.content_hash:
+                    blob = blobs.get(screenshot.content_hash)
+                    if blob is None or screenshot.content_hash in busy:
+                        continue
+                    if blob.width is not None:
+                        # Shared with an already processed upload: no new decode
+                        screenshot.perceptual_hash = blob.perceptual_hash
+                        screenshot.width = blob.width
+                        screenshot.height = blob.height
+                        screenshot.format = blob.format
+                        screenshot.file_size = blob.file_size
+                        screenshot.processing_state = STATE_READY
+                        screenshot.processing_started_at = None
+                        updated += 1
+                        continue
+                    # Later rows of the batch with the same content wait for this one
+                    busy.add(screenshot.content_hash)
+                screenshot.processing_state = STATE_PROCESSING
+                screenshot.processing_started_at = now
+                screenshot.processing_attempts = (screenshot.processing_attempts or 0) + 1
+                claimed.append({
+                    "id": screenshot.id,
+                    "file_path": screenshot.file_path,
+                    "content_hash": screenshot.content_hash,
+                    "attempts": screenshot.processing_attempts,
+                })
+            db.commit()
+            return claimed, updated + len(claimed)
+        finally:
+            db.close()
+
+    def _finish(self, job: dict, result: Optional[dict]) -> None:
+        db = SessionLocal()
+        try:
+            screenshot = db.query(Screenshot).filter(Screenshot.id == job["id"]).first()
+            if not screenshot:
+                return
+            released_hash = None
+            if result is not None:
+                screenshot.width = result["width"]
+                screenshot.height = result["height"]
+                screenshot.format = result["format"]
+                screenshot.file_size = result["file_size"]
+                screenshot.perceptual_hash = result["perceptual_hash"]
+                screenshot.processing_state = STATE_READY
+                if job["content_hash"]:
+                    db.query(ScreenshotBlob).filter(
+                        ScreenshotBlob.content_hash == job["content_hash"]
+                    ).update({
+                        ScreenshotBlob.width: result["width"],
+                        ScreenshotBlob.height: result["height"],
+                        ScreenshotBlob.format: result["format"],
+                        ScreenshotBlob.file_size: result["file_size"],
+                        ScreenshotBlob.perceptual_hash: result["perceptual_hash"],
+                    })
+                    # Other uploads of the same content waited for this one
+                    db.query(Screenshot).filter(
+                        Screenshot.content_hash == job["content_hash"],
+                        Screenshot.id != job["id"],
+                        Screenshot.processing_state.in_([STATE_ACCEPTED, STATE_PROCESSING])
+                    ).update({
+                        Screenshot.width: result["width"],
+                        Screenshot.height: result["height"],
+                        Screenshot.format: result["format"],
+                        Screenshot.file_size: result["file_size"],
+                        Screenshot.perceptual_hash: result["perceptual_hash"],
+                        Screenshot.processing_state: STATE_READY,
+                        Screenshot.processing_started_at: None,
+                    }, synchronize_session=False)
+                    if settings.near_duplicate_policy != "store":
+                        released_hash = self._collapse_near_duplicate(db, screenshot)
+            elif job["attempts"] >= settings.screenshot_processing_max_attempts:
+                screenshot.processing_state = STATE_FAILED
+            else:
+                screenshot.processing_state = STATE_ACCEPTED
+            screenshot.processing_started_at = None
+            db.commit()
+            if released_hash:
+                remove_released_blobs(db, [released_hash])
+        finally:
+            db.close()
+
+    def _collapse_near_duplicate(self, db, screenshot: Screenshot) -> Optional[str]:
+        """Repoint a near-duplicate at the previous capture's file.
+
+        The row already exists because the client got a 202, so in async
+        mode both the "pointer" and "skip" policies end up here. Returns the
+        hash of the blob this released, whose file the caller removes once
+        the repoint is committed.
+        """
+        previous = find_near_duplicate(
+            db, screenshot.employee_id, screenshot.perceptual_hash, before_id=screenshot.id
+        )
+        if previous is None or previous.content_hash == screenshot.content_hash:
+            return None
+        blob = acquire_blob(db, previous.content_hash)
+        if blob is None:
+            return None
+
+        own_hash = screenshot.content_hash
+        screenshot.content_hash = blob.content_hash
+        screenshot.file_path = blob.file_path
+        screenshot.filename = os.path.basename(blob.file_path)
+        screenshot.file_size = blob.file_size
+        screenshot.near_duplicate_of_id = previous.id
+        db.flush()
+
+        return own_hash if release_blob(db, own_hash, defer=True) else None
+
+    def _release(self, job: dict) -> None:
+        """Hand a claimed row back without counting the attempt"""
+        db = SessionLocal()
+        try:
+            db.query(Screenshot).filter(Screenshot.id == job["id"]).update({
+                Screenshot.processing_state: STATE_ACCEPTED,
+                Screenshot.processing_started_at: None,
+                Screenshot.processing_attempts: Screenshot.processing_attempts - 1,
+            })
+            db.commit()
+        finally:
+            db.close()
+
+    def _store_results(self, job: dict, local_path: str, result: dict) -> None:
+        """Upload what processing wrote next to a fetched copy of the original"""
+        if local_path != job["file_path"] and result["format"] in ['JPEG', 'JPG']:
+            # Recompressed in place
+            storage.put_file(job["file_path"], local_path)
+        for size in settings.thumbnail_sizes:
+            storage.put_file(thumbnail_path(job["file_path"], size), thumbnail_path(local_path, size))
+
+    async def _process(self, job: dict) -> None:
+        local_path = None
+        try:
+            local_path = await asyncio.to_thread(storage.fetch_local, job["file_path"])
+            result = await image_pipeline.run(
+                process_screenshot,
+                local_path,
+                settings.screenshot_compression_quality,
+                thumbnail_targets(local_path),
+                settings.thumbnail_format,
+                settings.thumbnail_quality,
+            )
+            await asyncio.to_thread(self._store_results, job, local_path, result)
+        except PipelineBusyError:
+            await asyncio.to_thread(self._release, job)
+            return
+        except Exception as e:
+            logger.error(f"Error processing screenshot {job['id']}: {str(e)}")
+            result = None
+        finally:
+            if local_path is not None:
+                await asyncio.to_thread(self._discard_local, job["file_path"], local_path)
+        await asyncio.to_thread(self._finish, job, result)
+
+    def _discard_local(self, file_path: str, local_path: str) -> None:
+        storage.discard_local(file_path, local_path)
+        if local_path != file_path:
+            for size in settings.thumbnail_sizes:
+                if os.path.exists(thumbnail_path(local_path, size)):
+                    os.remove(thumbnail_path(local_path, size))
+
+    async def run_once(self) -> int:
+        """Claim and process one batch; returns the number of rows claimed"""
+        jobs, claimed = await asyncio.to_thread(self._claim_batch)
+        if jobs:
+            await asyncio.gather(*(self._process(job) for job in jobs))
+        if claimed:
+            logger.info(f"Post-processed {claimed} screenshots")
+        return claimed
+
+    async def run_forever(self) -> None:
+        while not self._stopping:
+            try:
+                claimed = await self.run_once()
+            except Exception as e:
+                logger.error(f"Screenshot worker error: {str(e)}")
+                claimed = 0
+            if claimed < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    def wake(self) -> None:
+        """Signal that new work was accepted, skipping the poll delay"""
+        self._wakeup.set()
+
+    def start(self) -> None:
+        self._stopping = False
+        self._task = asyncio.create_task(self.run_forever())
+
+    async def stop(self) -> None:
+        self._stopping = True
+        self._wakeup.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+
+screenshot_worker = ScreenshotWorker()
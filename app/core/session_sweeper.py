@@ -0,0 +1,167 @@
+import time
+import asyncio
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal, engine
+from app.core.live_events import notify_sessions_stopped
+from app.core.rollups import add_entries
+from app.core.time_tracking import close_stale_sessions, stale_sessions
+from app.schemas.time_entry import TimeEntry as TimeEntrySchema
+
+logger = logging.getLogger(__name__)
+
+# Key of the advisory lock held for the duration of a sweep
+SWEEP_LOCK_KEY = 5_240_024
+
+
+def stale_session_report(db: Session, now: datetime, stale_after: Optional[int] = None) -> dict:
+    """Dry run: how many sessions a sweep would close right now"""
+    stale_after = stale_after or settings.session_stale_after_seconds
+    stale = stale_sessions(now - timedelta(seconds=stale_after)).subquery()
+    row = db.execute(select(func.count(), func.min(stale.c.last_activity)).select_from(stale)).one()
+    return {"sessions": row[0], "oldest_activity": row[1]}
+
+
+class SessionSweeper:
+    """Closes sessions left open by clients that went away.
+
+    A session is stale once neither a heartbeat nor a screenshot arrived for
+    ``stale_after`` seconds. Stale sessions are closed in batches by
+    ``close_stale_sessions``, ending at their last activity rather than now,
+    and each batch is added to the rollups and announced as
+    ``session_stopped`` events (which keep every worker's active session
+    registry current) in the same transaction.
+
+    Every process may run the sweeper: a sweep first takes a session-level
+    advisory lock on its own connection and is skipped while another node
+    holds it.
+    """
+
+    def __init__(
+        self,
+        stale_after: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        max_batches: Optional[int] = None,
+    ):
+        self.stale_after = stale_after or settings.session_stale_after_seconds
+        self.batch_size = batch_size or settings.session_sweep_batch_size
+        self.max_batches = max_batches
+        self.totals = {"runs": 0, "skipped": 0, "batches": 0, "closed": 0, "seconds_counted": 0, "seconds_dropped": 0}
+        self.last_run: Optional[dict] = None
+        self._stop = threading.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def stats(self) -> dict:
+        """Last sweep and totals since startup"""
+        return {
+            "stale_after": self.stale_after,
+            "last_run": self.last_run,
+            "totals": self.totals,
+        }
+
+    def _sweep_batch(self, db: Session, now: datetime, cutoff: datetime) -> dict:
+        closed = close_stale_sessions(db, cutoff, self.batch_size)
+        if not closed:
+            db.rollback()
+            return {"closed": 0}
+        add_entries(db, closed)
+        notify_sessions_stopped(db, [TimeEntrySchema.model_validate(entry) for entry in closed])
+        db.commit()
+        return {
+            "closed": len(closed),
+            "seconds_counted": sum(entry.duration_seconds for entry in closed),
+            # Time between the last activity and the sweep, which a later stop would have counted
+            "seconds_dropped": sum(int((now - entry.end_time).total_seconds()) for entry in closed),
+        }
+
+    def _sweep(self, connection, run: dict, now: datetime) -> None:
+        cutoff = now - timedelta(seconds=self.stale_after)
+        db = SessionLocal(bind=connection)
+        try:
+            while not self._stop.is_set():
+                if self.max_batches and run["batches"] >= self.max_batches:
+                    break
+                try:
+                    counts = self._sweep_batch(db, now, cutoff)
+                except Exception as e:
+                    db.rollback()
+                    logger.error(f"Session sweeper: error closing a batch: {str(e)}")
+                    break
+                if not counts["closed"]:
+                    break
+                run["batches"] += 1
+                self.totals["batches"] += 1
+                for key in ("closed", "seconds_counted", "seconds_dropped"):
+                    run[key] += counts[key]
+                    self.totals[key] += counts[key]
+                if counts["closed"] < self.batch_size:
+                    break
+        finally:
+            db.close()
+
+    def run(self) -> dict:
+        """Close every session that is stale now; returns this run's counters"""
+        started = time.perf_counter()
+        now = datetime.now(timezone.utc)
+        run = {
+            "started_at": now.isoformat(),
+            "locked": False,
+            "batches": 0, "closed": 0, "seconds_counted": 0, "seconds_dropped": 0,
+        }
+        connection = engine.connect()
+        try:
+            run["locked"] = connection.scalar(select(func.pg_try_advisory_lock(SWEEP_LOCK_KEY)))
+            connection.commit()
+            if run["locked"]:
+                try:
+                    self._sweep(connection, run, now)
+                finally:
+                    try:
+                        connection.scalar(select(func.pg_advisory_unlock(SWEEP_LOCK_KEY)))
+                        connection.commit()
+                    except Exception:
+                        # Never hand a connection that may still hold the lock back to the pool
+                        connection.invalidate()
+                        raise
+        finally:
+            connection.close()
+            run["duration"] = round(time.perf_counter() - started, 3)
+            self.totals["runs"] += 1
+            if not run["locked"]:
+                self.totals["skipped"] += 1
+            self.last_run = run
+
+        if run["closed"]:
+            logger.info(
+                f"Session sweeper: closed {run['closed']} stale sessions in {run['batches']} batches, "
+                f"{run['seconds_dropped']}s of inactivity not counted"
+            )
+        return run
+
+    async def run_forever(self) -> None:
+        while not self._stop.is_set():
+            try:
+                await asyncio.to_thread(self.run)
+            except Exception as e:
+                logger.error(f"Session sweeper error: {str(e)}")
+            await asyncio.to_thread(self._stop.wait, settings.session_sweep_interval)
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._task = asyncio.create_task(self.run_forever())
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+
+session_sweeper = SessionSweeper()
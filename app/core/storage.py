@@ -0,0 +1,290 @@
+import os
+import shutil
+import tempfile
+import logging
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import BinaryIO, Iterator, Optional
+
+from fastapi.responses import FileResponse, StreamingResponse
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK_SIZE = 256 * 1024
+
+
+@dataclass
+class StoredObject:
+    size: int
+    modified: float  # Unix timestamp
+
+
+class StorageBackend(ABC):
+    """Where screenshot files and their derivatives live.
+
+    Files are addressed by the same path that is stored in the ``file_path``
+    columns (``<upload_dir>/ab/cd/<name>``), so rows never need rewriting when
+    the backend changes. Image processing always works on local files:
+    uploads are staged under ``upload_dir`` and ``fetch_local`` provides a
+    local copy of a stored file.
+    """
+
+    @abstractmethod
+    def put_file(self, path: str, local_path: str, durable: bool = False) -> None:
+        """Store a local file at ``path``, taking ownership of (consuming) it"""
+
+    @abstractmethod
+    def put_stream(self, path: str, stream: BinaryIO) -> None:
+        """Store the contents of a readable binary stream at ``path``"""
+
+    @abstractmethod
+    def iter_bytes(self, path: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """Stream the bytes of ``path`` from ``start`` up to and including ``end``"""
+
+    @abstractmethod
+    def delete(self, path: str) -> None:
+        """Remove ``path``; missing files are ignored"""
+
+    @abstractmethod
+    def delete_tree(self, path: str) -> None:
+        """Remove everything stored under the directory ``path``"""
+
+    @abstractmethod
+    def stat(self, path: str) -> Optional[StoredObject]:
+        """Size and modification time of ``path``, or None if it does not exist"""
+
+    def exists(self, path: str) -> bool:
+        return self.stat(path) is not None
+
+    @abstractmethod
+    def fetch_local(self, path: str, offset: int = 0, length: Optional[int] = None) -> str:
+        """A local file with the contents of ``path``, for image processing.
+
+        With ``length`` only that byte range is fetched (a member of a pack
+        file). Pass the result to ``discard_local`` when done. Changes to the
+        local copy are only kept after ``put_file(path, local_path)``.
+        """
+
+    def _fetch_slice(self, path: str, offset: int, length: int) -> str:
+        os.makedirs(settings.upload_dir, exist_ok=True)
+        fd, local_path = tempfile.mkstemp(dir=settings.upload_dir, prefix=".fetch-", suffix=os.path.splitext(path)[1])
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for chunk in self.iter_bytes(path, offset, offset + length - 1):
+                    out.write(chunk)
+        except BaseException:
+            os.remove(local_path)
+            raise
+        return local_path
+
+    @abstractmethod
+    def discard_local(self, path: str, local_path: str) -> None:
+        """Remove a copy made by ``fetch_local`` (unless it is the stored file itself)"""
+
+    @abstractmethod
+    def response(self, path: str, media_type: str, filename: Optional[str] = None, headers: Optional[dict] = None):
+        """An HTTP response that sends the whole file"""
+
+
+class LocalStorage(StorageBackend):
+    """Files on the local filesystem (or a shared mount), at their stored paths"""
+
+    def put_file(self, path: str, local_path: str, durable: bool = False) -> None:
+        if os.path.abspath(local_path) == os.path.abspath(path):
+            return
+        if durable:
+            fd = os.open(local_path, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        os.replace(local_path, path)
+        if durable:
+            fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def put_stream(self, path: str, stream: BinaryIO) -> None:
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".put-", suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                shutil.copyfileobj(stream, out, READ_CHUNK_SIZE)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def iter_bytes(self, path: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        # Positional reads, so slices of one pack file can be served concurrently
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            position = start
+            while end is None or position <= end:
+                size = READ_CHUNK_SIZE if end is None else min(READ_CHUNK_SIZE, end - position + 1)
+                chunk = os.pread(fd, size, position)
+                if not chunk:
+                    break
+                position += len(chunk)
+                yield chunk
+        finally:
+            os.close(fd)
+
+    def delete(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def delete_tree(self, path: str) -> None:
+        shutil.rmtree(path, ignore_errors=True)
+
+    def stat(self, path: str) -> Optional[StoredObject]:
+        try:
+            result = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return StoredObject(size=result.st_size, modified=result.st_mtime)
+
+    def fetch_local(self, path: str, offset: int = 0, length: Optional[int] = None) -> str:
+        if length is not None:
+            return self._fetch_slice(path, offset, length)
+        return path
+
+    def discard_local(self, path: str, local_path: str) -> None:
+        if local_path != path and os.path.exists(local_path):
+            os.remove(local_path)
+
+    def response(self, path: str, media_type: str, filename: Optional[str] = None, headers: Optional[dict] = None):
+        return FileResponse(path, filename=filename, media_type=media_type, headers=headers)
+
+
+class S3Storage(StorageBackend):
+    """Objects in an S3-compatible bucket (AWS S3, MinIO, or a local stand-in).
+
+    One boto3 client is shared by every request, so its connection pool
+    (``s3_max_pool_connections``) is reused across uploads and downloads.
+    Files above ``s3_multipart_threshold`` are uploaded in parallel parts.
+    """
+
+    def __init__(self):
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+            from botocore.config import Config
+            from botocore.exceptions import ClientError
+        except ImportError:
+            raise RuntimeError("STORAGE_BACKEND=s3 requires the boto3 package")
+
+        self._client_error = ClientError
+        self.bucket = settings.s3_bucket
+        self.prefix = settings.s3_prefix.strip("/")
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=settings.s3_endpoint_url,
+            region_name=settings.s3_region,
+            aws_access_key_id=settings.s3_access_key_id,
+            aws_secret_access_key=settings.s3_secret_access_key,
+            config=Config(
+                max_pool_connections=settings.s3_max_pool_connections,
+                retries={"max_attempts": 5, "mode": "standard"},
+            ),
+        )
+        self.transfer_config = TransferConfig(
+            multipart_threshold=settings.s3_multipart_threshold,
+            multipart_chunksize=settings.s3_multipart_chunksize,
+            max_concurrency=settings.s3_multipart_concurrency,
+        )
+
+    def key(self, path: str) -> str:
+        """Object key for a stored path: its location relative to upload_dir"""
+        relative = os.path.relpath(path, settings.upload_dir).replace(os.sep, "/")
+        return f"{self.prefix}/{relative}" if self.prefix else relative
+
+    def put_file(self, path: str, local_path: str, durable: bool = False) -> None:
+        # A successful PUT is durable, so there is nothing extra to do for ``durable``
+        self.client.upload_file(local_path, self.bucket, self.key(path), Config=self.transfer_config)
+        os.remove(local_path)
+
+    def put_stream(self, path: str, stream: BinaryIO) -> None:
+        self.client.upload_fileobj(stream, self.bucket, self.key(path), Config=self.transfer_config)
+
+    def iter_bytes(self, path: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        arguments = {"Bucket": self.bucket, "Key": self.key(path)}
+        if start or end is not None:
+            arguments["Range"] = f"bytes={start}-{'' if end is None else end}"
+        try:
+            body = self.client.get_object(**arguments)["Body"]
+        except self._client_error as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                raise FileNotFoundError(path)
+            raise
+        try:
+            yield from body.iter_chunks(READ_CHUNK_SIZE)
+        finally:
+            body.close()
+
+    def delete(self, path: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self.key(path))
+
+    def delete_tree(self, path: str) -> None:
+        paginator = self.client.get_paginator("list_objects_v2")
+        # A page holds at most 1000 keys, which is also the DeleteObjects limit
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=f"{self.key(path)}/"):
+            objects = [{"Key": item["Key"]} for item in page.get("Contents", [])]
+            if objects:
+                self.client.delete_objects(Bucket=self.bucket, Delete={"Objects": objects, "Quiet": True})
+
+    def stat(self, path: str) -> Optional[StoredObject]:
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self.key(path))
+        except self._client_error as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return StoredObject(size=head["ContentLength"], modified=head["LastModified"].timestamp())
+
+    def fetch_local(self, path: str, offset: int = 0, length: Optional[int] = None) -> str:
+        if length is not None:
+            return self._fetch_slice(path, offset, length)
+        os.makedirs(settings.upload_dir, exist_ok=True)
+        fd, local_path = tempfile.mkstemp(
+            dir=settings.upload_dir, prefix=".fetch-", suffix=os.path.splitext(path)[1]
+        )
+        os.close(fd)
+        try:
+            self.client.download_file(self.bucket, self.key(path), local_path, Config=self.transfer_config)
+        except BaseException:
+            os.remove(local_path)
+            raise
+        return local_path
+
+    def discard_local(self, path: str, local_path: str) -> None:
+        if os.path.exists(local_path):
+            os.remove(local_path)
+
+    def response(self, path: str, media_type: str, filename: Optional[str] = None, headers: Optional[dict] = None):
+        headers = dict(headers or {})
+        if "Content-Length" not in headers:
+            stored = self.stat(path)
+            if stored is not None:
+                headers["Content-Length"] = str(stored.size)
+        if filename:
+            headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return StreamingResponse(self.iter_bytes(path), media_type=media_type, headers=headers)
+
+
+def create_storage() -> StorageBackend:
+    if settings.storage_backend == "s3":
+        return S3Storage()
+    return LocalStorage()
+
+
+storage = create_storage()
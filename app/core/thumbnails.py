@@ -0,0 +1,86 @@
+import os
+import asyncio
+import logging
+from typing import Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.image_pipeline import image_pipeline, generate_thumbnails, THUMBNAIL_FORMATS
+from app.core.storage import storage
+
+logger = logging.getLogger(__name__)
+
+# Thumbnails currently being generated, so concurrent requests share one job
+_pending: Dict[str, asyncio.Future] = {}
+
+
+def thumbnail_media_type() -> str:
+    return THUMBNAIL_FORMATS[settings.thumbnail_format][2]
+
+
+def thumbnail_path(file_path: str, size: str, offset: Optional[int] = None) -> str:
+    """Path of a derivative, stored next to the original as <stem>.<size>.<ext>.
+
+    Members of a pack file (``offset``) get <pack stem>.<offset>.<size>.<ext>.
+    """
+    stem, _ = os.path.splitext(file_path)
+    if offset is not None:
+        stem = f"{stem}.{offset}"
+    return f"{stem}.{size}.{THUMBNAIL_FORMATS[settings.thumbnail_format][1]}"
+
+
+def thumbnail_targets(file_path: str) -> Dict[str, Tuple[int, str]]:
+    """Every configured derivative of an original, for the image pipeline"""
+    return {
+        size: (max_dimension, thumbnail_path(file_path, size))
+        for size, max_dimension in settings.thumbnail_sizes.items()
+    }
+
+
+async def _generate_thumbnail(
+    file_path: str, size: str, target: str, offset: Optional[int], length: Optional[int]
+) -> None:
+    local_path = await asyncio.to_thread(storage.fetch_local, file_path, offset or 0, length)
+    local_target = thumbnail_path(local_path, size)
+    try:
+        await image_pipeline.run(
+            generate_thumbnails,
+            local_path,
+            {size: (settings.thumbnail_sizes[size], local_target)},
+            settings.thumbnail_format,
+            settings.thumbnail_quality,
+        )
+        await asyncio.to_thread(storage.put_file, target, local_target)
+    finally:
+        await asyncio.to_thread(storage.discard_local, file_path, local_path)
+        if local_target != target and os.path.exists(local_target):
+            os.remove(local_target)
+
+
+async def ensure_thumbnail(
+    file_path: str, size: str, offset: Optional[int] = None, length: Optional[int] = None
+) -> str:
+    """Return the derivative path, generating it in the image pool on first use.
+
+    ``offset`` and ``length`` select a member of a pack file.
+    """
+    target = thumbnail_path(file_path, size, offset)
+    if await asyncio.to_thread(storage.exists, target):
+        return target
+
+    pending = _pending.get(target)
+    if pending is None:
+        pending = asyncio.ensure_future(_generate_thumbnail(file_path, size, target, offset, length))
+        _pending[target] = pending
+        pending.add_done_callback(lambda _: _pending.pop(target, None))
+    await asyncio.shield(pending)
+    return target
+
+
+def remove_thumbnails(file_path: str, offset: Optional[int] = None) -> None:
+    """Delete every derivative of an original (or of a pack member)"""
+    for size in settings.thumbnail_sizes:
+        target = thumbnail_path(file_path, size, offset)
+        try:
+            storage.delete(target)
+        except Exception as e:
+            logger.error(f"Error deleting thumbnail {target}: {str(e)}")
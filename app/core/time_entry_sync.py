@@ -0,0 +1,218 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import DateTime, Integer, String, column, exists, func, literal, select, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.rollups import add_entries
+from app.models.project import Project, project_employees
+from app.models.task import Task
+from app.models.time_entry import TimeEntry
+from app.schemas.time_entry import TimeEntrySyncItem, TimeEntrySyncItemResult
+
+# TimeEntrySyncItemResult.status values
+SYNC_CREATED = "created"
+SYNC_DUPLICATE = "duplicate"
+SYNC_REJECTED = "rejected"
+
+# Longest values the time_entries columns hold
+MAX_CLIENT_KEY_LENGTH = 64
+MAX_IP_ADDRESS_LENGTH = 45
+MAX_MAC_ADDRESS_LENGTH = 17
+# Largest Integer (ids, duration_seconds)
+MAX_INTEGER = 2**31 - 1
+# How far ahead of the server clock an offline entry may end
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+
+def _as_utc(value: datetime) -> datetime:
+    # Naive datetimes from clients are taken as UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def sync_checks(db: Session, employee_id: int, entries: List[TimeEntrySyncItem]) -> List:
+    """Everything storing a batch of offline entries depends on, in one
+    round trip: one row per entry, in order.
+
+    Each row has ``existing_id`` (the entry already stored under its client
+    key, if any), ``project_exists``, ``is_member``, ``task_in_project`` and
+    ``overlapping_id`` (a stored entry of the employee overlapping it, open
+    sessions counting as never ending).
+    """
+    batch = values(
+        column("position", Integer),
+        column("client_key", String),
+        column("project_id", Integer),
+        column("task_id", Integer),
+        column("start_time", DateTime(timezone=True)),
+        column("end_time", DateTime(timezone=True)),
+        name="batch",
+    ).data([
+        (position, entry.client_key, entry.project_id, entry.task_id, _as_utc(entry.start_time), _as_utc(entry.end_time))
+        for position, entry in enumerate(entries)
+    ])
+    own_entries = TimeEntry.employee_id == employee_id
+    return db.execute(select(
+        batch.c.position,
+        select(TimeEntry.id).where(
+            own_entries, TimeEntry.client_key == batch.c.client_key
+        ).scalar_subquery().label("existing_id"),
+        exists().where(Project.id == batch.c.project_id).label("project_exists"),
+        exists().where(
+            project_employees.c.project_id == batch.c.project_id, project_employees.c.employee_id == employee_id
+        ).label("is_member"),
+        exists().where(Task.id == batch.c.task_id, Task.project_id == batch.c.project_id).label("task_in_project"),
+        select(TimeEntry.id).where(
+            own_entries,
+            TimeEntry.start_time < batch.c.end_time,
+            func.coalesce(TimeEntry.end_time, literal("infinity", DateTime(timezone=True))) > batch.c.start_time,
+            TimeEntry.client_key.is_distinct_from(batch.c.client_key),
+        ).order_by(TimeEntry.start_time).limit(1).scalar_subquery().label("overlapping_id"),
+    ).select_from(batch).order_by(batch.c.position)).all()
+
+
+def _invalid(entry: TimeEntrySyncItem, now: datetime) -> Optional[str]:
+    """Checks of an entry on its own. Entries failing them are rejected
+    before the batch reaches the database, where a value that does not fit
+    its column would fail the whole INSERT."""
+    if not 1 <= len(entry.client_key) <= MAX_CLIENT_KEY_LENGTH:
+        return f"client_key must be 1 to {MAX_CLIENT_KEY_LENGTH} characters"
+    if not 1 <= entry.project_id <= MAX_INTEGER:
+        return "Project not found"
+    if not 1 <= entry.task_id <= MAX_INTEGER:
+        return "Task not found or doesn't belong to project"
+    if entry.ip_address is not None and len(entry.ip_address) > MAX_IP_ADDRESS_LENGTH:
+        return f"ip_address must be at most {MAX_IP_ADDRESS_LENGTH} characters"
+    if entry.mac_address is not None and len(entry.mac_address) > MAX_MAC_ADDRESS_LENGTH:
+        return f"mac_address must be at most {MAX_MAC_ADDRESS_LENGTH} characters"
+    if _as_utc(entry.end_time) <= _as_utc(entry.start_time):
+        return "end_time must be after start_time"
+    if _as_utc(entry.end_time) > now + MAX_CLOCK_SKEW:
+        return "end_time is in the future"
+    if (_as_utc(entry.end_time) - _as_utc(entry.start_time)).total_seconds() > MAX_INTEGER:
+        return "Entry is too long"
+    return None
+
+
+def _rejection(checks) -> Optional[str]:
+    if not checks.project_exists:
+        return "Project not found"
+    if not checks.is_member:
+        return "Employee not assigned to this project"
+    if not checks.task_in_project:
+        return "Task not found or doesn't belong to project"
+    if checks.overlapping_id is not None:
+        return f"Overlaps time entry {checks.overlapping_id}"
+    return None
+
+
+def _settle_batch(
+    accepted: List[Tuple[TimeEntrySyncItem, TimeEntrySyncItemResult]]
+) -> List[Tuple[TimeEntrySyncItem, TimeEntrySyncItemResult]]:
+    """The entries of a batch that can be stored together, by start time.
+
+    Of entries overlapping each other the earliest start wins (the lower
+    index on a tie), and of repeated client keys the first one kept; the
+    others get their rejection detail.
+    """
+    kept = []
+    latest_end = None
+    keys = set()
+    for entry, result in sorted(accepted, key=lambda item: (_as_utc(item[0].start_time), item[1].index)):
+        if entry.client_key in keys:
+            result.detail = "client_key repeated in batch"
+        elif latest_end is not None and _as_utc(entry.start_time) < latest_end[0]:
+            result.detail = f"Overlaps entry {latest_end[1]} of this batch"
+        else:
+            kept.append((entry, result))
+            keys.add(entry.client_key)
+            latest_end = (_as_utc(entry.end_time), result.index)
+    return kept
+
+
+def sync_time_entries(
+    db: Session, employee_id: int, entries: List[TimeEntrySyncItem], now: datetime
+) -> List[TimeEntrySyncItemResult]:
+    """Store a batch of completed offline entries of one employee, in the
+    caller's transaction, and return one result per entry.
+
+    Entries are first checked on their own (``_invalid``), then the rest in
+    one query for the whole batch (``sync_checks``); entries that overlap
+    each other are settled in memory, the earliest start winning. The
+    accepted entries are written with one multi-row ``INSERT ... ON
+    CONFLICT DO NOTHING`` on (employee_id, client_key), so replaying
+    a batch, or part of one, stores nothing twice: keys already stored come
+    back as duplicates with their entry's id. The new entries are added to
+    the rollups in the same transaction.
+
+    The caller should hold the employee row lock, so concurrent syncs of one
+    employee cannot both pass the overlap check.
+    """
+    if not entries:
+        return []
+    results = [
+        TimeEntrySyncItemResult(index=index, client_key=entry.client_key, status=SYNC_REJECTED)
+        for index, entry in enumerate(entries)
+    ]
+    valid = []
+    for entry, result in zip(entries, results):
+        result.detail = _invalid(entry, now)
+        if result.detail is None:
+            valid.append((entry, result))
+    if not valid:
+        return results
+
+    accepted = []
+    for (entry, result), checks in zip(valid, sync_checks(db, employee_id, [entry for entry, _ in valid])):
+        if checks.existing_id is not None:
+            result.status = SYNC_DUPLICATE
+            result.time_entry_id = checks.existing_id
+            continue
+        result.detail = _rejection(checks)
+        if result.detail is None:
+            accepted.append((entry, result))
+
+    kept = _settle_batch(accepted)
+    if not kept:
+        return results
+
+    rows = [
+        {
+            "employee_id": employee_id,
+            "project_id": entry.project_id,
+            "task_id": entry.task_id,
+            "start_time": _as_utc(entry.start_time),
+            "end_time": _as_utc(entry.end_time),
+            "duration_seconds": int((_as_utc(entry.end_time) - _as_utc(entry.start_time)).total_seconds()),
+            "start_ip_address": entry.ip_address,
+            "start_mac_address": entry.mac_address,
+            "device_info": entry.device_info,
+            "is_active": False,
+            "client_key": entry.client_key,
+        }
+        for entry, _ in kept
+    ]
+    statement = insert(TimeEntry).values(rows).on_conflict_do_nothing(
+        index_elements=[TimeEntry.employee_id, TimeEntry.client_key]
+    ).returning(TimeEntry)
+    created = db.scalars(statement, execution_options={"populate_existing": True}).all()
+    created_by_key: Dict[str, TimeEntry] = {entry.client_key: entry for entry in created}
+    add_entries(db, created)
+
+    # Keys a concurrent replay stored first
+    raced = [entry.client_key for entry, _ in kept if entry.client_key not in created_by_key]
+    existing = dict(db.execute(
+        select(TimeEntry.client_key, TimeEntry.id).where(
+            TimeEntry.employee_id == employee_id, TimeEntry.client_key.in_(raced)
+        )
+    ).all()) if raced else {}
+
+    for entry, result in kept:
+        if entry.client_key in created_by_key:
+            result.status = SYNC_CREATED
+            result.time_entry_id = created_by_key[entry.client_key].id
+        else:
+            result.status = SYNC_DUPLICATE
+            result.time_entry_id = existing.get(entry.client_key)
+    return results
@@ -0,0 +1,128 @@
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import DateTime, Integer, and_, cast, exists, func, literal, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+
+from app.models.employee import Employee
+from app.models.project import Project, project_employees
+from app.models.screenshot import Screenshot
+from app.models.task import Task
+from app.models.time_entry import TimeEntry
+
+
+def open_session_filter():
+    """Predicate of an employee's open session; matches the partial unique
+    index uq_time_entries_employee_id_open"""
+    return and_(TimeEntry.end_time.is_(None), TimeEntry.is_active == True)
+
+
+def start_checks(db: Session, employee_id: int, project_id: int, task_id: int) -> Row:
+    """Everything starting a session depends on, in one round trip.
+
+    Returns ``employee_name``, ``employee_email`` and the employee's current
+    device fields (all None unless the employee exists and is active),
+    ``project_name`` (None if the project does not exist), ``task_name``,
+    ``is_member``, ``task_in_project`` and ``has_open_session``. Membership is a primary key lookup in
+    project_employees rather than loading the project's members.
+    """
+    one_row = select(literal(1).label("one")).subquery()
+    return db.execute(select(
+        Employee.name.label("employee_name"),
+        Employee.email.label("employee_email"),
+        Employee.last_ip_address,
+        Employee.last_mac_address,
+        Employee.device_info,
+        select(Project.name).where(Project.id == project_id).scalar_subquery().label("project_name"),
+        select(Task.name).where(Task.id == task_id).scalar_subquery().label("task_name"),
+        exists().where(
+            project_employees.c.project_id == project_id, project_employees.c.employee_id == employee_id
+        ).label("is_member"),
+        exists().where(Task.id == task_id, Task.project_id == project_id).label("task_in_project"),
+        exists().where(TimeEntry.employee_id == employee_id, open_session_filter()).label("has_open_session"),
+    ).select_from(one_row).outerjoin(
+        Employee, and_(Employee.id == employee_id, Employee.status == "active")
+    )).one()
+
+
+def open_session(db: Session, **values) -> Optional[TimeEntry]:
+    """Insert a new open session, or return None if the employee already has
+    one, in a single ``INSERT ... ON CONFLICT DO NOTHING RETURNING``.
+
+    The unique index decides, so two starts racing each other cannot both
+    win even when both passed ``start_checks``.
+    """
+    statement = insert(TimeEntry).values(**values).on_conflict_do_nothing(
+        index_elements=[TimeEntry.employee_id],
+        index_where=open_session_filter(),
+    ).returning(TimeEntry)
+    return db.scalars(statement, execution_options={"populate_existing": True}).first()
+
+
+def _duration_seconds(end):
+    return cast(func.floor(func.extract("epoch", end - TimeEntry.start_time)), Integer)
+
+
+def close_session(db: Session, employee_id: int, end_time: datetime) -> Optional[TimeEntry]:
+    """Close the employee's open session with a single ``UPDATE ... RETURNING``
+    and return it, or None if there was none.
+
+    A concurrent stop blocks on the row lock and then finds the session
+    already closed, so a session is closed (and counted) exactly once.
+    """
+    end = literal(end_time, DateTime(timezone=True))
+    statement = update(TimeEntry).where(
+        TimeEntry.employee_id == employee_id,
+        open_session_filter(),
+    ).values(
+        end_time=end,
+        duration_seconds=_duration_seconds(end),
+        is_active=False,
+    ).returning(TimeEntry)
+    return db.scalars(
+        statement, execution_options={"synchronize_session": False, "populate_existing": True}
+    ).first()
+
+
+def stale_sessions(cutoff: datetime):
+    """Open sessions whose last activity (start, last heartbeat or latest
+    screenshot) is before ``cutoff``, as ``(id, last_activity)`` rows.
+
+    The heartbeat is checked first, so the screenshots are only looked at
+    for sessions that stopped sending heartbeats (or never did).
+    """
+    last_screenshot = select(func.max(Screenshot.timestamp)).where(
+        Screenshot.time_entry_id == TimeEntry.id
+    ).scalar_subquery()
+    last_activity = func.greatest(TimeEntry.start_time, TimeEntry.last_heartbeat_at, last_screenshot)
+    return select(TimeEntry.id, last_activity.label("last_activity")).where(
+        open_session_filter(),
+        func.coalesce(TimeEntry.last_heartbeat_at, TimeEntry.start_time) < cutoff,
+        last_activity < cutoff,
+    )
+
+
+def close_stale_sessions(db: Session, cutoff: datetime, limit: int) -> List[TimeEntry]:
+    """Close up to ``limit`` stale sessions at their last activity in one
+    ``UPDATE ... RETURNING`` and return them.
+
+    The sessions are picked with SKIP LOCKED, so a stop in progress wins and
+    the sweep moves on; a session that got a heartbeat in the meantime no
+    longer qualifies once its row is locked.
+    """
+    stale = stale_sessions(cutoff).order_by(TimeEntry.id).limit(limit).with_for_update(
+        of=TimeEntry, skip_locked=True
+    ).cte("stale")
+    statement = update(TimeEntry).where(
+        TimeEntry.id == stale.c.id,
+        open_session_filter(),
+    ).values(
+        end_time=stale.c.last_activity,
+        duration_seconds=_duration_seconds(stale.c.last_activity),
+        is_active=False,
+    ).returning(TimeEntry)
+    return db.scalars(
+        statement, execution_options={"synchronize_session": False, "populate_existing": True}
+    ).all()
@@ -0,0 +1,128 @@
+import os
+import asyncio
+import hashlib
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.image_pipeline import image_pipeline, render_timelapse
+from app.core.storage import storage
+from app.models.screenshot import Screenshot
+
+logger = logging.getLogger(__name__)
+
+TIMELAPSE_MODES = ("animation", "mosaic")
+TIMELAPSE_MEDIA_TYPE = "image/webp"
+
+# Renders currently in progress, so concurrent requests share one job
+_pending: Dict[str, asyncio.Future] = {}
+
+
+def timelapse_dir(time_entry_id: int, mode: Optional[str] = None) -> str:
+    """Directory of an entry's cached renders (of one mode)"""
+    path = os.path.join(settings.upload_dir, "timelapses", str(time_entry_id))
+    return os.path.join(path, mode) if mode else path
+
+
+def timelapse_frames(db: Session, time_entry_id: int) -> List[Screenshot]:
+    """Screenshots of a time entry in capture order, evenly thinned to
+    ``timelapse_max_frames``"""
+    screenshots = db.query(Screenshot).filter(
+        Screenshot.time_entry_id == time_entry_id
+    ).order_by(Screenshot.timestamp, Screenshot.id).all()
+    limit = settings.timelapse_max_frames
+    if len(screenshots) > limit:
+        step = len(screenshots) / limit
+        screenshots = [screenshots[int(index * step)] for index in range(limit)]
+    return screenshots
+
+
+def timelapse_key(screenshots: List[Screenshot], mode: str) -> str:
+    """Cache key of a render: changes whenever the screenshot set, a file
+    behind it or the render settings change"""
+    digest = hashlib.sha256()
+    digest.update(
+        f"{mode}|{settings.timelapse_frame_width}|{settings.timelapse_frame_duration_ms}|"
+        f"{settings.timelapse_mosaic_tile_width}|{settings.timelapse_mosaic_columns}|"
+        f"{settings.timelapse_quality}".encode()
+    )
+    for screenshot in screenshots:
+        digest.update(f"|{screenshot.id}:{screenshot.file_path}:{screenshot.pack_offset}".encode())
+    return digest.hexdigest()[:32]
+
+
+def timelapse_path(time_entry_id: int, mode: str, key: str) -> str:
+    return os.path.join(timelapse_dir(time_entry_id, mode), f"{key}.webp")
+
+
+async def _render(time_entry_id: int, screenshots: List[Screenshot], mode: str, target: str) -> None:
+    local_paths = []
+    labels = []
+    try:
+        for screenshot in screenshots:
+            try:
+                local_path = await asyncio.to_thread(
+                    storage.fetch_local, screenshot.file_path, screenshot.pack_offset or 0, screenshot.pack_length
+                )
+            except Exception as e:
+                logger.warning(f"Timelapse: screenshot {screenshot.id} is missing from storage: {str(e)}")
+                continue
+            local_paths.append((screenshot.file_path, local_path))
+            labels.append(f"{screenshot.timestamp:%H:%M}" if screenshot.timestamp else "")
+
+        # Renders of an older screenshot set can no longer be requested
+        await asyncio.to_thread(storage.delete_tree, timelapse_dir(time_entry_id, mode))
+
+        os.makedirs(settings.upload_dir, exist_ok=True)
+        local_target = os.path.join(settings.upload_dir, f".timelapse-{os.path.basename(target)}")
+        try:
+            result = await image_pipeline.run(
+                render_timelapse,
+                [local_path for _, local_path in local_paths],
+                labels,
+                local_target,
+                mode,
+                settings.timelapse_mosaic_tile_width if mode == "mosaic" else settings.timelapse_frame_width,
+                settings.timelapse_frame_duration_ms,
+                settings.timelapse_mosaic_columns,
+                settings.timelapse_quality,
+            )
+            await asyncio.to_thread(storage.put_file, target, local_target)
+        finally:
+            if os.path.exists(local_target):
+                os.remove(local_target)
+    finally:
+        for file_path, local_path in local_paths:
+            await asyncio.to_thread(storage.discard_local, file_path, local_path)
+
+    logger.info(
+        f"Rendered {mode} timelapse of time entry {time_entry_id}: "
+        f"{result['frames']} frames, {result['file_size']} bytes"
+    )
+
+
+async def ensure_timelapse(time_entry_id: int, screenshots: List[Screenshot], mode: str) -> Tuple[str, str]:
+    """Return the (path, key) of a render, producing it in the image pool if
+    this screenshot set has not been rendered yet"""
+    key = timelapse_key(screenshots, mode)
+    target = timelapse_path(time_entry_id, mode, key)
+    if await asyncio.to_thread(storage.exists, target):
+        return target, key
+
+    pending = _pending.get(target)
+    if pending is None:
+        pending = asyncio.ensure_future(_render(time_entry_id, screenshots, mode, target))
+        _pending[target] = pending
+        pending.add_done_callback(lambda _: _pending.pop(target, None))
+    await asyncio.shield(pending)
+    return target, key
+
+
+def invalidate_timelapses(time_entry_id: int) -> None:
+    """Drop cached renders after screenshots of a time entry were added or deleted"""
+    try:
+        storage.delete_tree(timelapse_dir(time_entry_id))
+    except Exception as e:
+        logger.error(f"Error deleting timelapses of time entry {time_entry_id}: {str(e)}")
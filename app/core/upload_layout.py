@@ -0,0 +1,33 @@
+import os
+
+from app.core.config import settings
+
+# Hex characters per directory level in the sharded layout
+SHARD_WIDTH = 2
+
+
+def shard_dirs(filename: str) -> str:
+    """Relative fan-out directory for a file name, e.g. "ab/cd" for "abcd1234.png".
+
+    Stored names start with a SHA-256 or a random UUID, so the leading
+    characters spread files evenly over the directories.
+    """
+    parts = [
+        filename[level * SHARD_WIDTH:(level + 1) * SHARD_WIDTH]
+        for level in range(settings.upload_shard_depth)
+    ]
+    return os.path.join(*parts) if parts else ""
+
+
+def storage_path(filename: str, layout: str = None) -> str:
+    """Where a stored file lives under the upload directory"""
+    layout = layout or settings.upload_layout
+    if layout == "sharded":
+        return os.path.join(settings.upload_dir, shard_dirs(filename), filename)
+    return os.path.join(settings.upload_dir, filename)
+
+
+def is_in_layout(file_path: str, layout: str = None) -> bool:
+    return os.path.normpath(file_path) == os.path.normpath(
+        storage_path(os.path.basename(file_path), layout)
+    )
@@ -0,0 +1,130 @@
+import os
+import hashlib
+import tempfile
+import logging
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import UploadFile
+
+from app.core.config import settings
+from app.core.storage import storage
+
+logger = logging.getLogger(__name__)
+
+# Slack allowed on top of the file size for multipart boundaries and form fields
+UPLOAD_FORM_OVERHEAD = 64 * 1024
+
+# Magic numbers of the image formats we know how to recognise
+_IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+)
+
+_EXTENSIONS = {"jpeg": "jpg", "png": "png", "gif": "gif", "webp": "webp"}
+
+SNIFF_LENGTH = 16
+
+
+class UploadTooLargeError(Exception):
+    """Raised as soon as an upload goes over the configured size limit"""
+
+
+class UnsupportedImageError(Exception):
+    """Raised when the uploaded bytes are not an allowed image format"""
+
+
+def sniff_image_format(head: bytes) -> Optional[str]:
+    """Detect the image format from the first bytes of a file"""
+    if len(head) >= 12 and head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    for signature, image_format in _IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return image_format
+    return None
+
+
+def is_allowed_format(image_format: Optional[str]) -> bool:
+    allowed = {fmt.lower() for fmt in settings.allowed_screenshot_formats}
+    return image_format is not None and (
+        image_format in allowed or _EXTENSIONS[image_format] in allowed
+    )
+
+
+@dataclass
+class ReceivedUpload:
+    """An upload that has been spooled to a temp file inside the upload directory"""
+    temp_path: str
+    size: int
+    image_format: str
+    sha256: str
+
+    @property
+    def extension(self) -> str:
+        return _EXTENSIONS[self.image_format]
+
+    def commit(self, final_path: str, durable: bool = False) -> None:
+        """Hand the temp file to the storage backend at its final path.
+
+        With ``durable`` the bytes survive a crash once this returns.
+        """
+        storage.put_file(final_path, self.temp_path, durable=durable)
+
+    def discard(self) -> None:
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+
+async def receive_upload(
+    file: UploadFile,
+    directory: Optional[str] = None,
+    max_size: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+) -> ReceivedUpload:
+    """Stream an uploaded file to a temp file in fixed-size chunks.
+
+    The size limit is enforced while bytes arrive and the image type is sniffed
+    from the first chunk, so oversized or non-image uploads are rejected without
+    ever holding the whole file in memory. The SHA-256 of the content is
+    computed on the way through. The temp file lives in the target directory
+    so that ``ReceivedUpload.commit`` is an atomic rename.
+    """
+    directory = directory or settings.upload_dir
+    max_size = max_size or settings.max_screenshot_size
+    chunk_size = chunk_size or settings.upload_chunk_size
+
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".upload-", suffix=".part")
+    size = 0
+    image_format = None
+    digest = hashlib.sha256()
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                if image_format is None:
+                    image_format = sniff_image_format(chunk[:SNIFF_LENGTH])
+                    if not is_allowed_format(image_format):
+                        raise UnsupportedImageError(image_format)
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLargeError(size)
+                digest.update(chunk)
+                out.write(chunk)
+        if image_format is None:
+            raise UnsupportedImageError(None)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    return ReceivedUpload(
+        temp_path=temp_path,
+        size=size,
+        image_format=image_format,
+        sha256=digest.hexdigest(),
+    )
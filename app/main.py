@@ -7,15 +7,20 @@ import time
 import logging
 
 from app.core.config import settings
-from app.core.database import engine, Base
+from app.core.uploads import UPLOAD_FORM_OVERHEAD
+from app.core.image_pipeline import image_pipeline
+from app.core.screenshot_worker import screenshot_worker
+from app.core.retention import retention_job
+from app.core.live_events import live_events
+from app.core.presence import presence_tracker
+from app.core.session_sweeper import session_sweeper
 from app.api.api_v1.api import api_router
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+# The schema is managed by alembic: run `alembic upgrade head` before starting the app
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -33,6 +38,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Request logging middleware
@@ -44,6 +50,21 @@ async def log_requests(request: Request, call_next):
     logger.info(f"{request.method} {request.url.path} - {response.status_code} - {process_time:.3f}s")
     return response
 
+# Reject oversized screenshot uploads from Content-Length before the body is read
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    if request.method == "POST" and request.url.path.startswith(f"{settings.api_v1_prefix}/screenshots"):
+        max_files = settings.max_screenshot_batch_files \
+            if request.url.path.rstrip("/").endswith("/batch") else 1
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit() and \
+                int(content_length) > (settings.max_screenshot_size + UPLOAD_FORM_OVERHEAD) * max_files:
+            return JSONResponse(
+                status_code=413,
+                content={"detail": f"File size exceeds maximum allowed size of {settings.max_screenshot_size} bytes"}
+            )
+    return await call_next(request)
+
 # Exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -53,6 +74,27 @@ async def global_exception_handler(request: Request, exc: Exception):
         content={"detail": "Internal server error"}
     )
 
+@app.on_event("startup")
+async def start_background_workers():
+    if settings.screenshot_async_processing and settings.screenshot_worker_in_process:
+        screenshot_worker.start()
+    if settings.screenshot_retention_in_process:
+        retention_job.start()
+    if settings.live_events_in_process:
+        live_events.start()
+    presence_tracker.start()
+    if settings.session_sweep_in_process:
+        session_sweeper.start()
+
+@app.on_event("shutdown")
+async def shutdown_background_workers():
+    await screenshot_worker.stop()
+    await retention_job.stop()
+    await live_events.stop()
+    await presence_tracker.stop()
+    await session_sweeper.stop()
+    image_pipeline.shutdown()
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
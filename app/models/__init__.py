@@ -4,5 +4,9 @@ from .project import Project
 from .task import Task
 from .time_entry import TimeEntry
 from .screenshot import Screenshot
+from .screenshot_blob import ScreenshotBlob
+from .screenshot_pack import ScreenshotPack
+from .retention_policy import RetentionPolicy
+from .time_rollup import TimeRollup
 
-__all__ = ["Employee", "Project", "Task", "TimeEntry", "Screenshot"]
\ No newline at end of file
+__all__ = ["Employee", "Project", "Task", "TimeEntry", "Screenshot", "ScreenshotBlob", "ScreenshotPack", "RetentionPolicy", "TimeRollup"]
\ No newline at end of file
@@ -20,6 +20,10 @@ class Employee(Base):
     last_ip_address = Column(String(45), nullable=True)
     device_info = Column(Text, nullable=True)  # JSON string
     
+    # Presence, from the desktop app's heartbeats (written in bulk, see app.core.presence)
+    last_seen_at = Column(DateTime(timezone=True), nullable=True)
+    is_idle = Column(Boolean, default=False)
+    
     # Relationships
     time_entries = relationship("TimeEntry", back_populates="employee")
     screenshots = relationship("Screenshot", back_populates="employee")
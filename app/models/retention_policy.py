@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, CheckConstraint
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+class RetentionPolicy(Base):
+    __tablename__ = "retention_policies"
+    __table_args__ = (
+        # A policy applies to exactly one employee or one project
+        CheckConstraint("(employee_id IS NULL) <> (project_id IS NULL)", name="ck_retention_policy_scope"),
+    )
+    
+    # Overrides SCREENSHOT_RETENTION_DAYS; an employee's policy wins over a project's
+    id = Column(Integer, primary_key=True, index=True)
+    employee_id = Column(Integer, ForeignKey("employees.id"), nullable=True, unique=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=True, unique=True)
+    # Days screenshots are kept; NULL keeps them forever
+    retain_days = Column(Integer, nullable=True)
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    def __repr__(self):
+        return f"<RetentionPolicy(id={self.id}, employee_id={self.employee_id}, project_id={self.project_id}, retain_days={self.retain_days})>"
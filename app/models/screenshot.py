@@ -1,10 +1,15 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, BigInteger, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, BigInteger, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
 
 class Screenshot(Base):
     __tablename__ = "screenshots"
+    __table_args__ = (
+        # Keyset pagination and retention walk (timestamp, id), overall and per employee
+        Index("ix_screenshots_timestamp_id", "timestamp", "id"),
+        Index("ix_screenshots_employee_id_timestamp_id", "employee_id", "timestamp", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     employee_id = Column(Integer, ForeignKey("employees.id"), nullable=False, index=True)
@@ -13,8 +18,13 @@ class Screenshot(Base):
     filename = Column(String(255), nullable=False)
     file_path = Column(String(500), nullable=False)
     file_size = Column(BigInteger, nullable=False)
+    content_hash = Column(String(64), ForeignKey("screenshot_blobs.content_hash"), nullable=True, index=True)
+    # Archived screenshots live in a pack file (file_path) at this byte range
+    pack_id = Column(Integer, ForeignKey("screenshot_packs.id"), nullable=True, index=True)
+    pack_offset = Column(BigInteger, nullable=True)
+    pack_length = Column(BigInteger, nullable=True)
     
-    timestamp = Column(DateTime(timezone=True), nullable=False, index=True)
+    timestamp = Column(DateTime(timezone=True), nullable=False)
     permission_granted = Column(Boolean, default=False)
     
     # Image metadata
@@ -22,9 +32,18 @@ class Screenshot(Base):
     height = Column(Integer, nullable=True)
     format = Column(String(10), nullable=True)
     
+    # 64-bit difference hash for near-duplicate detection
+    perceptual_hash = Column(BigInteger, nullable=True, index=True)
+    near_duplicate_of_id = Column(Integer, ForeignKey("screenshots.id", ondelete="SET NULL"), nullable=True)
+    
     # Device info
     device_info = Column(Text, nullable=True)  # JSON string
     
+    # Post-processing: accepted -> processing -> ready / failed
+    processing_state = Column(String(20), nullable=False, default="ready", server_default="ready", index=True)
+    processing_started_at = Column(DateTime(timezone=True), nullable=True)
+    processing_attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, String, DateTime, BigInteger
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+class ScreenshotBlob(Base):
+    __tablename__ = "screenshot_blobs"
+    
+    # SHA-256 of the uploaded bytes; identical uploads share one stored file
+    content_hash = Column(String(64), primary_key=True)
+    file_path = Column(String(500), nullable=False)
+    file_size = Column(BigInteger, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=1)
+    
+    # Image metadata, filled in once the stored file has been processed
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    format = Column(String(10), nullable=True)
+    perceptual_hash = Column(BigInteger, nullable=True)
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    def __repr__(self):
+        return f"<ScreenshotBlob(content_hash='{self.content_hash}', ref_count={self.ref_count})>"
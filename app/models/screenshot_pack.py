@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, DateTime, Date, BigInteger, ForeignKey
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+class ScreenshotPack(Base):
+    __tablename__ = "screenshot_packs"
+    
+    # One append-only file holding an employee-day of archived screenshots
+    id = Column(Integer, primary_key=True, index=True)
+    employee_id = Column(Integer, ForeignKey("employees.id"), nullable=False, index=True)
+    day = Column(Date, nullable=False, index=True)
+    file_path = Column(String(500), nullable=False)
+    file_size = Column(BigInteger, nullable=False)
+    entry_count = Column(Integer, nullable=False)
+    # Screenshots still pointing into the pack; the file is removed when it drops to 0
+    live_count = Column(Integer, nullable=False)
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    def __repr__(self):
+        return f"<ScreenshotPack(id={self.id}, employee_id={self.employee_id}, day={self.day})>"
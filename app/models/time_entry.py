@@ -1,17 +1,29 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, Text,Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, Text,Boolean, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
 
 class TimeEntry(Base):
     __tablename__ = "time_entries"
+    __table_args__ = (
+        # Keyset pagination walks (start_time, id), overall and per employee
+        Index("ix_time_entries_start_time_id", "start_time", "id"),
+        Index("ix_time_entries_employee_id_start_time_id", "employee_id", "start_time", "id"),
+        # At most one open session per employee, however many starts race
+        Index(
+            "uq_time_entries_employee_id_open", "employee_id",
+            unique=True, postgresql_where=text("end_time IS NULL AND is_active")
+        ),
+        # Idempotency of offline sync: a client key is stored once per employee
+        Index("uq_time_entries_employee_id_client_key", "employee_id", "client_key", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     employee_id = Column(Integer, ForeignKey("employees.id"), nullable=False, index=True)
     project_id = Column(Integer, ForeignKey("projects.id"), nullable=False, index=True)
     task_id = Column(Integer, ForeignKey("tasks.id"), nullable=False, index=True)
     
-    start_time = Column(DateTime(timezone=True), nullable=False, index=True)
+    start_time = Column(DateTime(timezone=True), nullable=False)
     end_time = Column(DateTime(timezone=True), nullable=True)
     duration_seconds = Column(Integer, nullable=True)  # Calculated when session ends
     
@@ -22,6 +34,8 @@ class TimeEntry(Base):
     
     # Status
     is_active = Column(Boolean, default=True)
+    last_heartbeat_at = Column(DateTime(timezone=True), nullable=True)  # Open sessions only
+    client_key = Column(String(64), nullable=True)  # Set by offline sync, see POST /time-entries/sync
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, DateTime, Date, BigInteger, ForeignKey, Index
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+class TimeRollup(Base):
+    __tablename__ = "time_rollups_daily"
+    __table_args__ = (
+        # Reports select a date range first, then group by project or employee
+        Index("ix_time_rollups_daily_day_project_id", "day", "project_id"),
+    )
+    
+    # Tracked time of closed sessions per employee, project, task and UTC day
+    employee_id = Column(Integer, ForeignKey("employees.id"), primary_key=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), primary_key=True)
+    task_id = Column(Integer, ForeignKey("tasks.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    seconds = Column(BigInteger, nullable=False, default=0)
+    # Sessions contributing to the day (one spanning midnight counts on both days)
+    entries = Column(Integer, nullable=False, default=0)
+    
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    def __repr__(self):
+        return f"<TimeRollup(employee_id={self.employee_id}, project_id={self.project_id}, day={self.day}, seconds={self.seconds})>"
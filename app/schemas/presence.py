@@ -0,0 +1,19 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+from datetime import datetime
+
+class Heartbeat(BaseModel):
+    # Bounded like the integer id column, so a bad beat is rejected here rather than by the bulk write
+    employee_id: int = Field(ge=1, le=2**31 - 1)
+    # True when the user has been away from keyboard and mouse
+    idle: bool = False
+    # Defaults to the address the heartbeat came from
+    ip_address: Optional[str] = Field(None, max_length=45)
+
+class PresenceEntry(BaseModel):
+    employee_id: int
+    status: str  # online, idle or offline
+    last_seen_at: Optional[datetime]
+    ip_address: Optional[str]
+    # The open time tracking session, if any
+    time_entry_id: Optional[int]
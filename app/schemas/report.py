@@ -0,0 +1,31 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import date
+
+class ReportSummaryRow(BaseModel):
+    period_start: date
+    employee_id: Optional[int] = None
+    project_id: Optional[int] = None
+    task_id: Optional[int] = None
+    seconds: int
+    hours: float
+    entries: int
+
+class TimesheetDay(BaseModel):
+    date: date
+    seconds: int
+    regular_seconds: int
+    overtime_seconds: int
+
+class TimesheetWeek(BaseModel):
+    week_start: date
+    seconds: int
+    regular_seconds: int
+    overtime_seconds: int
+
+class TimesheetEmployee(BaseModel):
+    employee_id: int
+    seconds: int
+    overtime_seconds: int
+    days: List[TimesheetDay]
+    weeks: List[TimesheetWeek]
@@ -0,0 +1,28 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+
+class RetentionPolicyBase(BaseModel):
+    employee_id: Optional[int] = None
+    project_id: Optional[int] = None
+    # Days screenshots are kept; None keeps them forever
+    retain_days: Optional[int] = None
+
+class RetentionPolicySet(RetentionPolicyBase):
+    pass
+
+class RetentionPolicy(RetentionPolicyBase):
+    id: int
+    created_at: datetime
+    updated_at: Optional[datetime]
+    
+    class Config:
+        from_attributes = True
+
+class RetentionReportItem(BaseModel):
+    scope: str  # employee, project or global
+    policy_id: Optional[int]
+    retain_days: Optional[int]
+    screenshots: int
+    bytes: int
+    oldest: Optional[datetime]
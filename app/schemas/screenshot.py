@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 class ScreenshotUpload(BaseModel):
@@ -20,7 +20,29 @@ class Screenshot(BaseModel):
     width: Optional[int]
     height: Optional[int]
     format: Optional[str]
+    near_duplicate_of_id: Optional[int] = None
+    processing_state: str = "ready"
     created_at: datetime
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class ScreenshotBatchMetadata(BaseModel):
+    """Per-file fields of a batch upload, in the same order as the files"""
+    time_entry_id: Optional[int] = None
+    permission_granted: bool = True
+    device_info: Optional[str] = None
+    captured_at: Optional[datetime] = None
+
+class ScreenshotBatchItem(BaseModel):
+    index: int
+    filename: Optional[str] = None
+    status: str  # created, accepted, skipped or failed
+    screenshot: Optional[Screenshot] = None
+    detail: Optional[str] = None
+
+class ScreenshotBatchResult(BaseModel):
+    items: List[ScreenshotBatchItem]
+    stored: int  # created or accepted
+    skipped: int  # near-duplicates not stored
+    failed: int
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 class TimeEntryStart(BaseModel):
@@ -32,4 +32,34 @@ class TimeEntry(BaseModel):
 class TimeEntryWithDetails(TimeEntry):
     employee_name: Optional[str]
     project_name: Optional[str]
-    task_name: Optional[str]
\ No newline at end of file
+    task_name: Optional[str]
+
+class TimeEntrySyncItem(BaseModel):
+    """A completed session recorded while the client was offline"""
+    # Generated by the client; replaying the same key is a no-op
+    client_key: str
+    project_id: int
+    task_id: int
+    start_time: datetime
+    end_time: datetime
+    ip_address: Optional[str] = None
+    mac_address: Optional[str] = None
+    device_info: Optional[str] = None
+
+class TimeEntrySync(BaseModel):
+    employee_id: int
+    entries: List[TimeEntrySyncItem]
+
+class TimeEntrySyncItemResult(BaseModel):
+    index: int
+    client_key: str
+    status: str  # created, duplicate or rejected
+    # The stored entry, for created and duplicate
+    time_entry_id: Optional[int] = None
+    detail: Optional[str] = None
+
+class TimeEntrySyncResult(BaseModel):
+    items: List[TimeEntrySyncItemResult]
+    created: int
+    duplicates: int
+    rejected: int
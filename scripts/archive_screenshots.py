@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Compact old screenshots into one pack file per employee-day.
+
+Screenshots older than SCREENSHOT_ARCHIVE_AFTER_DAYS (or --older-than-days)
+are appended to an append-only pack file with an offset index, their rows are
+repointed at (pack, offset, length) and the individual files are removed.
+Each employee-day is one transaction, so the job can be stopped and rerun at
+any time. Meant to run nightly from cron.
+
+Usage: python scripts/archive_screenshots.py [--older-than-days 90] [--max-days 100] [--dry-run]
+       python scripts/archive_screenshots.py --verify uploads/packs/1/2024-01-01-ab12cd34.pack
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import logging
+import time
+
+from app.core.config import settings
+from app.core.screenshot_packs import PackArchiver, verify_pack
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact old screenshots into pack files")
+    parser.add_argument("--older-than-days", type=int, default=settings.screenshot_archive_after_days)
+    parser.add_argument("--max-days", type=int, default=None, help="Pack at most this many employee-days")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be packed without changing anything")
+    parser.add_argument("--verify", metavar="PACK", help="Check every member of a pack file against its index")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.verify:
+        print(f"{args.verify}: {verify_pack(args.verify)} members OK")
+        return
+
+    started = time.perf_counter()
+    stats = PackArchiver(args.older_than_days, args.max_days, args.dry_run).run()
+    prefix = "Would pack" if args.dry_run else "Packed"
+    print(
+        f"{prefix} {stats['screenshots']} screenshots into {stats['packs']} packs "
+        f"({stats['members']} distinct files, {stats['bytes']} bytes); "
+        f"{stats['files_removed']} files removed, {stats['missing']} missing, "
+        f"{time.perf_counter() - started:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
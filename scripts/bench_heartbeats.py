@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark writing one interval of heartbeats in bulk against one UPDATE per
+heartbeat.
+
+Creates throwaway employees, each with an open session, and writes one
+heartbeat for every one of them: as a single write_heartbeats flush (what
+the presence tracker does every few seconds), then the next heartbeat
+interval the same way (which mostly skips rows that are fresh enough), and
+as a transaction per heartbeat (what writing through from the request would
+cost). The per-beat variant is timed on a sample and extrapolated. The test
+data is deleted at the end.
+
+Usage: python scripts/bench_heartbeats.py [--employees 20000] [--per-beat-sample 2000]
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, insert, or_, update
+
+from app.core.database import SessionLocal
+from app.core.presence import Beat, write_heartbeats
+from app.core.time_tracking import open_session_filter
+from app.models import Employee, Project, Task, TimeEntry
+
+
+def create_fixtures(db, employees: int) -> tuple:
+    tag = uuid.uuid4().hex[:8]
+    project = Project(name=f"Heartbeat bench {tag}")
+    db.add(project)
+    db.flush()
+    task = Task(name="Bench", project_id=project.id)
+    db.add(task)
+    db.flush()
+    employee_ids = db.scalars(insert(Employee).returning(Employee.id), [
+        {"name": f"Bench {i}", "email": f"bench-{tag}-{i}@example.com", "status": "active"}
+        for i in range(employees)
+    ]).all()
+    now = datetime.now(timezone.utc)
+    db.execute(insert(TimeEntry), [
+        {"employee_id": employee_id, "project_id": project.id, "task_id": task.id, "start_time": now, "is_active": True}
+        for employee_id in employee_ids
+    ])
+    db.commit()
+    return project.id, task.id, employee_ids
+
+
+def delete_fixtures(db, project_id: int, task_id: int, employee_ids: list) -> None:
+    db.execute(delete(TimeEntry).where(TimeEntry.project_id == project_id))
+    db.execute(delete(Task).where(Task.id == task_id))
+    db.execute(delete(Project).where(Project.id == project_id))
+    db.execute(delete(Employee).where(Employee.id.in_(employee_ids)))
+    db.commit()
+
+
+def write_per_beat(db, beats: dict) -> None:
+    """The write-through version: both rows updated in their own transaction per heartbeat"""
+    for employee_id, beat in beats.items():
+        db.execute(update(Employee).where(
+            Employee.id == employee_id,
+            or_(Employee.last_seen_at.is_(None), Employee.last_seen_at < beat.seen_at)
+        ).values(last_seen_at=beat.seen_at, is_idle=beat.idle, last_ip_address=beat.ip_address))
+        db.execute(update(TimeEntry).where(
+            TimeEntry.employee_id == employee_id, open_session_filter()
+        ).values(last_heartbeat_at=beat.seen_at))
+        db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--employees", type=int, default=20000)
+    parser.add_argument("--per-beat-sample", type=int, default=2000)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    project_id, task_id, employee_ids = create_fixtures(db, args.employees)
+    try:
+        beats = {
+            employee_id: Beat(datetime.now(timezone.utc), f"10.0.{i // 256 % 256}.{i % 256}", i % 5 == 0)
+            for i, employee_id in enumerate(employee_ids)
+        }
+        started = time.perf_counter()
+        employees, sessions = write_heartbeats(db, beats)
+        db.commit()
+        bulk = time.perf_counter() - started
+        print(
+            f"bulk flush: {bulk * 1000:.0f}ms for {len(beats)} heartbeats "
+            f"({employees} employees and {sessions} sessions updated, 1 statement)"
+        )
+
+        # The next beat of every client, 30s later; idle state flips for some
+        beats = {
+            employee_id: beat._replace(seen_at=beat.seen_at + timedelta(seconds=30), idle=beat.idle != (i % 50 == 0))
+            for i, (employee_id, beat) in enumerate(beats.items())
+        }
+        started = time.perf_counter()
+        employees, sessions = write_heartbeats(db, beats)
+        db.commit()
+        print(
+            f"next interval: {(time.perf_counter() - started) * 1000:.0f}ms for {len(beats)} heartbeats "
+            f"({employees} employees and {sessions} sessions updated)"
+        )
+
+        sample = dict(list(beats.items())[:args.per_beat_sample])
+        sample = {employee_id: beat._replace(seen_at=beat.seen_at + timedelta(seconds=60)) for employee_id, beat in sample.items()}
+        started = time.perf_counter()
+        write_per_beat(db, sample)
+        per_beat = time.perf_counter() - started
+        per_beat_full = per_beat * len(beats) / len(sample)
+        print(
+            f"per heartbeat: {per_beat:.2f}s for {len(sample)} heartbeats, "
+            f"~{per_beat_full:.1f}s for {len(beats)} ({len(beats)} transactions)"
+        )
+        print(f"speedup: ~{per_beat_full / bulk:.0f}x")
+    finally:
+        db.rollback()
+        delete_fixtures(db, project_id, task_id, employee_ids)
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Benchmark API latency under mixed traffic with and without the image process pool.
+
+Serves a small app with uvicorn on a local port, with a cheap endpoint and a
+screenshot processing endpoint, fires both kinds of requests concurrently and reports
+p50/p99 latency of the cheap requests, once with images processed inline on
+the event loop (0 workers) and once through the process pool.
+
+Usage: python scripts/bench_image_pipeline.py [--workers 4] [--light 2000] [--heavy 40]
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import shutil
+import multiprocessing
+import socket
+import tempfile
+import time
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, HTTPException
+from PIL import Image
+
+from app.core.image_pipeline import ImagePipeline, PipelineBusyError, process_screenshot
+
+
+def make_sample(path: str, size: tuple) -> None:
+    """Write a noisy JPEG so decode/recompress does real work"""
+    Image.effect_noise(size, 64).convert("RGB").save(path, format="JPEG", quality=95)
+
+
+def build_app(pipeline: ImagePipeline, sample: str, workdir: str) -> FastAPI:
+    app = FastAPI()
+    counter = {"n": 0}
+
+    @app.get("/light")
+    async def light():
+        return {"ok": True}
+
+    @app.post("/heavy")
+    async def heavy():
+        counter["n"] += 1
+        path = os.path.join(workdir, f"{counter['n']}.jpg")
+        shutil.copyfile(sample, path)
+        try:
+            return await pipeline.run(process_screenshot, path, 85)
+        except PipelineBusyError:
+            raise HTTPException(status_code=503)
+
+    return app
+
+
+def percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * pct), len(ordered) - 1)]
+
+
+def run_server(port: int, workers: int, queue_depth: int, sample: str, workdir: str) -> None:
+    pipeline = ImagePipeline(workers=workers, queue_depth=queue_depth)
+    try:
+        app = build_app(pipeline, sample, workdir)
+        uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+    finally:
+        pipeline.shutdown()
+
+
+def serve(*args) -> tuple:
+    """Start uvicorn in a separate process so the client does not share its GIL"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = multiprocessing.Process(target=run_server, args=(port,) + args)
+    server.start()
+    base_url = f"http://127.0.0.1:{port}"
+    while True:
+        try:
+            httpx.get(base_url + "/light")
+            return server, base_url
+        except httpx.TransportError:
+            time.sleep(0.05)
+
+
+async def run_traffic(base_url: str, light: int, heavy: int, concurrency: int) -> dict:
+    light_latencies = []
+    heavy_latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=None) as client:
+        async def call(method: str, path: str, sink: list):
+            async with semaphore:
+                started = time.perf_counter()
+                await client.request(method, path)
+                sink.append((time.perf_counter() - started) * 1000)
+
+        # Spread the heavy requests evenly through the light ones
+        every = max(light // max(heavy, 1), 1)
+        jobs = []
+        for i in range(light):
+            if i % every == 0 and len(jobs) - i < heavy:
+                jobs.append(call("POST", "/heavy", heavy_latencies))
+            jobs.append(call("GET", "/light", light_latencies))
+
+        started = time.perf_counter()
+        await asyncio.gather(*jobs)
+        elapsed = time.perf_counter() - started
+
+    return {
+        "light_p50": percentile(light_latencies, 0.50),
+        "light_p99": percentile(light_latencies, 0.99),
+        "heavy_p50": percentile(heavy_latencies, 0.50),
+        "heavy_p99": percentile(heavy_latencies, 0.99),
+        "elapsed": elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--queue-depth", type=int, default=256)
+    parser.add_argument("--light", type=int, default=2000)
+    parser.add_argument("--heavy", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-pipeline-")
+    sample = os.path.join(workdir, "sample.jpg")
+    make_sample(sample, (args.width, args.height))
+
+    try:
+        print(f"{'mode':<12} {'light p50':>10} {'light p99':>10} {'heavy p50':>10} {'heavy p99':>10} {'total':>8}")
+        for label, workers in (("inline", 0), (f"pool x{args.workers}", args.workers)):
+            server, base_url = serve(workers, args.queue_depth, sample, workdir)
+            try:
+                result = asyncio.run(run_traffic(base_url, args.light, args.heavy, args.concurrency))
+            finally:
+                server.terminate()
+                server.join()
+            print(
+                f"{label:<12} {result['light_p50']:>8.1f}ms {result['light_p99']:>8.1f}ms "
+                f"{result['heavy_p50']:>8.1f}ms {result['heavy_p99']:>8.1f}ms {result['elapsed']:>7.2f}s"
+            )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark the vectorized timesheet engine against a naive per-row Python loop.
+
+Generates synthetic sessions (some crossing midnight) for a 4-week period,
+computes daily/weekly totals with overtime both ways and checks that the
+results agree. The loop is timed on a sample of the rows and extrapolated,
+since it would take minutes on the full set.
+
+Usage: python scripts/bench_timesheets.py [--entries 10000000] [--employees 5000] [--naive-rows 200000] [--timezone America/New_York]
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import bisect
+import time
+from datetime import date
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from app.core.timesheets import compute_timesheet, day_boundaries
+
+DAILY_OVERTIME = 8 * 3600
+WEEKLY_OVERTIME = 40 * 3600
+
+
+def generate(entries: int, employees: int, boundaries: np.ndarray, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    employee_ids = rng.integers(1, employees + 1, entries, dtype=np.int64)
+    starts = rng.integers(boundaries[0] - 6 * 3600, boundaries[-1], entries, dtype=np.int64)
+    ends = starts + rng.integers(60, 10 * 3600, entries, dtype=np.int64)
+    return employee_ids, starts, ends
+
+
+def naive_timesheet(employee_ids, starts, ends, boundaries, week_of_day):
+    """The straightforward version: walk every session day by day"""
+    boundaries = boundaries.tolist()
+    daily = {}
+    for employee_id, start, end in zip(employee_ids.tolist(), starts.tolist(), ends.tolist()):
+        start = max(start, boundaries[0])
+        end = min(end, boundaries[-1])
+        if end <= start:
+            continue
+        day = bisect.bisect_right(boundaries, start) - 1
+        while day < len(boundaries) - 1 and boundaries[day] < end:
+            piece = min(end, boundaries[day + 1]) - max(start, boundaries[day])
+            daily[(employee_id, day)] = daily.get((employee_id, day), 0) + piece
+            day += 1
+
+    weekly = {}
+    for (employee_id, day), seconds in daily.items():
+        overtime = max(seconds - DAILY_OVERTIME, 0)
+        total, daily_overtime = weekly.get((employee_id, week_of_day[day]), (0, 0))
+        weekly[(employee_id, week_of_day[day])] = (total + seconds, daily_overtime + overtime)
+    weekly_overtime = {
+        key: daily_overtime + max(total - daily_overtime - WEEKLY_OVERTIME, 0)
+        for key, (total, daily_overtime) in weekly.items()
+    }
+    return daily, weekly_overtime
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark timesheet computation")
+    parser.add_argument("--entries", type=int, default=10_000_000)
+    parser.add_argument("--employees", type=int, default=5000)
+    parser.add_argument("--naive-rows", type=int, default=200_000)
+    parser.add_argument("--timezone", default="America/New_York")
+    args = parser.parse_args()
+
+    # Four weeks spanning the US DST change, so some days are 23 hours long
+    start_day, end_day = date(2024, 3, 4), date(2024, 3, 31)
+    boundaries = day_boundaries(start_day, end_day, ZoneInfo(args.timezone))
+    employee_ids, starts, ends = generate(args.entries, args.employees, boundaries)
+    print(f"{args.entries} sessions, {args.employees} employees, {len(boundaries) - 1} days in {args.timezone}")
+
+    started = time.perf_counter()
+    timesheet = compute_timesheet(
+        employee_ids, starts, ends, start_day, boundaries, DAILY_OVERTIME, WEEKLY_OVERTIME
+    )
+    vectorized = time.perf_counter() - started
+    print(f"vectorized: {vectorized:.2f}s for all rows ({args.entries / vectorized / 1e6:.1f}M rows/s)")
+
+    sample = min(args.naive_rows, args.entries)
+    week_of_day = [0] * len(timesheet.days)
+    week = 0
+    for column, day in enumerate(timesheet.days):
+        if column and day.weekday() == 0:
+            week += 1
+        week_of_day[column] = week
+    started = time.perf_counter()
+    naive_daily, naive_weekly_overtime = naive_timesheet(
+        employee_ids[:sample], starts[:sample], ends[:sample], boundaries, week_of_day
+    )
+    naive = time.perf_counter() - started
+    naive_full = naive * args.entries / sample
+    print(f"naive loop: {naive:.2f}s for {sample} rows, ~{naive_full:.1f}s for all rows")
+    print(f"speedup: ~{naive_full / vectorized:.0f}x")
+
+    # Same answer on the sample
+    check = compute_timesheet(
+        employee_ids[:sample], starts[:sample], ends[:sample], start_day, boundaries, DAILY_OVERTIME, WEEKLY_OVERTIME
+    )
+    index = {int(employee_id): row for row, employee_id in enumerate(check.employee_ids)}
+    assert sum(naive_daily.values()) == int(check.daily.sum())
+    for (employee_id, day), seconds in naive_daily.items():
+        assert check.daily[index[employee_id], day] == seconds
+    for (employee_id, week), overtime in naive_weekly_overtime.items():
+        assert check.weekly_overtime[index[employee_id], week] == overtime
+    print("results match")
+
+
+if __name__ == "__main__":
+    main()
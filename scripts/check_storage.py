@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Round-trip a test object through the configured screenshot storage backend.
+
+Stores, stats, reads back (whole and ranged) and deletes an object, so a new
+STORAGE_BACKEND configuration can be checked before the API uses it. The S3
+backend can be exercised without AWS against any S3-compatible stand-in, e.g.
+
+    moto_server -p 9000    (or: minio server /tmp/minio)
+    STORAGE_BACKEND=s3 S3_ENDPOINT_URL=http://localhost:9000 S3_BUCKET=screenshots \\
+        python scripts/check_storage.py --create-bucket --size-mb 20
+
+Objects above S3_MULTIPART_THRESHOLD exercise the multipart upload path.
+
+Usage: python scripts/check_storage.py [--size-mb 1] [--create-bucket]
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import hashlib
+import tempfile
+import time
+import uuid
+
+from app.core.config import settings
+from app.core.storage import storage, S3Storage
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Round-trip a test object through the storage backend")
+    parser.add_argument("--size-mb", type=float, default=1.0, help="Size of the test object")
+    parser.add_argument("--create-bucket", action="store_true", help="Create S3_BUCKET first (S3 backend only)")
+    args = parser.parse_args()
+
+    print(f"Backend: {type(storage).__name__}")
+    if args.create_bucket and isinstance(storage, S3Storage):
+        storage.client.create_bucket(Bucket=storage.bucket)
+
+    os.makedirs(settings.upload_dir, exist_ok=True)
+    size = int(args.size_mb * 1024 * 1024)
+    data = os.urandom(size)
+    path = os.path.join(settings.upload_dir, ".storage-check", f"{uuid.uuid4().hex}.bin")
+
+    fd, local_path = tempfile.mkstemp(dir=settings.upload_dir, prefix=".check-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+
+    started = time.perf_counter()
+    storage.put_file(path, local_path)
+    print(f"put      {size} bytes in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    try:
+        stored = storage.stat(path)
+        if stored is None or stored.size != size:
+            sys.exit(f"stat returned {stored}, expected size {size}")
+        print(f"stat     size={stored.size}")
+
+        started = time.perf_counter()
+        digest = hashlib.sha256()
+        for chunk in storage.iter_bytes(path):
+            digest.update(chunk)
+        if digest.digest() != hashlib.sha256(data).digest():
+            sys.exit("Read back different bytes than were stored")
+        print(f"get      verified in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+        end = min(size, 1024) - 1
+        if b"".join(storage.iter_bytes(path, 0, end)) != data[:end + 1]:
+            sys.exit("Ranged read returned the wrong bytes")
+        print(f"range    0-{end} verified")
+    finally:
+        storage.delete(path)
+
+    if storage.exists(path):
+        sys.exit("Object still exists after delete")
+    print("delete   ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Move stored screenshots into the configured upload layout (UPLOAD_LAYOUT).
+
+Files and their thumbnails are moved in parallel, and the file_path columns of
+screenshot_blobs and screenshots are rewritten in batches. The run is
+resumable: progress is checkpointed to a state file after every batch and
+each move is idempotent, so an interrupted migration can simply be restarted.
+
+Usage: python scripts/migrate_upload_layout.py [--layout sharded] [--batch-size 1000] [--workers 16] [--dry-run]
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import bindparam, update
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.thumbnails import thumbnail_path
+from app.core.upload_layout import storage_path
+from app.models.screenshot import Screenshot
+from app.models.screenshot_blob import ScreenshotBlob
+
+logger = logging.getLogger("migrate_upload_layout")
+
+MOVED = "moved"
+ALREADY = "already"
+MISSING = "missing"
+
+
+def move_file(source: str, target: str, dry_run: bool) -> str:
+    """Move one stored file and its derivatives; safe to repeat"""
+    if os.path.normpath(source) == os.path.normpath(target):
+        return ALREADY
+    if not os.path.exists(source):
+        # Moved by an interrupted run that did not get to update the database
+        return ALREADY if os.path.exists(target) else MISSING
+    if dry_run:
+        return MOVED
+
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.replace(source, target)
+    for size in settings.thumbnail_sizes:
+        if os.path.exists(thumbnail_path(source, size)):
+            os.replace(thumbnail_path(source, size), thumbnail_path(target, size))
+    return MOVED
+
+
+class Migration:
+    def __init__(self, layout: str, batch_size: int, workers: int, state_file: str, dry_run: bool):
+        self.layout = layout
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.state_file = state_file
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.counts = {MOVED: 0, ALREADY: 0, MISSING: 0}
+        self.state = self._load_state()
+
+    def _load_state(self) -> dict:
+        if os.path.exists(self.state_file):
+            with open(self.state_file) as f:
+                state = json.load(f)
+            if state.get("layout") == self.layout:
+                logger.info(f"Resuming from {state}")
+                return state
+        return {"layout": self.layout, "blobs_after": "", "screenshots_after": 0}
+
+    def _save_state(self) -> None:
+        if self.dry_run:
+            return
+        temp_path = f"{self.state_file}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self.state, f)
+        os.replace(temp_path, self.state_file)
+
+    def _move_batch(self, paths: list) -> list:
+        """Move files in parallel; returns each new path, or None if it did not change"""
+        targets = [storage_path(os.path.basename(path), self.layout) for path in paths]
+        results = list(self.executor.map(
+            lambda pair: move_file(pair[0], pair[1], self.dry_run), zip(paths, targets)
+        ))
+        for result in results:
+            self.counts[result] += 1
+        return [
+            target if result != MISSING and path != target else None
+            for path, target, result in zip(paths, targets, results)
+        ]
+
+    def migrate_blobs(self, db) -> None:
+        blob_paths = update(Screenshot.__table__).where(
+            Screenshot.__table__.c.content_hash == bindparam("b_hash")
+        ).values(file_path=bindparam("b_path"))
+
+        while True:
+            rows = db.query(ScreenshotBlob.content_hash, ScreenshotBlob.file_path).filter(
+                ScreenshotBlob.content_hash > self.state["blobs_after"]
+            ).order_by(ScreenshotBlob.content_hash).limit(self.batch_size).all()
+            if not rows:
+                break
+
+            new_paths = self._move_batch([row.file_path for row in rows])
+            changes = [
+                {"content_hash": row.content_hash, "file_path": new_path}
+                for row, new_path in zip(rows, new_paths) if new_path
+            ]
+            if changes and not self.dry_run:
+                db.execute(update(ScreenshotBlob), changes)
+                db.execute(blob_paths, [
+                    {"b_hash": change["content_hash"], "b_path": change["file_path"]} for change in changes
+                ])
+            db.commit()
+
+            self.state["blobs_after"] = rows[-1].content_hash
+            self._save_state()
+            logger.info(f"Blobs up to {rows[-1].content_hash[:12]}: {self.counts}")
+
+    def migrate_legacy_screenshots(self, db) -> None:
+        """Screenshots stored before content addressing own their file (packs stay put)"""
+        while True:
+            rows = db.query(Screenshot.id, Screenshot.file_path).filter(
+                Screenshot.id > self.state["screenshots_after"],
+                Screenshot.content_hash.is_(None),
+                Screenshot.pack_id.is_(None)
+            ).order_by(Screenshot.id).limit(self.batch_size).all()
+            if not rows:
+                break
+
+            new_paths = self._move_batch([row.file_path for row in rows])
+            changes = [
+                {"id": row.id, "file_path": new_path}
+                for row, new_path in zip(rows, new_paths) if new_path
+            ]
+            if changes and not self.dry_run:
+                db.execute(update(Screenshot), changes)
+            db.commit()
+
+            self.state["screenshots_after"] = rows[-1].id
+            self._save_state()
+            logger.info(f"Screenshots up to id {rows[-1].id}: {self.counts}")
+
+    def run(self) -> dict:
+        db = SessionLocal()
+        try:
+            self.migrate_blobs(db)
+            self.migrate_legacy_screenshots(db)
+            # Finished; a later run must start from the beginning again
+            if os.path.exists(self.state_file) and not self.dry_run:
+                os.remove(self.state_file)
+        finally:
+            db.close()
+            self.executor.shutdown()
+        return self.counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move stored screenshots into the configured upload layout")
+    parser.add_argument("--layout", choices=["sharded", "flat"], default=settings.upload_layout)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument(
+        "--state-file",
+        default=os.path.join(settings.upload_dir, ".layout-migration.json"),
+        help="Checkpoint file used to resume an interrupted run"
+    )
+    parser.add_argument("--dry-run", action="store_true", help="Report what would move without changing anything")
+    args = parser.parse_args()
+
+    if settings.storage_backend != "local":
+        sys.exit("The upload layout only applies to STORAGE_BACKEND=local")
+
+    logging.basicConfig(level=logging.INFO)
+    migration = Migration(args.layout, args.batch_size, args.workers, args.state_file, args.dry_run)
+    counts = migration.run()
+    print(f"Done: {counts[MOVED]} moved, {counts[ALREADY]} already in place, {counts[MISSING]} missing")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Delete screenshots that are past their retention period.
+
+Retention is SCREENSHOT_RETENTION_DAYS unless a per-project or per-employee
+policy overrides it (see /api/v1/retention/policies). Rows are deleted in
+batches and the job sleeps between batches (--pause-ratio) so it can run next
+to the API. Meant to run from cron when SCREENSHOT_RETENTION_IN_PROCESS is off.
+
+Usage: python scripts/purge_screenshots.py [--batch-size 500] [--max-batches 100] [--pause-ratio 1.0] [--dry-run]
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import logging
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.retention import RetentionJob, retention_report
+
+
+def report() -> None:
+    db = SessionLocal()
+    try:
+        items = retention_report(db)
+    finally:
+        db.close()
+    if not items:
+        print("Nothing to purge")
+        return
+    for item in items:
+        scope = item["scope"] if item["scope"] == "global" else f"{item['scope']} policy {item['policy_id']}"
+        print(
+            f"{scope} ({item['retain_days']} days): {item['screenshots']} screenshots, "
+            f"{item['bytes']} bytes, oldest {item['oldest']:%Y-%m-%d}"
+        )
+    print(
+        f"Would delete {sum(item['screenshots'] for item in items)} screenshots "
+        f"({sum(item['bytes'] for item in items)} bytes)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete screenshots past their retention period")
+    parser.add_argument("--batch-size", type=int, default=settings.screenshot_retention_batch_size)
+    parser.add_argument("--max-batches", type=int, default=None, help="Stop after this many batches")
+    parser.add_argument(
+        "--pause-ratio",
+        type=float,
+        default=settings.screenshot_retention_pause_ratio,
+        help="Sleep this many times as long as each batch took"
+    )
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be deleted without changing anything")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.dry_run:
+        report()
+        return
+
+    run = RetentionJob(args.batch_size, args.pause_ratio, max_batches=args.max_batches).run()
+    print(
+        f"Deleted {run['screenshots']} screenshots ({run['bytes']} bytes) in {run['batches']} batches; "
+        f"{run['files_removed']} files removed, {run['unlink_errors']} errors, {run['duration']}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Standalone screenshot post-processing worker.
+
+Picks up screenshots accepted with SCREENSHOT_ASYNC_PROCESSING=true, including
+any left unfinished by a previous run, and decodes, measures and recompresses
+them. Run as many copies as needed; rows are claimed with SKIP LOCKED.
+
+Usage: python scripts/screenshot_worker.py [--once]
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import logging
+import signal
+
+from app.core.image_pipeline import image_pipeline
+from app.core.screenshot_worker import ScreenshotWorker
+
+
+async def run(once: bool):
+    worker = ScreenshotWorker()
+    if once:
+        while await worker.run_once():
+            pass
+        return
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, lambda: asyncio.create_task(worker.stop()))
+    await worker.run_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Screenshot post-processing worker")
+    parser.add_argument("--once", action="store_true", help="Drain the backlog and exit")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(run(args.once))
+    finally:
+        image_pipeline.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Hammer /time-entries/start and /stop from many coroutines and check that no
+race got through.
+
+Creates a few throwaway employees on one project, then fires random start and
+stop requests for them concurrently (so the same employee is started and
+stopped by several requests at once, like double clicks and client retries).
+Afterwards it checks that:
+  - no employee has more than one open session,
+  - every 201 start created exactly one entry and every 200 stop closed one,
+  - no request failed with a server error,
+  - the daily rollups of the closed sessions count each one exactly once.
+The test data is deleted at the end unless --keep is given.
+
+Serves the app with uvicorn (--server-workers processes, so requests really
+run in parallel) unless --url points at a running server using the same database.
+
+Usage: python scripts/stress_time_tracking.py [--employees 10] [--requests 4000] [--concurrency 64] [--server-workers 4]
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import multiprocessing
+import random
+import socket
+import time
+import uuid
+from collections import Counter
+
+import httpx
+import uvicorn
+from sqlalchemy import delete, func, select
+
+from app.core.database import SessionLocal
+from app.core.rollups import check_rollups
+from app.models import Employee, Project, Task, TimeEntry, TimeRollup
+from app.models.project import project_employees
+
+
+def create_fixtures(employees: int) -> tuple:
+    db = SessionLocal()
+    try:
+        tag = uuid.uuid4().hex[:8]
+        staff = [
+            Employee(name=f"Stress {i}", email=f"stress-{tag}-{i}@example.com", status="active", is_verified=True)
+            for i in range(employees)
+        ]
+        project = Project(name=f"Stress {tag}", employees=staff)
+        db.add(project)
+        db.flush()
+        task = Task(name="Stress", project_id=project.id)
+        db.add(task)
+        db.commit()
+        return project.id, task.id, [employee.id for employee in staff]
+    finally:
+        db.close()
+
+
+def delete_fixtures(project_id: int, task_id: int, employee_ids: list) -> None:
+    db = SessionLocal()
+    try:
+        db.execute(delete(TimeRollup).where(TimeRollup.employee_id.in_(employee_ids)))
+        db.execute(delete(TimeEntry).where(TimeEntry.employee_id.in_(employee_ids)))
+        db.execute(delete(Task).where(Task.id == task_id))
+        db.execute(delete(project_employees).where(project_employees.c.project_id == project_id))
+        db.execute(delete(Project).where(Project.id == project_id))
+        db.execute(delete(Employee).where(Employee.id.in_(employee_ids)))
+        db.commit()
+    finally:
+        db.close()
+
+
+def run_server(port: int, workers: int) -> None:
+    uvicorn.run("app.main:app", host="127.0.0.1", port=port, workers=workers, log_level="warning")
+
+
+def serve(workers: int) -> tuple:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = multiprocessing.Process(target=run_server, args=(port, workers))
+    server.start()
+    base_url = f"http://127.0.0.1:{port}"
+    while True:
+        try:
+            httpx.get(base_url + "/health").raise_for_status()
+            return server, base_url + "/api/v1"
+        except (httpx.TransportError, httpx.HTTPStatusError):
+            time.sleep(0.1)
+
+
+async def hammer(base_url: str, project_id: int, task_id: int, employee_ids: list, requests: int, concurrency: int) -> Counter:
+    outcomes = Counter()
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=None) as client:
+        async def call(action: str, employee_id: int):
+            body = {"employee_id": employee_id}
+            if action == "start":
+                body.update(project_id=project_id, task_id=task_id)
+            async with semaphore:
+                response = await client.post(f"/time-entries/{action}", json=body)
+            outcomes[(action, response.status_code)] += 1
+
+        # Bursts of the same request for one employee, interleaved with others
+        jobs = []
+        while len(jobs) < requests:
+            action = random.choice(("start", "stop"))
+            employee_id = random.choice(employee_ids)
+            jobs += [call(action, employee_id) for _ in range(random.randint(1, 4))]
+        random.shuffle(jobs)
+        await asyncio.gather(*jobs)
+    return outcomes
+
+
+def verify(employee_ids: list, outcomes: Counter) -> list:
+    problems = []
+    db = SessionLocal()
+    try:
+        open_sessions = db.execute(
+            select(TimeEntry.employee_id, func.count()).where(
+                TimeEntry.employee_id.in_(employee_ids), TimeEntry.end_time.is_(None)
+            ).group_by(TimeEntry.employee_id).having(func.count() > 1)
+        ).all()
+        if open_sessions:
+            problems.append(f"employees with several open sessions: {open_sessions}")
+
+        entries = db.scalar(select(func.count()).where(TimeEntry.employee_id.in_(employee_ids)))
+        closed = db.scalar(select(func.count()).where(
+            TimeEntry.employee_id.in_(employee_ids), TimeEntry.end_time.isnot(None)
+        ))
+        if entries != outcomes[("start", 201)]:
+            problems.append(f"{outcomes[('start', 201)]} successful starts but {entries} entries")
+        if closed != outcomes[("stop", 200)]:
+            problems.append(f"{outcomes[('stop', 200)]} successful stops but {closed} closed entries")
+
+        mismatches = [row for row in check_rollups(db) if row["employee_id"] in set(employee_ids)]
+        if mismatches:
+            problems.append(f"{len(mismatches)} daily rollups disagree with the entries")
+    finally:
+        db.close()
+
+    errors = {key: count for key, count in outcomes.items() if key[1] >= 500}
+    if errors:
+        problems.append(f"server errors: {errors}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="API base URL of a running server, e.g. http://localhost:8000/api/v1")
+    parser.add_argument("--server-workers", type=int, default=4)
+    parser.add_argument("--employees", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--keep", action="store_true", help="Keep the test employees and their entries")
+    args = parser.parse_args()
+
+    project_id, task_id, employee_ids = create_fixtures(args.employees)
+    server = None
+    try:
+        base_url = args.url
+        if not base_url:
+            server, base_url = serve(args.server_workers)
+        started = time.perf_counter()
+        outcomes = asyncio.run(hammer(base_url, project_id, task_id, employee_ids, args.requests, args.concurrency))
+        elapsed = time.perf_counter() - started
+    finally:
+        if server is not None:
+            server.terminate()
+            server.join()
+
+    total = sum(outcomes.values())
+    print(f"{total} requests in {elapsed:.2f}s ({total / elapsed:.0f}/s)")
+    for (action, status_code), count in sorted(outcomes.items()):
+        print(f"  {action:<6} {status_code}: {count}")
+
+    problems = verify(employee_ids, outcomes)
+    if not args.keep:
+        delete_fixtures(project_id, task_id, employee_ids)
+    if problems:
+        for problem in problems:
+            print(f"FAIL: {problem}")
+        sys.exit(1)
+    print("OK: one open session per employee, every start and stop applied exactly once")
+
+
+if __name__ == "__main__":
+    main()
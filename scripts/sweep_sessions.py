@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Close time tracking sessions left open by clients that went away.
+
+A session is stale once neither a heartbeat nor a screenshot arrived for
+SESSION_STALE_AFTER_SECONDS; it is closed at its last activity and added to
+the rollups. Only one sweep runs at a time across all nodes (advisory lock),
+so this can run from cron next to the API. Meant for deployments with
+SESSION_SWEEP_IN_PROCESS off.
+
+Usage: python scripts/sweep_sessions.py [--stale-after 1800] [--batch-size 500] [--max-batches 100] [--dry-run]
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import logging
+from datetime import datetime, timezone
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.session_sweeper import SessionSweeper, stale_session_report
+
+
+def report(stale_after: int) -> None:
+    db = SessionLocal()
+    try:
+        stale = stale_session_report(db, datetime.now(timezone.utc), stale_after)
+    finally:
+        db.close()
+    if not stale["sessions"]:
+        print("No stale sessions")
+        return
+    print(f"Would close {stale['sessions']} sessions, oldest last active {stale['oldest_activity']:%Y-%m-%d %H:%M}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Close time tracking sessions with no recent activity")
+    parser.add_argument(
+        "--stale-after",
+        type=int,
+        default=settings.session_stale_after_seconds,
+        help="Seconds without a heartbeat or screenshot"
+    )
+    parser.add_argument("--batch-size", type=int, default=settings.session_sweep_batch_size)
+    parser.add_argument("--max-batches", type=int, default=None, help="Stop after this many batches")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be closed without changing anything")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.dry_run:
+        report(args.stale_after)
+        return
+
+    run = SessionSweeper(args.stale_after, args.batch_size, max_batches=args.max_batches).run()
+    if not run["locked"]:
+        print("Another sweep is running; nothing done")
+        return
+    print(
+        f"Closed {run['closed']} sessions in {run['batches']} batches; {run['seconds_counted']}s counted, "
+        f"{run['seconds_dropped']}s of inactivity not counted, {run['duration']}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Maintain the daily time rollups behind /api/v1/reports.
+
+"rebuild" recomputes the rollups of a day range (default: all history) from
+the closed time entries; use it to backfill after deploying and after any
+manual change to time_entries. "check" compares the rollups with the entries
+and lists every disagreement; with --fix the affected days are rebuilt.
+
+Usage: python scripts/time_rollups.py rebuild [--start 2024-01-01] [--end 2024-01-31]
+       python scripts/time_rollups.py check [--start 2024-01-01] [--end 2024-01-31] [--fix]
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import logging
+import time
+from datetime import date
+
+from app.core.database import SessionLocal
+from app.core.rollups import rebuild_rollups, check_rollups
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild or check the daily time rollups")
+    parser.add_argument("command", choices=["rebuild", "check"])
+    parser.add_argument("--start", type=date.fromisoformat, default=None, help="First UTC day (inclusive)")
+    parser.add_argument("--end", type=date.fromisoformat, default=None, help="Last UTC day (inclusive)")
+    parser.add_argument("--fix", action="store_true", help="With check: rebuild the days that disagree")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        if args.command == "rebuild":
+            written = rebuild_rollups(db, args.start, args.end)
+            print(f"Rebuilt {written} rollup rows in {time.perf_counter() - started:.1f}s")
+            return
+
+        mismatches = check_rollups(db, args.start, args.end)
+        for item in mismatches:
+            print(
+                f"employee {item['employee_id']} project {item['project_id']} task {item['task_id']} "
+                f"{item['day']}: expected {item['expected_seconds']}s/{item['expected_entries']} entries, "
+                f"stored {item['stored_seconds']}s/{item['stored_entries']} entries"
+            )
+        print(f"{len(mismatches)} mismatched rollups ({time.perf_counter() - started:.1f}s)")
+        if mismatches and args.fix:
+            days = [item["day"] for item in mismatches]
+            written = rebuild_rollups(db, min(days), max(days))
+            print(f"Rebuilt {written} rollup rows from {min(days)} to {max(days)}")
+        elif mismatches:
+            sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Export payroll timesheets: per-employee daily totals with overtime.
+
+Days are split at midnight in --timezone and overtime is time above the daily
+and weekly thresholds (defaults from OVERTIME_DAILY_HOURS / OVERTIME_WEEKLY_HOURS).
+Writes one CSV row per employee-day (or per employee-week with --weekly), or
+the same JSON as /api/v1/reports/timesheet with --format json.
+
+Usage: python scripts/timesheets.py --start 2024-01-01 --end 2024-01-31 [--timezone Europe/Berlin]
+       [--employee 12 --employee 13] [--weekly] [--format csv|json] [--output timesheet.csv]
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import csv
+import json
+import logging
+import time
+from datetime import date
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.timesheets import build_timesheet
+
+
+def write_csv(timesheet, out, weekly: bool) -> None:
+    writer = csv.writer(out)
+    writer.writerow(["employee_id", "week_start" if weekly else "date", "seconds", "regular_seconds", "overtime_seconds"])
+    totals, overtime, labels = (
+        (timesheet.weekly, timesheet.weekly_overtime, timesheet.week_starts) if weekly
+        else (timesheet.daily, timesheet.daily_overtime, timesheet.days)
+    )
+    for row, employee_id in enumerate(timesheet.employee_ids):
+        for column, label in enumerate(labels):
+            if totals[row, column]:
+                writer.writerow([
+                    int(employee_id), label.isoformat(), int(totals[row, column]),
+                    int(totals[row, column] - overtime[row, column]), int(overtime[row, column])
+                ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute payroll timesheets with overtime")
+    parser.add_argument("--start", type=date.fromisoformat, required=True, help="First local day (inclusive)")
+    parser.add_argument("--end", type=date.fromisoformat, required=True, help="Last local day (inclusive)")
+    parser.add_argument("--timezone", default=settings.timesheet_timezone)
+    parser.add_argument("--employee", type=int, action="append", help="Limit to these employees")
+    parser.add_argument("--daily-overtime-hours", type=float, default=settings.overtime_daily_hours)
+    parser.add_argument("--weekly-overtime-hours", type=float, default=settings.overtime_weekly_hours)
+    parser.add_argument("--weekly", action="store_true", help="CSV rows per week instead of per day")
+    parser.add_argument("--format", choices=["csv", "json"], default="csv")
+    parser.add_argument("--output", default="-", help="Output file (default: stdout)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        timesheet = build_timesheet(
+            db, args.start, args.end, args.timezone, args.employee,
+            args.daily_overtime_hours, args.weekly_overtime_hours
+        )
+    finally:
+        db.close()
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", newline="")
+    try:
+        if args.format == "json":
+            json.dump(timesheet.to_dicts(), out, default=str, indent=2)
+            out.write("\n")
+        else:
+            write_csv(timesheet, out, args.weekly)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(
+        f"Timesheet for {len(timesheet.employee_ids)} employees computed in {time.perf_counter() - started:.2f}s",
+        file=sys.stderr
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import os
+import uuid
+
+import pytest
+
+
+@pytest.fixture
+def stored_blob(tmp_path):
+    """A file on disk and a fresh content hash for it"""
+    path = tmp_path / "blob.png"
+    path.write_bytes(b"\x89PNG blob")
+    return uuid.uuid4().hex + uuid.uuid4().hex, str(path)
+
+
+def test_references_are_counted(db, stored_blob):
+    from app.core.blob_store import acquire_blob, register_blob, release_blob
+
+    content_hash, path = stored_blob
+    assert register_blob(db, content_hash, path, 9).ref_count == 1
+    # A concurrent upload of the same content takes another reference
+    assert register_blob(db, content_hash, path, 9).ref_count == 2
+    assert acquire_blob(db, content_hash).ref_count == 3
+    assert release_blob(db, content_hash) is None
+    assert release_blob(db, content_hash, count=2) == path
+    assert acquire_blob(db, content_hash) is None
+    db.rollback()
+
+
+def test_unknown_blob_is_neither_acquired_nor_released(db):
+    from app.core.blob_store import acquire_blob, release_blob
+
+    assert acquire_blob(db, "0" * 64) is None
+    assert release_blob(db, "0" * 64) is None
+    db.rollback()
+
+
+def test_deferred_release_removes_the_file_after_the_commit(db, stored_blob):
+    from app.core.blob_store import register_blob, release_blob, released_blobs, remove_released_blobs
+    from app.models import ScreenshotBlob
+
+    content_hash, path = stored_blob
+    register_blob(db, content_hash, path, 9)
+    db.commit()
+
+    assert release_blob(db, content_hash, defer=True) == path
+    db.commit()
+    assert content_hash in released_blobs(db)
+    assert os.path.exists(path)
+
+    assert remove_released_blobs(db, [content_hash]) == 1
+    assert not os.path.exists(path)
+    assert db.get(ScreenshotBlob, content_hash) is None
+    assert content_hash not in released_blobs(db)
+
+
+def test_blob_referenced_again_is_kept(db, stored_blob):
+    from app.core.blob_store import acquire_blob, register_blob, release_blob, remove_released_blobs
+    from app.models import ScreenshotBlob
+
+    content_hash, path = stored_blob
+    register_blob(db, content_hash, path, 9)
+    release_blob(db, content_hash, defer=True)
+    db.commit()
+
+    # An upload of the same content between the commit and the removal
+    assert acquire_blob(db, content_hash).ref_count == 1
+    db.commit()
+    assert remove_released_blobs(db, [content_hash]) == 0
+    assert os.path.exists(path)
+    assert db.get(ScreenshotBlob, content_hash).ref_count == 1
+
+    release_blob(db, content_hash, defer=True)
+    db.commit()
+    assert remove_released_blobs(db, [content_hash]) == 1
+    assert not os.path.exists(path)
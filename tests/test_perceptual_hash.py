@@ -0,0 +1,61 @@
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+
+@pytest.fixture
+def employee_id(db):
+    from app.models import Employee
+
+    employee = Employee(name="Hash", email=f"hash-{uuid.uuid4().hex[:8]}@example.com", status="active", is_verified=True)
+    db.add(employee)
+    db.commit()
+    return employee.id
+
+
+def capture(db, employee_id, perceptual_hash):
+    from app.models import Screenshot
+
+    screenshot = Screenshot(
+        employee_id=employee_id,
+        filename="s.png",
+        file_path="/nonexistent/s.png",
+        file_size=1,
+        timestamp=datetime.now(timezone.utc),
+        perceptual_hash=perceptual_hash,
+    )
+    db.add(screenshot)
+    db.flush()
+    return screenshot.id
+
+
+def test_row_committed_after_a_higher_id_is_found(database, employee_id):
+    from app.core.database import SessionLocal
+    from app.core.perceptual_hash import PerceptualHashIndex
+
+    index = PerceptualHashIndex()
+    slow, fast, reader = SessionLocal(), SessionLocal(), SessionLocal()
+    try:
+        late_id = capture(slow, employee_id, 0x0F0F)
+        early_id = capture(fast, employee_id, 0x0F0F)
+        fast.commit()
+        assert late_id < early_id
+
+        index.refresh(reader)
+        reader.rollback()
+        found = {match_id for match_id, _ in index.search(0x0F0F, 0, 10, employee_id)}
+        assert found == {early_id}
+
+        slow.commit()
+        index.refresh(reader)
+        reader.rollback()
+        found = {match_id for match_id, _ in index.search(0x0F0F, 0, 10, employee_id)}
+        assert found == {late_id, early_id}
+        # Found once, however often it is rescanned
+        index._next_rescan = 0.0
+        index.refresh(reader)
+        assert len(index.search(0x0F0F, 0, 10, employee_id)) == 2
+    finally:
+        for session in (slow, fast, reader):
+            session.close()
@@ -0,0 +1,56 @@
+from datetime import date, datetime, timedelta, timezone
+
+from app.core.rollups import split_by_day
+
+
+def utc(*args) -> datetime:
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def test_session_within_one_day():
+    assert split_by_day(utc(2026, 3, 2, 10), utc(2026, 3, 2, 12, 30)) == [(date(2026, 3, 2), 9000)]
+
+
+def test_session_split_at_midnight():
+    assert split_by_day(utc(2026, 3, 2, 23), utc(2026, 3, 3, 1, 30)) == [
+        (date(2026, 3, 2), 3600),
+        (date(2026, 3, 3), 5400),
+    ]
+
+
+def test_session_spanning_several_days():
+    pieces = split_by_day(utc(2026, 3, 2, 22), utc(2026, 3, 5, 2))
+    assert pieces == [
+        (date(2026, 3, 2), 7200),
+        (date(2026, 3, 3), 86400),
+        (date(2026, 3, 4), 86400),
+        (date(2026, 3, 5), 7200),
+    ]
+
+
+def test_session_ending_at_midnight_stays_on_its_day():
+    assert split_by_day(utc(2026, 3, 2, 22), utc(2026, 3, 3)) == [(date(2026, 3, 2), 7200)]
+
+
+def test_pieces_add_up_to_the_stored_duration():
+    # Durations are stored in whole seconds; the last day absorbs the difference
+    start = utc(2026, 3, 2, 23) + timedelta(milliseconds=400)
+    pieces = split_by_day(start, utc(2026, 3, 3, 0, 30), duration_seconds=5399)
+    assert pieces == [(date(2026, 3, 2), 3599), (date(2026, 3, 3), 1800)]
+    assert sum(seconds for _, seconds in pieces) == 5399
+
+
+def test_days_are_utc_days():
+    berlin = timezone(timedelta(hours=1))
+    # 00:30 to 02:00 in UTC+1 is 23:30 to 01:00 UTC
+    assert split_by_day(datetime(2026, 3, 3, 0, 30, tzinfo=berlin), datetime(2026, 3, 3, 2, tzinfo=berlin)) == [
+        (date(2026, 3, 2), 1800),
+        (date(2026, 3, 3), 3600),
+    ]
+
+
+def test_naive_datetimes_are_utc():
+    assert split_by_day(datetime(2026, 3, 2, 23), datetime(2026, 3, 3, 1)) == [
+        (date(2026, 3, 2), 3600),
+        (date(2026, 3, 3), 3600),
+    ]
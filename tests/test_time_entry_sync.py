@@ -0,0 +1,63 @@
+from datetime import datetime, timezone
+
+from app.core.time_entry_sync import _settle_batch
+from app.schemas.time_entry import TimeEntrySyncItem, TimeEntrySyncItemResult
+
+
+def entry(index, key, start_hour, end_hour):
+    item = TimeEntrySyncItem(
+        client_key=key,
+        project_id=1,
+        task_id=1,
+        start_time=datetime(2026, 3, 2, start_hour, tzinfo=timezone.utc),
+        end_time=datetime(2026, 3, 2, end_hour, tzinfo=timezone.utc),
+    )
+    return item, TimeEntrySyncItemResult(index=index, client_key=key, status="created")
+
+
+def settle(*entries):
+    kept = _settle_batch(list(entries))
+    return [result.index for _, result in kept], {result.index: result.detail for _, result in entries}
+
+
+def test_separate_entries_are_all_kept():
+    kept, details = settle(entry(0, "a", 9, 10), entry(1, "b", 10, 11), entry(2, "c", 12, 13))
+    assert kept == [0, 1, 2]
+    assert set(details.values()) == {None}
+
+
+def test_entries_are_kept_in_start_order():
+    kept, _ = settle(entry(0, "a", 14, 15), entry(1, "b", 9, 10))
+    assert kept == [1, 0]
+
+
+def test_earliest_of_overlapping_entries_wins():
+    kept, details = settle(entry(0, "a", 10, 12), entry(1, "b", 9, 11), entry(2, "c", 12, 13))
+    assert kept == [1, 2]
+    assert details[0] == "Overlaps entry 1 of this batch"
+
+
+def test_lower_index_wins_a_tie():
+    kept, details = settle(entry(0, "a", 9, 10), entry(1, "b", 9, 11))
+    assert kept == [0]
+    assert details[1] == "Overlaps entry 0 of this batch"
+
+
+def test_entry_inside_a_long_one_overlaps_it():
+    kept, details = settle(entry(0, "a", 8, 17), entry(1, "b", 10, 11), entry(2, "c", 12, 13))
+    assert kept == [0]
+    assert details[1] == details[2] == "Overlaps entry 0 of this batch"
+
+
+def test_repeated_key_keeps_the_first():
+    kept, details = settle(entry(0, "a", 9, 10), entry(1, "a", 11, 12))
+    assert kept == [0]
+    assert details[1] == "client_key repeated in batch"
+
+
+def test_rejected_overlap_does_not_claim_its_key():
+    # Entry 1 loses to entry 0, so the later entry 2 with its key is kept
+    kept, details = settle(entry(0, "a", 9, 11), entry(1, "b", 10, 12), entry(2, "b", 13, 14))
+    assert kept == [0, 2]
+    assert details[1] == "Overlaps entry 0 of this batch"
+    assert details[2] is None
@@ -0,0 +1,73 @@
+import asyncio
+import random
+import uuid
+from collections import Counter
+
+import pytest
+from sqlalchemy import func, select
+
+API = "/api/v1/time-entries"
+EMPLOYEES = 5
+REQUESTS_PER_EMPLOYEE = 40
+
+
+@pytest.fixture
+def staff(db):
+    from app.models import Employee, Project, Task
+
+    tag = uuid.uuid4().hex[:8]
+    employees = [
+        Employee(name=f"Race {i}", email=f"race-{tag}-{i}@example.com", status="active", is_verified=True)
+        for i in range(EMPLOYEES)
+    ]
+    project = Project(name=f"Race {tag}", employees=employees)
+    db.add(project)
+    db.flush()
+    task = Task(name="Race", project_id=project.id)
+    db.add(task)
+    db.commit()
+    return project.id, task.id, [employee.id for employee in employees]
+
+
+def test_concurrent_starts_and_stops(client, db, staff):
+    """Racing starts and stops of the same employees (double clicks, client
+    retries) leave at most one open session each, and the rollups count
+    every closed session exactly once"""
+    from app.core.rollups import expected_rollups
+    from app.models import TimeEntry, TimeRollup
+
+    project_id, task_id, employee_ids = staff
+    calls = []
+    for employee_id in employee_ids:
+        calls += [("start", {"employee_id": employee_id, "project_id": project_id, "task_id": task_id})] * (REQUESTS_PER_EMPLOYEE // 2)
+        calls += [("stop", {"employee_id": employee_id})] * (REQUESTS_PER_EMPLOYEE // 2)
+    random.Random(0).shuffle(calls)
+
+    async def fire():
+        return await asyncio.gather(*(
+            asyncio.to_thread(client.post, f"{API}/{action}", json=payload) for action, payload in calls
+        ))
+
+    responses = asyncio.run(fire())
+    outcomes = Counter((action, response.status_code) for (action, _), response in zip(calls, responses))
+    assert set(outcomes) <= {("start", 201), ("start", 400), ("stop", 200), ("stop", 404)}, outcomes
+
+    entries = db.scalars(select(TimeEntry).where(TimeEntry.employee_id.in_(employee_ids))).all()
+    open_sessions = Counter(entry.employee_id for entry in entries if entry.end_time is None)
+    assert max(open_sessions.values(), default=0) <= 1
+    closed = [entry for entry in entries if entry.end_time is not None]
+    assert len(entries) == outcomes[("start", 201)]
+    assert len(closed) == outcomes[("stop", 200)]
+
+    stored = {
+        (row.employee_id, row.project_id, row.task_id, row.day): (row.seconds, row.entries)
+        for row in db.scalars(select(TimeRollup).where(TimeRollup.employee_id.in_(employee_ids)))
+    }
+    expected = {key: value for key, value in expected_rollups(db) if key[0] in employee_ids}
+    assert stored == expected
+    assert sum(seconds for seconds, _ in stored.values()) == sum(entry.duration_seconds for entry in closed)
+    assert db.scalar(
+        select(func.count()).select_from(TimeEntry).where(
+            TimeEntry.employee_id.in_(employee_ids), TimeEntry.end_time.isnot(None), TimeEntry.duration_seconds.is_(None)
+        )
+    ) == 0
@@ -0,0 +1,98 @@
+from datetime import date, datetime, timezone
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from app.core.timesheets import compute_timesheet, day_boundaries
+
+HOUR = 3600
+UTC = ZoneInfo("UTC")
+# Monday to Sunday
+MONDAY = date(2026, 3, 2)
+SUNDAY = date(2026, 3, 8)
+
+
+def at(day: date, hour: float, tz=UTC) -> int:
+    return int(datetime(day.year, day.month, day.day, tzinfo=tz).timestamp() + hour * HOUR)
+
+
+def timesheet(sessions, start_day=MONDAY, end_day=SUNDAY, tz=UTC, **overtime):
+    """``sessions`` as (employee_id, start, end) in Unix seconds"""
+    employee_ids, starts, ends = (np.array(column, dtype=np.int64) for column in zip(*sessions))
+    return compute_timesheet(
+        employee_ids, starts, ends, start_day, day_boundaries(start_day, end_day, tz), **overtime
+    )
+
+
+def test_daily_totals_per_employee():
+    result = timesheet([
+        (7, at(MONDAY, 9), at(MONDAY, 12)),
+        (7, at(MONDAY, 13), at(MONDAY, 17)),
+        (3, at(date(2026, 3, 4), 10), at(date(2026, 3, 4), 11)),
+    ])
+    assert list(result.employee_ids) == [3, 7]
+    assert len(result.days) == 7
+    assert result.daily[1, 0] == 7 * HOUR
+    assert result.daily[0, 2] == HOUR
+    assert result.daily.sum() == 8 * HOUR
+    assert result.week_starts == [MONDAY]
+    assert list(result.weekly[:, 0]) == [HOUR, 7 * HOUR]
+
+
+def test_session_across_midnight_counts_on_both_days():
+    result = timesheet([(1, at(MONDAY, 22), at(MONDAY, 26))])
+    assert list(result.daily[0, :2]) == [2 * HOUR, 2 * HOUR]
+
+
+def test_sessions_are_clipped_to_the_period():
+    result = timesheet([
+        (1, at(MONDAY, -3), at(MONDAY, 2)),
+        (1, at(SUNDAY, 23), at(SUNDAY, 30)),
+        (2, at(date(2026, 2, 1), 9), at(date(2026, 2, 1), 17)),
+    ])
+    assert list(result.employee_ids) == [1]
+    assert result.daily[0, 0] == 2 * HOUR
+    assert result.daily[0, 6] == HOUR
+
+
+def test_daily_overtime():
+    result = timesheet([(1, at(MONDAY, 8), at(MONDAY, 18))], daily_overtime_seconds=8 * HOUR)
+    assert result.daily[0, 0] == 10 * HOUR
+    assert result.daily_overtime[0, 0] == 2 * HOUR
+    assert result.weekly_overtime[0, 0] == 2 * HOUR
+
+
+def test_weekly_overtime_does_not_count_daily_overtime_twice():
+    five_long_days = [(1, at(date(2026, 3, day), 8), at(date(2026, 3, day), 17)) for day in range(2, 7)]
+    result = timesheet(five_long_days, daily_overtime_seconds=8 * HOUR, weekly_overtime_seconds=40 * HOUR)
+    # 45 hours: 5 above the daily limit, the remaining 40 within the weekly one
+    assert result.weekly[0, 0] == 45 * HOUR
+    assert result.weekly_overtime[0, 0] == 5 * HOUR
+
+    six_days = [(1, at(date(2026, 3, day), 8), at(date(2026, 3, day), 16)) for day in range(2, 8)]
+    result = timesheet(six_days, daily_overtime_seconds=8 * HOUR, weekly_overtime_seconds=40 * HOUR)
+    assert result.daily_overtime.sum() == 0
+    assert result.weekly_overtime[0, 0] == 8 * HOUR
+
+
+def test_zero_thresholds_disable_overtime():
+    result = timesheet([(1, at(MONDAY, 0), at(MONDAY, 20))])
+    assert result.daily_overtime.sum() == 0
+    assert result.weekly_overtime.sum() == 0
+
+
+def test_weeks_split_on_monday():
+    result = timesheet(
+        [(1, at(date(2026, 3, 7), 9), at(date(2026, 3, 7), 10)), (1, at(date(2026, 3, 9), 9), at(date(2026, 3, 9), 11))],
+        start_day=date(2026, 3, 5), end_day=date(2026, 3, 11),
+    )
+    assert result.week_starts == [MONDAY, date(2026, 3, 9)]
+    assert list(result.weekly[0]) == [HOUR, 2 * HOUR]
+
+
+def test_local_days_across_dst_change():
+    berlin = ZoneInfo("Europe/Berlin")
+    # Clocks go forward on 2026-03-29: that local day is 23 hours long
+    day = date(2026, 3, 29)
+    result = timesheet([(1, at(day, 0, berlin), at(date(2026, 3, 30), 0, berlin))], start_day=day, end_day=day, tz=berlin)
+    assert result.daily[0, 0] == 23 * HOUR